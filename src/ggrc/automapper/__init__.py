@@ -3,23 +3,45 @@
 
 from datetime import datetime
 from logging import getLogger
+from time import time
 import collections
-
+import itertools
+
+from flask import g
+from flask import has_request_context
+from flask import request
+from sqlalchemy import event
+from sqlalchemy.orm.properties import RelationshipProperty
+from sqlalchemy.orm.session import Session
 from sqlalchemy.sql.expression import tuple_
 
 from ggrc import db
 from ggrc import models
+from ggrc import settings
 from ggrc.automapper.rules import rules
 from ggrc.login import get_current_user
+from ggrc.models.background_task import BackgroundTask
+from ggrc.models.background_task import queue_task
+from ggrc.models.background_task import worker_pool_callback
 from ggrc.models.relationship import Relationship
 from ggrc.rbac.permissions import is_allowed_update
+from ggrc.services.common import CACHE_EXPIRY_COLLECTION
 from ggrc.services.common import Resource, get_cache
+from ggrc.services.common import get_modified_objects
+from ggrc.services.common import log_event
+from ggrc.services.common import update_index
+from ggrc.services.common import update_memcache_after_commit
+from ggrc.services.common import update_memcache_before_commit
 from ggrc.utils import benchmark, with_nop
 
 
 # pylint: disable=invalid-name
 logger = getLogger(__name__)
 
+# Committed automapping task that can be queued without a database query
+QueuedTask = collections.namedtuple("QueuedTask",
+                                    ["id", "name", "modified_by_id"])
+
 
 class Stub(collections.namedtuple("Stub", ["type", "id"])):
 
@@ -33,25 +55,36 @@ class Stub(collections.namedtuple("Stub", ["type", "id"])):
 
 
 class AutomapperGenerator(object):
+  """Generator of relationships implied by the automapping rules.
+
+  The closure of a new relationship is computed one level at a time. All
+  relationships created on one level form the frontier of the next level and
+  are expanded together: neighborhoods of all their objects are loaded with a
+  single query, attributes used by implicit rules with one query per model
+  and the candidates are checked for existing relationships with one query.
+  The number of statements therefore depends on the depth of the rule graph
+  and not on the number of generated relationships.
+  """
 
   def __init__(self, use_benchmark=True):
     self.processed = set()
-    self.queue = set()
-    self.cache = collections.defaultdict(set)
-    self.instance_cache = {}
+    # complete neighborhoods of loaded objects
+    self.cache = {}
+    # objects referenced by attributes in implicit rules
+    self.attr_cache = {}
+    # relationships known to exist that are not in loaded neighborhoods
+    self.existing = set()
     self.auto_mappings = set()
     if use_benchmark:
       self.benchmark = benchmark
     else:
       self.benchmark = with_nop
 
-  def related(self, obj):
-    if obj in self.cache:
-      return self.cache[obj]
-    # Pre-fetch neighborhood for enqueued object since we're gonna need that
-    # results in a few steps. This drastically reduces number of queries.
-    stubs = {s for rel in self.queue for s in rel}
-    stubs.add(obj)
+  def _load_neighborhoods(self, stubs):
+    """Load complete neighborhoods of all given objects with one query."""
+    stubs = {stub for stub in stubs if stub not in self.cache}
+    if not stubs:
+      return
     # Union is here to convince mysql to use two separate indices and
     # merge te results. Just using `or` results in a full-table scan
     # Manual column list avoids loading the full object which would also try to
@@ -69,25 +102,98 @@ class AutomapperGenerator(object):
                    Relationship.destination_id).in_(
                        [(s.type, s.id) for s in stubs]))
     ).all()
-    batch_requests = collections.defaultdict(set)
+    for stub in stubs:
+      self.cache[stub] = set()
     for (src_type, src_id, dst_type, dst_id) in relationships:
       src = Stub(src_type, src_id)
       dst = Stub(dst_type, dst_id)
-      # only store a neighbor if we queried for it since this way we know
-      # we'll be storing complete neighborhood by the end of the loop
-      batch_requests[src_type].add(src_id)
-      batch_requests[dst_type].add(dst_id)
       if src in stubs:
         self.cache[src].add(dst)
       if dst in stubs:
         self.cache[dst].add(src)
 
-    for type_, ids in batch_requests.iteritems():
-      model = getattr(models.all_models, type_)
-      instances = model.query.filter(model.id.in_(ids))
-      for instance in instances:
-        self.instance_cache[Stub(type_, instance.id)] = instance
-    return self.cache[obj]
+  @staticmethod
+  def _get_attr_column(model, attr_name):
+    """Get the foreign key column and the target type of a model attribute.
+
+    Returns:
+      (column, target_type) tuple or None if the attribute is not a scalar
+      relationship to a single model.
+    """
+    attr = getattr(model, attr_name, None)
+    prop = getattr(attr, "property", None)
+    if not isinstance(prop, RelationshipProperty) or prop.uselist:
+      return None
+    columns = list(prop.local_columns)
+    target_mapper = prop.mapper
+    if len(columns) != 1 or target_mapper.polymorphic_on is not None:
+      return None
+    return columns[0], target_mapper.class_.__name__
+
+  def _load_attributes(self, requests):
+    """Load objects referenced by attributes of the given objects.
+
+    Args:
+      requests: set of (stub, attr_name) tuples.
+    """
+    by_model = collections.defaultdict(set)
+    for stub, attr_name in requests:
+      if (stub, attr_name) not in self.attr_cache:
+        by_model[stub.type, attr_name].add(stub.id)
+    for (type_, attr_name), ids in by_model.iteritems():
+      for id_ in ids:
+        self.attr_cache[Stub(type_, id_), attr_name] = set()
+      model = getattr(models.all_models, type_, None)
+      if model is None:
+        logger.warning('Automapping by attr: cannot find model %s', type_)
+        continue
+      if not hasattr(model, attr_name):
+        logger.warning('Automapping by attr: model %s has no attribute %s',
+                       type_, attr_name)
+        continue
+      attr_column = self._get_attr_column(model, attr_name)
+      if attr_column is not None:
+        self._load_attribute_column(model, attr_name, attr_column, ids)
+      else:
+        self._load_attribute_instances(model, attr_name, ids)
+
+  def _load_attribute_column(self, model, attr_name, attr_column, ids):
+    """Load attribute values with a query of the foreign key column."""
+    column, target_type = attr_column
+    rows = db.session.query(model.id, column).filter(model.id.in_(ids))
+    for id_, value in rows:
+      if value is not None:
+        self.attr_cache[Stub(model.__name__, id_), attr_name].add(
+            Stub(target_type, value))
+
+  def _load_attribute_instances(self, model, attr_name, ids):
+    """Load attribute values from loaded model instances."""
+    for instance in model.query.filter(model.id.in_(ids)):
+      values = getattr(instance, attr_name)
+      if not isinstance(values, collections.Iterable):
+        values = [values]
+      self.attr_cache[Stub(model.__name__, instance.id), attr_name].update(
+          Stub(value.type, value.id) for value in values
+          if value is not None)
+
+  def _load_existing(self, entries):
+    """Find which of the relationships exist but are not in the cache."""
+    unknown = [(src, dst) for src, dst in entries
+               if src not in self.cache and dst not in self.cache]
+    if not unknown:
+      return
+    keys = [(src.type, src.id, dst.type, dst.id) for src, dst in unknown]
+    keys.extend((dst.type, dst.id, src.type, src.id) for src, dst in unknown)
+    rows = db.session.query(
+        Relationship.source_type, Relationship.source_id,
+        Relationship.destination_type, Relationship.destination_id,
+    ).filter(tuple_(
+        Relationship.source_type, Relationship.source_id,
+        Relationship.destination_type, Relationship.destination_id,
+    ).in_(keys))
+    for src_type, src_id, dst_type, dst_id in rows:
+      self.existing.add(self.relate(Stub(src_type, src_id),
+                                    Stub(dst_type, dst_id)))
 
   def relate(self, src, dst):
     if src < dst:
@@ -98,32 +204,14 @@ class AutomapperGenerator(object):
   def generate_automappings(self, relationship):
     self.auto_mappings = set()
     with self.benchmark("Automapping generate_automappings"):
-      # initial relationship is special since it is already created and
-      # processing it would abort the loop so we manually enqueue the
-      # neighborhood
-      src = Stub.from_source(relationship)
-      dst = Stub.from_destination(relationship)
-      self._step(src, dst)
-      self._step(dst, src)
-      count = 0
-      while len(self.queue) > 0:
-        if len(self.auto_mappings) > rules.count_limit:
-          break
-        count += 1
-        src, dst = entry = self.queue.pop()
-
-        if not (self._can_map_to(src, relationship) and
-                self._can_map_to(dst, relationship)):
-          continue
-
-        created = self._ensure_relationship(src, dst)
-        self.processed.add(entry)
-        if not created:
-          # If the edge already exists it means that auto mappings for it have
-          # already been processed and it is safe to cut here.
-          continue
-        self._step(src, dst)
-        self._step(dst, src)
+      # initial relationship is special since it is already created, so it
+      # is the first frontier without being checked
+      frontier = {(Stub.from_source(relationship),
+                   Stub.from_destination(relationship))}
+      while frontier and len(self.auto_mappings) <= rules.count_limit:
+        with self.benchmark("Automapping expand level"):
+          candidates = self._expand(frontier)
+        frontier = self._create_relationships(candidates, relationship)
 
       if len(self.auto_mappings) <= rules.count_limit:
         self._flush(relationship)
@@ -132,8 +220,63 @@ class AutomapperGenerator(object):
             'automapping_limit_exceeded': True
         }
 
-  def _can_map_to(self, obj, parent_relationship):
-    return is_allowed_update(obj.type, obj.id, parent_relationship.context)
+  def _expand(self, frontier):
+    """Get unprocessed relationships implied by relationships in frontier."""
+    steps = []
+    neighborhoods = set()
+    attributes = set()
+    for edge in frontier:
+      for src, dst in (edge, edge[::-1]):
+        explicit, implicit = rules[src.type, dst.type]
+        if explicit or implicit:
+          steps.append((src, dst, explicit, implicit))
+        if explicit:
+          neighborhoods.add(src)
+        attributes.update((src, attr.name) for attr in implicit)
+    self._load_neighborhoods(neighborhoods)
+    self._load_attributes(attributes)
+
+    candidates = set()
+    for src, dst, explicit, implicit in steps:
+      if explicit:
+        candidates.update(self.relate(related, dst)
+                          for related in self.cache[src]
+                          if related.type in explicit and related != dst)
+      for attr in implicit:
+        candidates.update(self.relate(target, dst)
+                          for target in self.attr_cache[src, attr.name])
+    return candidates - self.processed
+
+  def _create_relationships(self, candidates, parent_relationship):
+    """Add allowed relationships that do not exist yet to auto mappings.
+
+    Returns:
+      set of relationships that were added.
+    """
+    allowed = {}
+    candidates = [
+        entry for entry in candidates
+        if all(self._can_map_to(stub, parent_relationship, allowed)
+               for stub in entry)
+    ]
+    self._load_existing(candidates)
+    created = set()
+    for entry in candidates:
+      if len(self.auto_mappings) > rules.count_limit:
+        break
+      self.processed.add(entry)
+      # If the edge already exists it means that auto mappings for it have
+      # already been processed and it is safe to cut here.
+      if self._ensure_relationship(*entry):
+        created.add(entry)
+    return created
+
+  @staticmethod
+  def _can_map_to(obj, parent_relationship, allowed):
+    if obj not in allowed:
+      allowed[obj] = is_allowed_update(obj.type, obj.id,
+                                       parent_relationship.context)
+    return allowed[obj]
 
   def _flush(self, parent_relationship):
     if len(self.auto_mappings) == 0:
@@ -178,56 +321,13 @@ class AutomapperGenerator(object):
             )
         )
 
-  def _step(self, src, dst):
-    explicit, implicit = rules[src.type, dst.type]
-    self._step_explicit(src, dst, explicit)
-    self._step_implicit(src, dst, implicit)
-
-  def _step_explicit(self, src, dst, explicit):
-    if len(explicit) != 0:
-      src_related = (o for o in self.related(src)
-                     if o.type in explicit and o != dst)
-      for r in src_related:
-        entry = self.relate(r, dst)
-        if entry not in self.processed:
-          self.queue.add(entry)
-
-  def _step_implicit(self, src, dst, implicit):
-    if not hasattr(models.all_models, src.type):
-      logger.warning('Automapping by attr: cannot find model %s', src.type)
-      return
-    instance = self.instance_cache.get(src)
-    if instance is None:
-      model = getattr(models.all_models, src.type)
-      instance = model.query.filter(model.id == src.id).first()
-      self.instance_cache[src] = instance
-    if instance is None:
-      logger.warning("Automapping by attr: cannot load model %s: %s",
-                     src.type, src.id)
-      return
-    for attr in implicit:
-      if hasattr(instance, attr.name):
-        values = getattr(instance, attr.name)
-        if not isinstance(values, collections.Iterable):
-          values = [values]
-        for value in values:
-          if value is not None:
-            entry = self.relate(Stub(value.type, value.id), dst)
-            if entry not in self.processed:
-              self.queue.add(entry)
-          else:
-            logger.warning('Automapping by attr: %s is None', attr.name)
-      else:
-        logger.warning(
-            'Automapping by attr: object %s has no attribute %s',
-            src, attr.name,
-        )
-
   def _ensure_relationship(self, src, dst):
     if dst in self.cache.get(src, []):
       return False
     if src in self.cache.get(dst, []):
       return False
+    if (src, dst) in self.existing:
+      return False
 
     self.auto_mappings.add((src, dst))
 
@@ -239,6 +339,86 @@ class AutomapperGenerator(object):
     return True
 
 
+def enqueue_automappings(relationships):
+  """Add relationships to the automapping task of the current transaction.
+
+  All relationships posted before the transaction is committed are handled by
+  a single task. The task is created in the same transaction and it is queued
+  after the commit, so that the relationships are visible to it.
+  """
+  task = getattr(g, "automapping_task", None)
+  if task is None:
+    task = BackgroundTask(name="automapping{}".format(int(time())))
+    task.parameters = {"relationship_ids": []}
+    task.modified_by = get_current_user()
+    db.session.add(task)
+    g.automapping_task = task
+  db.session.flush()
+  task.parameters = {"relationship_ids": task.parameters["relationship_ids"] +
+                     [relationship.id for relationship in relationships]}
+  g.queued_automapping_task = QueuedTask(task.id, task.name,
+                                         task.modified_by_id)
+  for relationship in relationships:
+    relationship._json_extras = {
+        "automapping_task": {
+            "id": task.id,
+            "type": "BackgroundTask",
+            "href": "/background_task/{}".format(task.id),
+        }
+    }
+
+
+def _queue_automapping_task(session):
+  """Queue the automapping task after it has been committed."""
+  # pylint: disable=unused-argument
+  if not has_request_context():
+    return
+  queued = getattr(g, "queued_automapping_task", None)
+  _clear_automapping_task(session)
+  if queued is not None:
+    from ggrc.views import automapping
+    queue_task(queued, "/_background_tasks/automapping",
+               worker_pool_callback(automapping))
+
+
+def _clear_automapping_task(session):
+  """Forget the automapping task of a finished transaction."""
+  # pylint: disable=unused-argument
+  if not has_request_context():
+    return
+  for attr in ("automapping_task", "queued_automapping_task"):
+    if hasattr(g, attr):
+      delattr(g, attr)
+
+
+def generate_queued_automappings(relationship_ids):
+  """Generate automappings for relationships with a shared generator.
+
+  Returns:
+    dict with the number of handled relationships and ids of relationships
+    that exceeded the automapping count limit.
+  """
+  automapper = AutomapperGenerator()
+  relationships = Relationship.query.filter(
+      Relationship.id.in_(relationship_ids)).order_by(Relationship.id).all()
+  limit_exceeded = []
+  for relationship in relationships:
+    automapper.generate_automappings(relationship)
+    if getattr(relationship, "_json_extras", None):
+      limit_exceeded.append(relationship.id)
+  modified_objects = get_modified_objects(db.session)
+  log_event(db.session, flush=False)
+  update_memcache_before_commit(request, modified_objects,
+                                CACHE_EXPIRY_COLLECTION)
+  db.session.commit()
+  update_index(db.session, modified_objects)
+  update_memcache_after_commit(request)
+  return {
+      "relationships": len(relationships),
+      "automapping_limit_exceeded": limit_exceeded,
+  }
+
+
 def register_automapping_listeners():
   """Register event listeners for auto mapper."""
   # pylint: disable=unused-variable,unused-argument
@@ -248,14 +428,23 @@ def register_automapping_listeners():
     """Handle bulk creation of relationships.
 
     This handler reuses auto mapper cache and is more efficient than handling
-    one object at a time.
+    one object at a time. With AUTOMAPPING_IN_BACKGROUND setting the
+    automappings are generated by a background task.
 
     Args:
       objects: list of relationship Models.
     """
+    if any(obj is None for obj in objects):
+      logger.warning("Automapping listener: no obj, no mappings created")
+      objects = list(itertools.takewhile(lambda obj: obj is not None,
+                                         objects))
+    if getattr(settings, "AUTOMAPPING_IN_BACKGROUND", False):
+      if objects:
+        enqueue_automappings(objects)
+      return
     automapper = AutomapperGenerator()
     for obj in objects:
-      if obj is None:
-        logger.warning("Automapping listener: no obj, no mappings created")
-        return
       automapper.generate_automappings(obj)
+
+  event.listen(Session, "after_commit", _queue_automapping_task)
+  event.listen(Session, "after_rollback", _clear_automapping_task)
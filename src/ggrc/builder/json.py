@@ -6,6 +6,10 @@
 # pylint: disable=no-name-in-module
 # false positive for RelationshipProperty
 
+import collections
+import itertools
+import threading
+import time
 from datetime import datetime
 
 from flask import g
@@ -13,6 +17,7 @@ import iso8601
 import sqlalchemy
 from sqlalchemy.ext.associationproxy import AssociationProxy
 from sqlalchemy.orm.attributes import InstrumentedAttribute
+from sqlalchemy.orm.properties import ColumnProperty
 from sqlalchemy.orm.properties import RelationshipProperty
 from werkzeug.exceptions import BadRequest
 
@@ -20,6 +25,7 @@ import ggrc.builder
 import ggrc.models
 import ggrc.services
 from ggrc import db
+from ggrc import settings
 from ggrc.login import get_current_user_id
 from ggrc.models.reflection import AttributeInfo
 from ggrc.models.types import JsonType
@@ -483,12 +489,169 @@ def walk_representation(obj):  # noqa
         yield value, index, obj
 
 
-def gather_queries(resource):
-  queries = []
+class StubCache(object):
+  """Process wide cache of rendered stubs for (type, id) pairs.
+
+  Entries expire after a timeout and are dropped when the object is changed
+  in this process, when a newer updated_at of the object is seen or when the
+  shared generation of the object type changes.
+  """
+
+  def __init__(self, max_entries, timeout):
+    self.max_entries = max_entries
+    self.timeout = timeout
+    self.entries = collections.OrderedDict()
+    self.lock = threading.Lock()
+
+  def get(self, key, updated_at=None, generation=None):
+    """Get a cached stub if it is not older than the given updated_at and
+    was cached with the given generation."""
+    with self.lock:
+      entry = self.entries.pop(key, None)
+      if entry is None:
+        return None
+      stub, stub_updated_at, stub_generation, expires = entry
+      if expires < time.time() or stub_generation != generation:
+        return None
+      if updated_at is not None and stub_updated_at != updated_at:
+        return None
+      self.entries[key] = entry
+      return dict(stub)
+
+  def set(self, key, stub, updated_at, generation=None):
+    if not self.timeout:
+      return
+    with self.lock:
+      self.entries.pop(key, None)
+      self.entries[key] = (dict(stub), updated_at, generation,
+                           time.time() + self.timeout)
+      while len(self.entries) > self.max_entries:
+        self.entries.popitem(last=False)
+
+  def evict(self, keys):
+    with self.lock:
+      for key in keys:
+        self.entries.pop(key, None)
+
+
+_stub_cache = None
+
+# Memcache key of a counter incremented when objects of a type are changed
+STUB_GENERATION_KEY = 'stub:generation:{}'
+
+
+def get_stub_cache():
+  """Get the stub cache shared by all requests."""
+  global _stub_cache  # pylint: disable=global-statement
+  if _stub_cache is None:
+    _stub_cache = StubCache(settings.STUB_CACHE_MAX_ENTRIES,
+                            settings.STUB_CACHE_TIMEOUT)
+  return _stub_cache
+
+
+def _get_memcache_client():
+  """Get a memcache client if memcache and the stub cache are enabled."""
+  if not getattr(settings, 'MEMCACHE_MECHANISM', False) or \
+     not get_stub_cache().timeout:
+    return None
+  from google.appengine.api import memcache
+  return memcache.Client()
+
+
+def get_stub_generations(types):
+  """Get shared generations of stubs of the given types.
+
+  Returns:
+    None if memcache is not used, otherwise a dict with generations of the
+    types. Types without a generation must not use cached stubs.
+  """
+  client = _get_memcache_client()
+  if client is None:
+    return None
+  keys = {STUB_GENERATION_KEY.format(type_): type_ for type_ in types}
+  if not keys:
+    return {}
+  generations = client.get_multi(keys.keys())
+  missing = [key for key in keys if key not in generations]
+  if missing:
+    # Generation keys can get evicted, so a new generation must not reuse a
+    # value that could have been used before.
+    client.add_multi({key: int(time.time() * 1000) for key in missing})
+    generations.update(client.get_multi(missing))
+  return {keys[key]: value for key, value in generations.items()}
+
+
+def bump_stub_generations(types):
+  """Invalidate stubs of the given types cached in all processes."""
+  client = _get_memcache_client()
+  if client is None or not types:
+    return
+  client.offset_multi(
+      {STUB_GENERATION_KEY.format(type_): 1 for type_ in types},
+      initial_value=int(time.time() * 1000))
+
+
+@sqlalchemy.event.listens_for(db.session.__class__, 'after_flush')
+def evict_flushed_stubs(session, _):
+  """Drop cached stubs of changed and deleted objects.
+
+  The stubs are dropped again after commit or rollback, because other
+  requests can cache the committed state of the objects until then. Keys of
+  new objects are recorded too, so their uncommitted stubs are not cached.
+  """
+  keys = []
+  for obj in itertools.chain(session.new, session.dirty, session.deleted):
+    obj_id = getattr(obj, "id", None)
+    if obj_id is None:
+      continue
+    # Stubs can be requested with any polymorphic base type name
+    keys.extend((cls.__name__, obj_id) for cls in type(obj).__mro__
+                if hasattr(cls, "__tablename__"))
+  if keys:
+    get_stub_cache().evict(keys)
+    session.info.setdefault("flushed_stubs", set()).update(keys)
+
+
+@sqlalchemy.event.listens_for(db.session.__class__, 'after_commit')
+def evict_committed_stubs(session):
+  """Drop cached stubs of committed objects in all processes."""
+  keys = session.info.pop("flushed_stubs", None)
+  if keys:
+    get_stub_cache().evict(keys)
+    bump_stub_generations({type_ for type_, _ in keys})
+
+
+@sqlalchemy.event.listens_for(db.session.__class__, 'after_rollback')
+def evict_rolled_back_stubs(session):
+  """Drop cached stubs of objects whose changes were rolled back."""
+  keys = session.info.pop("flushed_stubs", None)
+  if keys:
+    get_stub_cache().evict(keys)
+
+
+def gather_stubs(resource):
+  """Collect lazy stubs of the resource in a single walk.
+
+  Returns:
+    tuple of a dict with stub places for every distinct stub and a dict with
+    updated_at values of full object representations by (type, id).
+  """
+  stubs = collections.defaultdict(list)
+  updated_at = {}
   for val, key, obj in walk_representation(resource):
     if isinstance(val, LazyStubRepresentation):
-      queries.append((val.type, val.conditions))
-  return queries
+      stubs[(val.type, val.condition_key, val.condition_val)].append(
+          (val, key, obj))
+    elif (key == 'updated_at' and isinstance(val, datetime) and
+          isinstance(obj, dict) and 'type' in obj and 'id' in obj):
+      updated_at[(obj['type'], obj['id'])] = val
+  return stubs, updated_at
+
+
+def gather_queries(resource):
+  stubs = gather_stubs(resource)[0]
+  return [(val.type, val.conditions)
+          for places in stubs.values() for val, _, _ in places]
 
 
 def reify_representation(resource, results, type_columns):
@@ -498,22 +661,164 @@ def reify_representation(resource, results, type_columns):
   return resource
 
 
-def publish_representation(resource):
-  queries = gather_queries(resource)
+def _get_stub_cache_key(stub_key, generations):
+  """Get (type, id) for cacheable stubs requested only by id."""
+  type_, condition_key, condition_val = stub_key
+  if condition_key != ('id',):
+    return None
+  if generations is not None and type_ not in generations:
+    return None
+  return type_, condition_val[0]
+
+
+def _get_generation(generations, type_):
+  return None if generations is None else generations[type_]
+
+
+def _get_cached_stubs(stubs, updated_at, generations):
+  """Get valid cached stubs by stub key."""
+  stub_cache = get_stub_cache()
+  rendered = {}
+  for stub_key in stubs:
+    cache_key = _get_stub_cache_key(stub_key, generations)
+    if cache_key is None:
+      continue
+    stub = stub_cache.get(cache_key, updated_at.get(cache_key),
+                          _get_generation(generations, cache_key[0]))
+    if stub is not None:
+      rendered[stub_key] = stub
+  return rendered
+
+
+def _query_stubs(missing, generations):
+  """Render the given lazy stubs with a single query and cache them."""
+  results, type_columns, query = build_stub_union_query(
+      [(val.type, val.conditions) for val in missing])
+  for row in query.all():
+    type_ = row[0]
+    for columns, matches in results[type_].items():
+      vals = tuple(row[type_columns[type_][c]] for c in columns)
+      if vals in matches:
+        matches[vals].append(row)
+
+  stub_cache = get_stub_cache()
+  # Stubs of objects flushed in the open transaction are not committed yet
+  flushed = db.session.info.get("flushed_stubs", ())
+  rendered = {}
+  for val in missing:
+    stub_key = (val.type, val.condition_key, val.condition_val)
+    stub = val.render(results, type_columns)
+    rendered[stub_key] = stub
+    cache_key = _get_stub_cache_key(stub_key, generations)
+    if stub is not None and cache_key is not None and \
+       cache_key not in flushed:
+      row = val.get_matches(results)[0]
+      stub_cache.set(cache_key, stub,
+                     row[type_columns[val.type]['updated_at']],
+                     _get_generation(generations, val.type))
+  return rendered
 
-  if len(queries) == 0:
+
+def publish_representation(resource):
+  stubs, updated_at = gather_stubs(resource)
+  if not stubs:
     return resource
-  else:
-    results, type_columns, query = build_stub_union_query(queries)
-    rows = query.all()
-    for row in rows:
-      type_ = row[0]
-      for columns, matches in results[type_].items():
-        vals = tuple(row[type_columns[type_][c]] for c in columns)
-        if vals in matches:
-          matches[vals].append(row)
-
-    return reify_representation(resource, results, type_columns)
+
+  # Generations are read before the query, so that stubs of objects changed
+  # during the query are cached with an outdated generation.
+  generations = get_stub_generations(
+      {type_ for type_, condition_key, _ in stubs if condition_key == ('id',)})
+  rendered = _get_cached_stubs(stubs, updated_at, generations)
+  missing = [places[0][0] for stub_key, places in stubs.items()
+             if stub_key not in rendered]
+  if missing:
+    rendered.update(_query_stubs(missing, generations))
+
+  for stub_key, places in stubs.items():
+    stub = rendered[stub_key]
+    for index, (_, key, obj) in enumerate(places):
+      obj[key] = stub if stub is None or index == 0 else dict(stub)
+  return resource
+
+
+def _get_values_column(model, builder, attr_name):
+  """Get a column and a row value publisher for a published attribute.
+
+  Returns:
+    tuple(column, publish_value) or None if the attribute can only be
+    published from a model instance.
+  """
+  # pylint: disable=protected-access
+  if attr_name in getattr(model, "_custom_publish", {}) or \
+     attr_name in builder._include_links:
+    return None
+  class_attr = getattr(model, attr_name, None)
+  if not isinstance(class_attr, InstrumentedAttribute):
+    return None
+  if isinstance(class_attr.property, ColumnProperty):
+    return class_attr, lambda value: value
+  if not isinstance(class_attr.property, RelationshipProperty):
+    return None
+  prop = class_attr.property
+  local_columns = list(prop.local_columns)
+  if (prop.uselist or prop.backref or len(local_columns) != 1 or
+          prop.mapper.class_.__mapper__.polymorphic_on is not None):
+    return None
+  target_type = prop.mapper.class_.__name__
+  return local_columns[0], lambda value: (
+      LazyStubRepresentation(target_type, value) if value is not None
+      else None)
+
+
+def get_values_publisher(model, fields):
+  """Get a publisher of fields from column values instead of instances.
+
+  Fields of the returned dicts are equal to the same fields of publish(obj),
+  with stubs as LazyStubRepresentation that still need to be published with
+  publish_representation.
+
+  Returns:
+    tuple(columns, publish_row) where publish_row creates the fields dict
+    from a row with the given columns, or None if any of the fields can only
+    be published from a model instance.
+  """
+  # pylint: disable=protected-access
+  mapper = model._sa_class_manager.mapper
+  if mapper.polymorphic_on is not None or \
+     len(list(mapper.self_and_descendants)) > 1:
+    return None
+  builder = get_json_builder(model)
+  publish_attrs = {getattr(attr, "attr_name", attr)
+                   for attr in builder._publish_attrs}
+  model_name = model.__name__
+  columns = [model.id]
+  publishers = []
+  for field in fields:
+    if field == "selfLink":
+      publishers.append((field, lambda row: url_for(model_name, id=row[0])))
+    elif field == "viewLink":
+      publishers.append((field,
+                         lambda row: view_url_for(model_name, id=row[0])))
+    elif field not in publish_attrs:
+      publishers.append((field, lambda row: None))
+    elif field == "type":
+      publishers.append((field, lambda row: model_name))
+    else:
+      column = _get_values_column(model, builder, field)
+      if column is None:
+        return None
+      column, publish_value = column
+      publishers.append((field, _row_value_publisher(len(columns),
+                                                     publish_value)))
+      columns.append(column)
+
+  def publish_row(row):
+    return {field: publish_value(row) for field, publish_value in publishers}
+  return columns, publish_row
+
+
+def _row_value_publisher(index, publish_value):
+  return lambda row: publish_value(row[index])
 
 
 class Builder(AttributeInfo):
@@ -4,4 +4,5 @@
 
 from .localcache import LocalCache
 from .memcache import MemCache
+from .memcache import TieredMemCache
 from .cachemanager import CacheManager
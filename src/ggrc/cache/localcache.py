@@ -1,6 +1,8 @@
 # Copyright (C) 2017 Google Inc.
 # Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
 
+import cPickle
+import threading
 from collections import OrderedDict
 from cache import Cache
 from cache import all_cache_entries
@@ -177,3 +179,75 @@ class LocalCache(Cache):
     """ Print content of cache
     """
     return str(self.cache_entries.keys()) + str(self.cache_entries.values())
+
+
+class LRUCache(object):
+  """ Bounded in-process cache evicting least recently used entries
+
+      Values are stored pickled, so every get returns a new copy that can be
+      changed by the caller. Every entry is stored with a version and is
+      only returned for the same version.
+
+      Attributes:
+        max_entries: maximum number of stored entries
+        max_bytes: maximum total size of stored values
+  """
+
+  def __init__(self, max_entries, max_bytes):
+    self.max_entries = max_entries
+    self.max_bytes = max_bytes
+    self.size = 0
+    self.entries = OrderedDict()
+    self.lock = threading.Lock()
+
+  def get_multi(self, versions):
+    """ Get stored values and mark them as recently used
+
+    Args:
+      versions: dictionary with the expected version of every key. Entries
+                with a different version are dropped.
+    """
+    result = {}
+    with self.lock:
+      for key, version in versions.iteritems():
+        entry = self.entries.pop(key, None)
+        if entry is None:
+          continue
+        self.size -= len(entry[1])
+        if entry[0] == version:
+          self.entries[key] = entry
+          self.size += len(entry[1])
+          result[key] = entry[1]
+    return {key: cPickle.loads(entry) for key, entry in result.iteritems()}
+
+  def set_multi(self, data, versions):
+    """ Store values with their versions, values without one are skipped """
+    with self.lock:
+      for key, value in data.iteritems():
+        if key not in versions:
+          continue
+        entry = cPickle.dumps(value, cPickle.HIGHEST_PROTOCOL)
+        if len(entry) > self.max_bytes:
+          continue
+        self._remove(key)
+        self.entries[key] = (versions[key], entry)
+        self.size += len(entry)
+      while (len(self.entries) > self.max_entries or
+             self.size > self.max_bytes):
+        _, (_, entry) = self.entries.popitem(last=False)
+        self.size -= len(entry)
+
+  def delete_multi(self, keys):
+    with self.lock:
+      for key in keys:
+        self._remove(key)
+
+  def clear(self):
+    with self.lock:
+      self.entries.clear()
+      self.size = 0
+
+  def _remove(self, key):
+    entry = self.entries.pop(key, None)
+    if entry is not None:
+      self.size -= len(entry[1])
@@ -5,13 +5,50 @@
 from google.appengine.api import memcache
 from cache import Cache
 from cache import all_cache_entries
+from localcache import LRUCache
+from serializer import get_serializer
+from collections import deque
 from collections import OrderedDict
 from copy import deepcopy
+import time
+
+from ggrc import settings
 
 """
     Memcache implements the remote AppEngine Memcache mechanism
 
 """
+
+
+def _batches(keys, batch_size):
+  """Split keys into lists of at most batch_size keys."""
+  keys = list(keys)
+  return [keys[i:i + batch_size] for i in range(0, len(keys), batch_size)]
+
+
+def _pipeline(batches, start_rpc, max_in_flight):
+  """Run an async memcache call for every batch with limited concurrency.
+
+  Args:
+    batches: list of batches.
+    start_rpc: function that starts an async call for a batch and returns
+        its rpc object.
+    max_in_flight: maximum number of calls running at once.
+
+  Yields:
+    (batch, result) tuples in the order of batches.
+  """
+  in_flight = deque()
+  for batch in batches:
+    if len(in_flight) >= max_in_flight:
+      done_batch, rpc = in_flight.popleft()
+      yield done_batch, rpc.get_result()
+    in_flight.append((batch, start_rpc(batch)))
+  while in_flight:
+    done_batch, rpc = in_flight.popleft()
+    yield done_batch, rpc.get_result()
+
+
 class MemCache(Cache):
   def __init__(self):
     self.name = 'memcache'
@@ -236,7 +273,182 @@ class MemCache(Cache):
     """
     return self.memcache_client.delete_multi(data, lockadd_seconds)
 
+  @staticmethod
+  def _pipeline_options(batch_size, max_in_flight):
+    if batch_size is None:
+      batch_size = settings.MEMCACHE_BATCH_SIZE
+    if max_in_flight is None:
+      max_in_flight = settings.MEMCACHE_MAX_IN_FLIGHT
+    return batch_size, max_in_flight
+
+  def pipelined_get_multi(self, keys, batch_size=None, max_in_flight=None):
+    """ Get many entries with concurrent batched get_multi calls
+
+    Args:
+      keys: list of memcache keys
+      batch_size: number of keys in a single call, defaults to
+                  MEMCACHE_BATCH_SIZE setting
+      max_in_flight: number of concurrent calls, defaults to
+                     MEMCACHE_MAX_IN_FLIGHT setting
+
+    Returns:
+      dictionary with values of all found keys
+    """
+    batch_size, max_in_flight = self._pipeline_options(batch_size,
+                                                       max_in_flight)
+    serializer = get_serializer()
+    result = {}
+    for _, batch_result in _pipeline(
+            _batches(keys, batch_size),
+            self.memcache_client.get_multi_async,
+            max_in_flight):
+      for key, data in batch_result.iteritems():
+        value = serializer.loads(data)
+        if value is not None:
+          result[key] = value
+    return result
+
+  def pipelined_add_unblocked(self, data, blockers, expiration_time=0,
+                              batch_size=None, max_in_flight=None):
+    """ Add entries that are not blocked by existing blocker entries
+
+    Blocker keys of a batch are checked and its unblocked entries are added
+    as soon as the check finishes, while checks of next batches are running.
+
+    Args:
+      data: dictionary with memcache keys and values to add
+      blockers: dictionary with a blocker key for every key in data, entries
+                are not added if their blocker key exists in memcache
+      expiration_time: expiration time of the added entries
+      batch_size: number of keys in a single call, defaults to
+                  MEMCACHE_BATCH_SIZE setting
+      max_in_flight: number of concurrent calls, defaults to
+                     MEMCACHE_MAX_IN_FLIGHT setting
+
+    Returns:
+      list of added keys
+    """
+    batch_size, max_in_flight = self._pipeline_options(batch_size,
+                                                       max_in_flight)
+    serializer = get_serializer()
+    add_rpcs = deque()
+    added = []
+    for batch, blocked in _pipeline(
+            _batches(data.keys(), batch_size),
+            lambda batch: self.memcache_client.get_multi_async(
+                [blockers[key] for key in batch]),
+            max_in_flight):
+      unblocked = {key: serializer.dumps(data[key]) for key in batch
+                   if blockers[key] not in blocked}
+      if not unblocked:
+        continue
+      if len(add_rpcs) >= max_in_flight:
+        add_rpcs.popleft().get_result()
+      add_rpcs.append(self.memcache_client.add_multi_async(
+          unblocked, expiration_time))
+      added.extend(unblocked)
+    while add_rpcs:
+      add_rpcs.popleft().get_result()
+    return added
+
   def clean(self):
     """ flush everything from memcache """
     return self.memcache_client.flush_all()
 
+
+# Prefix of the memcache keys with versions of entry categories. Versions are
+# incremented whenever entries of the category are removed.
+VERSION_KEY_PREFIX = 'cache:version:'
+
+_local_cache = None
+
+
+def get_local_cache():
+  """Get the in-process cache shared by all requests"""
+  global _local_cache  # pylint: disable=global-statement
+  if _local_cache is None:
+    _local_cache = LRUCache(settings.LOCAL_CACHE_MAX_ENTRIES,
+                            settings.LOCAL_CACHE_MAX_BYTES)
+  return _local_cache
+
+
+def _get_version_key(key):
+  """Get the version key of the category of an entry.
+
+  Entry keys look like 'collection:controls:1', so all entries of a model
+  share the version key 'cache:version:collection:controls'.
+  """
+  return VERSION_KEY_PREFIX + key.rsplit(':', 1)[0]
+
+
+class TieredMemCache(MemCache):
+  """ MemCache with an in-process LRU cache in front of memcache
+
+      Entries removed from memcache in any process increment the shared
+      version of their category. Local entries are only used while the
+      version they were stored with is current, so they are never older than
+      the versions read by the request.
+  """
+
+  def __init__(self):
+    MemCache.__init__(self)
+    self.local_cache = get_local_cache()
+    self.versions = {}
+
+  def _read_versions(self, keys):
+    """ Read shared versions of the categories of the given keys
+
+    Returns:
+      dictionary with versions of keys, keys of unavailable versions are
+      missing.
+    """
+    version_keys = {_get_version_key(key) for key in keys}
+    versions = self.memcache_client.get_multi(list(version_keys))
+    missing = version_keys.difference(versions)
+    if missing:
+      # Version keys can get evicted, so a new version must not reuse a
+      # value that could have been used before.
+      self.memcache_client.add_multi(
+          {key: int(time.time() * 1000) for key in missing})
+      versions.update(self.memcache_client.get_multi(list(missing)))
+    return {key: versions[_get_version_key(key)] for key in keys
+            if _get_version_key(key) in versions}
+
+  def pipelined_get_multi(self, keys, batch_size=None, max_in_flight=None):
+    """ Get entries from the local cache and the missing ones from memcache
+    """
+    self.versions = self._read_versions(keys)
+    result = self.local_cache.get_multi(self.versions)
+    missing = [key for key in keys if key not in result]
+    if missing:
+      remote = MemCache.pipelined_get_multi(self, missing, batch_size,
+                                            max_in_flight)
+      self.local_cache.set_multi(remote, self.versions)
+      result.update(remote)
+    return result
+
+  def pipelined_add_unblocked(self, data, blockers, expiration_time=0,
+                              batch_size=None, max_in_flight=None):
+    """ Add unblocked entries to memcache and the local cache """
+    added = MemCache.pipelined_add_unblocked(
+        self, data, blockers, expiration_time, batch_size, max_in_flight)
+    self.local_cache.set_multi({key: data[key] for key in added},
+                               self.versions)
+    return added
+
+  def remove_multi(self, data, lockadd_seconds):
+    """ Remove entries from memcache and invalidate local caches """
+    result = MemCache.remove_multi(self, data, lockadd_seconds)
+    self.local_cache.delete_multi(data)
+    version_keys = {_get_version_key(key) for key in data
+                    if not key.startswith('DeleteOp:')}
+    if version_keys:
+      self.memcache_client.offset_multi(
+          {key: 1 for key in version_keys},
+          initial_value=int(time.time() * 1000))
+    return result
+
+  def clean(self):
+    """ flush everything from memcache and the local cache """
+    self.local_cache.clear()
+    return MemCache.clean(self)
@@ -0,0 +1,159 @@
+# Copyright (C) 2017 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""Serializers for values stored in memcache.
+
+The serializer is selected with the MEMCACHE_SERIALIZER setting. Values that
+were stored by a different serializer or an older format version are not
+returned as cache hits.
+"""
+
+import cPickle
+import logging
+import struct
+import threading
+import zlib
+
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+
+class PickleSerializer(object):
+  """Serializer that leaves pickling of values to the memcache client."""
+
+  def __init__(self, settings):
+    pass
+
+  @staticmethod
+  def dumps(value):
+    return value
+
+  @staticmethod
+  def loads(data):
+    return data
+
+
+class CompactSerializer(object):
+  """Serializer that stores values in a compact binary form.
+
+  Stored data starts with a header with the format version and flags. Known
+  dict keys are replaced with short tokens before pickling and data larger
+  than MEMCACHE_COMPRESS_THRESHOLD bytes is compressed with zlib.
+  """
+
+  MAGIC = "\x00gc"
+  VERSION = 1
+  HEADER = struct.Struct("!3sBB")
+  COMPRESSED = 1
+
+  # Tokens are indexes in this tuple, so keys can only be appended together
+  # with incrementing VERSION.
+  KEYS = (
+      "id", "type", "href", "selfLink", "viewLink", "context", "context_id",
+      "created_at", "updated_at", "modified_by", "modified_by_id", "title",
+      "slug", "description", "status", "notes", "url", "reference_url",
+      "start_date", "end_date", "os_state", "kind", "display_name", "person",
+      "role", "owners", "contact", "secondary_contact", "object_owners",
+      "object_people", "related_sources", "related_destinations",
+      "custom_attribute_values", "custom_attribute_definitions",
+      "attribute_value", "attribute_object", "attributable_id",
+      "attributable_type", "custom_attribute_id", "contexts", "resources",
+      "conditions", "condition", "terms", "create", "read", "update",
+      "delete", "view_object_page", "__user",
+  )
+  TOKEN_PREFIX = "\x00"
+
+  def __init__(self, settings):
+    self.compress_threshold = settings.MEMCACHE_COMPRESS_THRESHOLD
+    self.stats_sample_rate = settings.MEMCACHE_STATS_SAMPLE_RATE
+    self.tokens = {key: self.TOKEN_PREFIX + chr(index)
+                   for index, key in enumerate(self.KEYS)}
+    self.lock = threading.Lock()
+    self.stats = {"values": 0, "sampled_values": 0, "raw_bytes": 0,
+                  "stored_bytes": 0}
+
+  def _intern(self, value):
+    """Replace known dict keys in the value with tokens."""
+    if isinstance(value, dict):
+      return {self.tokens.get(key, key): self._intern(item)
+              for key, item in value.iteritems()}
+    if isinstance(value, list):
+      return [self._intern(item) for item in value]
+    return value
+
+  def _restore(self, value):
+    """Replace tokens in the value with the original dict keys."""
+    if isinstance(value, dict):
+      return {self._restore_key(key): self._restore(item)
+              for key, item in value.iteritems()}
+    if isinstance(value, list):
+      return [self._restore(item) for item in value]
+    return value
+
+  def _restore_key(self, key):
+    if (isinstance(key, str) and len(key) == 2 and
+            key[0] == self.TOKEN_PREFIX and ord(key[1]) < len(self.KEYS)):
+      return self.KEYS[ord(key[1])]
+    return key
+
+  def _count(self, value, data):
+    """Update metrics of bytes saved compared to the plain pickle.
+
+    Measuring the plain pickle size needs pickling the value again, so it is
+    only done for one of every MEMCACHE_STATS_SAMPLE_RATE values.
+    """
+    with self.lock:
+      self.stats["values"] += 1
+      sampled = (self.stats_sample_rate and
+                 self.stats["values"] % self.stats_sample_rate == 0)
+    if not sampled:
+      return
+    raw_bytes = len(cPickle.dumps(value, cPickle.HIGHEST_PROTOCOL))
+    with self.lock:
+      self.stats["sampled_values"] += 1
+      self.stats["raw_bytes"] += raw_bytes
+      self.stats["stored_bytes"] += len(data)
+    logger.debug("Memcache value stored in %s bytes instead of %s",
+                 len(data), raw_bytes)
+
+  def dumps(self, value):
+    """Serialize the value into a string with a version header."""
+    data = cPickle.dumps(self._intern(value), cPickle.HIGHEST_PROTOCOL)
+    flags = 0
+    if len(data) > self.compress_threshold:
+      data = zlib.compress(data)
+      flags |= self.COMPRESSED
+    data = self.HEADER.pack(self.MAGIC, self.VERSION, flags) + data
+    self._count(value, data)
+    return data
+
+  def loads(self, data):
+    """Deserialize data created by dumps.
+
+    Returns:
+      the stored value or None if the data has a different format version.
+    """
+    if not isinstance(data, str) or not data.startswith(self.MAGIC):
+      return None
+    _, version, flags = self.HEADER.unpack_from(data)
+    if version != self.VERSION:
+      return None
+    data = data[self.HEADER.size:]
+    if flags & self.COMPRESSED:
+      data = zlib.decompress(data)
+    return self._restore(cPickle.loads(data))
+
+  def get_stats(self):
+    """Get numbers of stored values and plain and stored bytes of the
+    sampled values."""
+    with self.lock:
+      stats = dict(self.stats)
+    stats["saved_bytes"] = stats["raw_bytes"] - stats["stored_bytes"]
+    return stats
+
+
+def get_serializer():
+  """Get the serializer selected with the MEMCACHE_SERIALIZER setting."""
+  from ggrc.extensions import get_extension_instance
+  return get_extension_instance(
+      'MEMCACHE_SERIALIZER', 'ggrc.cache.serializer.PickleSerializer')
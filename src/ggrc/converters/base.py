@@ -5,12 +5,14 @@
 
 from collections import defaultdict
 
+from ggrc import models
 from ggrc import settings
 from ggrc.utils import benchmark
 from ggrc.utils import structures
 from ggrc.cache.memcache import MemCache
 from ggrc.converters import get_exportables
 from ggrc.converters.base_block import BlockConverter
+from ggrc.converters.import_helper import equalize_array
 from ggrc.converters.import_helper import extract_relevant_data
 from ggrc.converters.import_helper import split_array
 from ggrc.fulltext import get_indexer
@@ -59,14 +61,17 @@ class Converter(object):
     self.ids_by_type = kwargs.get("ids_by_type", [])
     self.block_converters = []
     self.new_objects = defaultdict(structures.CaseInsensitiveDict)
+    self.object_cache = defaultdict(structures.CaseInsensitiveDict)
     self.shared_state = {}
     self.response_data = []
     self.exportable = get_exportables()
     self.indexer = get_indexer()
+    self.progress_callback = kwargs.get("progress_callback")
 
   def to_array(self):
     with benchmark("Create block converters"):
       self.block_converters_from_ids()
+      self.row_converters_from_ids()
     with benchmark("Handle row data"):
       self.handle_row_data()
     with benchmark("Make block array"):
@@ -90,14 +95,90 @@ class Converter(object):
       csv_data.extend(block_data)
     return csv_data
 
+  def to_array_chunks(self, chunk_size):
+    """Generate the multi block csv array in chunks of rows.
+
+    This produces the same rows as to_block_array, but only one chunk of
+    objects is loaded at a time. Block converters must already be created with
+    block_converters_from_ids. All rows are padded to the width of the widest
+    block, since the rows can not be equalized after they have been sent.
+    """
+    if not self.block_converters:
+      return
+    width = max(len(b.fields) for b in self.block_converters) + 1
+    for block_converter in self.block_converters:
+      block_chunks = block_converter.to_array_chunks(chunk_size)
+      csv_header = next(block_chunks)
+      csv_header.extend([] for _ in range(2 - len(csv_header)))
+      for line in csv_header:
+        line.insert(0, "")
+      csv_header[0][0] = "Object type"
+      csv_header[1][0] = block_converter.name
+      yield equalize_array(csv_header, width)
+      for csv_body in block_chunks:
+        for line in csv_body:
+          line.insert(0, "")
+        self.report_progress()
+        yield equalize_array(csv_body, width)
+      two_empty_lines = [[], []]
+      yield equalize_array(two_empty_lines, width)
+
   def import_csv(self):
     self.block_converters_from_csv()
+    self.prefetch_objects()
     self.row_converters_from_csv()
     self.handle_priority_columns()
     self.import_objects()
     self.import_secondary_objects()
     self.drop_cache()
 
+  @staticmethod
+  def _get_lookup_key(model):
+    """Get the name of the user visible identifier column for the model."""
+    return "email" if model is models.Person else "slug"
+
+  def prefetch_objects(self):
+    """Load all objects referenced by slug or email in the csv file.
+
+    References from all blocks are grouped by model, so that each model needs
+    only a single query, instead of a query for every csv cell. Values that
+    do not match any existing object are cached as None.
+    """
+    references = defaultdict(set)
+    for block_converter in self.block_converters:
+      for model, value in block_converter.get_import_references():
+        references[model].add(value.lower())
+    with benchmark("Prefetch referenced objects"):
+      for model, values in references.iteritems():
+        key = self._get_lookup_key(model)
+        cache = self.object_cache[model]
+        cache.update((value, None) for value in values)
+        query = model.query.filter(getattr(model, key).in_(values))
+        for obj in query:
+          cache[getattr(obj, key)] = obj
+
+  def find_object(self, model, value):
+    """Get an existing object by its slug or email.
+
+    Objects are taken from the lookup cache filled by prefetch_objects and
+    only values that were not prefetched are queried one by one. Objects that
+    did not exist when the import started, but were already created and
+    flushed by an earlier block of this import, are taken from new_objects.
+
+    Returns:
+      Object with the given slug or email or None if it does not exist.
+    """
+    cache = self.object_cache[model]
+    if value not in cache:
+      key = self._get_lookup_key(model)
+      cache[value] = model.query.filter_by(**{key: value}).first()
+    obj = cache[value]
+    if obj is None and not self.dry_run:
+      new_obj = self.new_objects[model].get(value)
+      if new_obj is not None and new_obj.id is not None:
+        obj = new_obj
+    return obj
+
   def handle_priority_columns(self):
     for attr_name in self.priority_columns:
       for block_converter in self.block_converters:
@@ -126,9 +207,12 @@ class Converter(object):
                                        fields=fields, object_ids=object_ids,
                                        class_name=class_name)
       block_converter.check_block_restrictions()
-      block_converter.row_converters_from_ids()
       self.block_converters.append(block_converter)
 
+  def row_converters_from_ids(self):
+    for converter in self.block_converters:
+      converter.row_converters_from_ids()
+
   def block_converters_from_csv(self):
     """Prepare BlockConverters and order them like specified in
     self.CLASS_ORDER.
@@ -155,11 +239,25 @@ class Converter(object):
     for converter in self.block_converters:
       converter.handle_row_data()
       converter.import_objects()
+      self.report_progress()
 
   def import_secondary_objects(self):
     for converter in self.block_converters:
       converter.import_secondary_objects(self.new_objects)
 
+  def report_progress(self):
+    """Send the number of processed rows in each block to progress_callback.
+
+    This is used for reporting progress of imports and exports that run in
+    background tasks.
+    """
+    if self.progress_callback is None:
+      return
+    self.progress_callback([
+        block_converter.get_progress()
+        for block_converter in self.block_converters
+    ])
+
   def get_info(self):
     for converter in self.block_converters:
       self.response_data.append(converter.get_info())
@@ -21,6 +21,7 @@ from ggrc import db
 from ggrc import models
 from ggrc.rbac import permissions
 from ggrc.utils import benchmark
+from ggrc.utils import generate_query_chunks
 from ggrc.utils import structures
 from ggrc.converters import errors
 from ggrc.converters import get_shared_unique_rules
@@ -111,6 +112,7 @@ class BlockConverter(object):
     self.row_errors = []
     self.row_warnings = []
     self.row_converters = []
+    self.processed_rows = 0
     self.ignore = False
     self._has_non_importable_columns = False
     # For import contains model name from csv file.
@@ -348,6 +350,19 @@ class BlockConverter(object):
     csv_body = self.generate_csv_body()
     return csv_header, csv_body
 
+  def to_array_chunks(self, chunk_size):
+    """Generate csv header followed by chunks of csv body for export.
+
+    The first generated item is the 2D header array and every next item is a
+    2D array with at most chunk_size rows.
+    """
+    yield self.generate_csv_header()
+    for row_converters in self.row_converters_chunks_from_ids(chunk_size):
+      for row_converter in row_converters:
+        row_converter.handle_row_data()
+      self.processed_rows += len(row_converters)
+      yield self.generate_csv_body()
+
   def get_header_names(self):
     """ Get all posible user column names for current object """
     header_names = {
@@ -390,6 +405,20 @@ class BlockConverter(object):
         removed_count += 1
     return clean_headers
 
+  def get_import_references(self):
+    """Generate (model, value) pairs of objects referenced in block rows.
+
+    See ColumnHandler.get_import_references for details.
+    """
+    if self.ignore:
+      return
+    for index, header_dict in enumerate(self.headers.values()):
+      handler = header_dict["handler"]
+      for row in self.rows:
+        for reference in handler.get_import_references(row[index],
+                                                       **header_dict):
+          yield reference
+
   def remove_column(self, index):
     """ Remove a column from all rows """
     for row in self.rows:
@@ -418,6 +447,30 @@ class BlockConverter(object):
                          headers=self.headers, index=i)
       self.row_converters.append(row)
 
+  def row_converters_chunks_from_ids(self, chunk_size):
+    """Generate row converters for exported objects one chunk at a time.
+
+    Only row converters for the current chunk are held in row_converters so
+    that memory usage does not grow with the number of exported objects. Caches
+    that are built from the current row converters are dropped between chunks.
+    """
+    if self.ignore or not self.object_ids:
+      return
+    query = self.object_class.eager_query().filter(
+        self.object_class.id.in_(self.object_ids))
+    index = 0
+    for objects in generate_query_chunks(query, chunk_size):
+      self._owners_cache = None
+      self._user_roles_cache = None
+      self.row_converters = []
+      for obj in objects:
+        row = RowConverter(self, self.object_class, obj=obj,
+                           headers=self.headers, index=index)
+        self.row_converters.append(row)
+        index += 1
+      yield self.row_converters
+    self.row_converters = []
+
   def handle_row_data(self, field_list=None):
     """Call handle row data on all row converters.
 
@@ -471,6 +524,14 @@ class BlockConverter(object):
 
     return info
 
+  def get_progress(self):
+    """Get the number of processed rows for import and export progress."""
+    return {
+        "name": self.name,
+        "rows": len(self.rows) or len(self.object_ids),
+        "processed": self.processed_rows,
+    }
+
   def import_secondary_objects(self, slugs_dict):
     for row_converter in self.row_converters:
       row_converter.setup_secondary_objects(slugs_dict)
@@ -525,6 +586,7 @@ class BlockConverter(object):
       import_event = self.save_import()
       for row_converter in self.row_converters:
         row_converter.send_post_commit_signals(event=import_event)
+    self.processed_rows = len(self.row_converters)
 
   def clean_session_from_ignored_objs(self):
     """Clean DB session from ignored objects.
@@ -12,6 +12,7 @@ from sqlalchemy.orm import load_only
 
 from ggrc import db
 from ggrc import models
+from ggrc import settings
 from ggrc.converters.autocast import autocast
 from ggrc.converters.exceptions import BadQueryException
 from ggrc.fulltext.mysql import MysqlRecordProperty as Record
@@ -273,6 +274,64 @@ def relevant(exp, object_class, target_class, query):
   return object_class.id == ids_qs.c.relationships_source_id
 
 
+class SharedExpression(object):
+  """Objects matching a sub-expression used by several queries.
+
+  Matching ids are stored if there are at most SHARED_EXPRESSION_MAX_IDS of
+  them. Otherwise the ids are selected by a subquery.
+  """
+
+  def __init__(self, ids, ids_subquery=None, similar_objects_query=None):
+    self.ids = ids
+    self.ids_subquery = ids_subquery
+    self.similar_objects_query = similar_objects_query
+
+  def build(self, object_class):
+    """Make a filtering expression from the stored ids or subquery."""
+    if self.similar_objects_query is not None:
+      flask.g.similar_objects_query = self.similar_objects_query
+    if self.ids_subquery is not None:
+      return object_class.id.in_(
+          sqlalchemy.select([self.ids_subquery.c.id]))
+    if self.ids:
+      return object_class.id.in_(self.ids)
+    return sqlalchemy.sql.false()
+
+
+def get_shared_key(exp, object_class):
+  """Get a key of a sub-expression that can be shared between queries.
+
+  Returns:
+    a key that is equal for sub-expressions matching the same objects or None
+    if the sub-expression can not be shared.
+  """
+  operation = exp.get("op", {}).get("name")
+  if operation not in SHARED_OPS:
+    return None
+  if operation == "text_search":
+    return operation, object_class.__name__, exp.get("text")
+  if exp.get("object_name") == "__previous__":
+    return None
+  return (operation, object_class.__name__, exp.get("object_name"),
+          tuple(exp.get("ids", ())))
+
+
+def share_expression(exp, object_class, target_class, query):
+  """Get ids of objects matching a sub-expression to reuse them later."""
+  operation = OPS[exp["op"]["name"]]
+  expression = operation(exp, object_class, target_class, query)
+  similar_objects_query = getattr(flask.g, "similar_objects_query", None)
+  if similar_objects_query is not None:
+    delattr(flask.g, "similar_objects_query")
+  ids_query = db.session.query(object_class.id).filter(expression).distinct()
+  max_ids = settings.SHARED_EXPRESSION_MAX_IDS
+  ids = [row.id for row in ids_query.limit(max_ids + 1)]
+  if len(ids) > max_ids:
+    return SharedExpression(None, ids_query.subquery(),
+                            similar_objects_query)
+  return SharedExpression(ids, similar_objects_query=similar_objects_query)
+
+
 def build_expression(exp, object_class, target_class, query):
   """Make an SQLAlchemy filtering expression from exp expression tree."""
   if OPS.get(exp.get("op", {}).get("name")) is None:
@@ -280,6 +339,11 @@ def build_expression(exp, object_class, target_class, query):
   exp = autocast(exp, target_class)
   if not exp:
     raise BadQueryException("Invalid filter data")
+  shared_expressions = getattr(flask.g, "shared_expressions", None)
+  if shared_expressions:
+    key = get_shared_key(exp, object_class)
+    if key in shared_expressions:
+      return shared_expressions[key].build(object_class)
   operation = OPS.get(exp.get("op", {}).get("name")) or unknown
   return operation(exp, object_class, target_class, query)
 
@@ -316,3 +380,7 @@ OPS = {
     "text_search": text_search,
     "is": is_filter,
 }
+
+# Operations that are run only once when several queries in a request use
+# the same sub-expression
+SHARED_OPS = {"relevant", "similar", "text_search"}
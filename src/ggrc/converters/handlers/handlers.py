@@ -64,6 +64,24 @@ class ColumnHandler(object):
     if options.get("parse"):
       self.set_value()
 
+  @classmethod
+  def get_import_references(cls, raw_value, **options):
+    """Get objects referenced by a raw csv cell value.
+
+    This is used for loading all referenced objects before any row gets
+    handled, so handlers can get them from the converter lookup cache.
+
+    Args:
+      raw_value (basestring): unmodified csv cell value.
+      **options: column definition for the current column.
+
+    Returns:
+      list of (model, value) tuples, where value is the slug or email of the
+      referenced object.
+    """
+    # pylint: disable=unused-argument
+    return []
+
   def check_unique_consistency(self):
     """Returns true if no object exists with the same unique field."""
     if not self.unique:
@@ -203,6 +221,11 @@ class StatusColumnHandler(ColumnHandler):
 class UserColumnHandler(ColumnHandler):
   """ Handler for primary and secondary contacts """
 
+  @classmethod
+  def get_import_references(cls, raw_value, **options):
+    emails = filter(unicode.strip, raw_value.splitlines())  # noqa
+    return [(Person, email.strip().lower()) for email in emails]
+
   def get_users_list(self):
     users = set()
     email_lines = self.raw_value.splitlines()
@@ -217,10 +240,10 @@ class UserColumnHandler(ColumnHandler):
     return list(users)
 
   def get_person(self, email):
-    new_objects = self.row_converter.block_converter.converter.new_objects
-    if email not in new_objects[Person]:
-      new_objects[Person][email] = Person.query.filter_by(email=email).first()
-    return new_objects[Person].get(email)
+    converter = self.row_converter.block_converter.converter
+    if email in converter.new_objects[Person]:
+      return converter.new_objects[Person][email]
+    return converter.find_object(Person, email)
 
   def parse_item(self):
     email = self.raw_value.lower()
@@ -394,6 +417,14 @@ class MappingColumnHandler(ColumnHandler):
     self.unmap = self.key.startswith(AttributeInfo.UNMAPPING_PREFIX)
     super(MappingColumnHandler, self).__init__(row_converter, key, **options)
 
+  @classmethod
+  def get_import_references(cls, raw_value, **options):
+    mapping_object = get_exportables().get(options.get("attr_name", ""))
+    if not mapping_object:
+      return []
+    slugs = set(slug.strip().lower() for slug in raw_value.splitlines())
+    return [(mapping_object, slug) for slug in slugs if slug]
+
   def parse_item(self):
     """Parse a list of slugs to be mapped.
 
@@ -419,8 +450,9 @@ class MappingColumnHandler(ColumnHandler):
     lines = set(self.raw_value.splitlines())
     slugs = set([slug.lower() for slug in lines if slug.strip()])
     objects = []
+    converter = self.row_converter.block_converter.converter
     for slug in slugs:
-      obj = class_.query.filter_by(slug=slug).first()
+      obj = converter.find_object(class_, slug)
       if obj:
         if permissions.is_allowed_update_for(obj):
           objects.append(obj)
@@ -534,6 +566,13 @@ class ParentColumnHandler(ColumnHandler):
   def __init__(self, row_converter, key, **options):
     super(ParentColumnHandler, self).__init__(row_converter, key, **options)
 
+  @classmethod
+  def get_import_references(cls, raw_value, **options):
+    slug = raw_value.strip()
+    if cls.parent is None or not slug:
+      return []
+    return [(cls.parent, slug)]
+
   def parse_item(self):
     """ get parent object """
     # pylint: disable=protected-access
@@ -543,7 +582,8 @@ class ParentColumnHandler(ColumnHandler):
     slug = self.raw_value
     obj = self.new_objects.get(self.parent, {}).get(slug)
     if obj is None:
-      obj = self.parent.query.filter(self.parent.slug == slug).first()
+      converter = self.row_converter.block_converter.converter
+      obj = converter.find_object(self.parent, slug)
     if obj is None:
       self.add_error(errors.UNKNOWN_OBJECT,
                      object_type=self.parent._inflector.human_singular.title(),
@@ -583,9 +623,7 @@ class ParentColumnHandler(ColumnHandler):
 class ProgramColumnHandler(ParentColumnHandler):
   """Handler for program column on audit imports."""
 
-  def __init__(self, row_converter, key, **options):
-    self.parent = Program
-    super(ProgramColumnHandler, self).__init__(row_converter, key, **options)
+  parent = Program
 
   def set_obj_attr(self):
     if self.row_converter.is_new:
@@ -594,18 +632,28 @@ class ProgramColumnHandler(ParentColumnHandler):
 
 class SectionDirectiveColumnHandler(MappingColumnHandler):
 
+  ALLOWED_DIRECTIVES = [Policy, Regulation, Standard, Contract]
+
+  @classmethod
+  def get_import_references(cls, raw_value, **options):
+    slug = raw_value.strip()
+    if not slug:
+      return []
+    return [(directive_class, slug) for directive_class
+            in cls.ALLOWED_DIRECTIVES]
+
   def get_directive_from_slug(self, directive_class, slug):
     if slug in self.new_objects[directive_class]:
       return self.new_objects[directive_class][slug]
-    return directive_class.query.filter_by(slug=slug).first()
+    converter = self.row_converter.block_converter.converter
+    return converter.find_object(directive_class, slug)
 
   def parse_item(self):
     """ get a directive from slug """
-    allowed_directives = [Policy, Regulation, Standard, Contract]
     if self.raw_value == "":
       return None
     slug = self.raw_value
-    for directive_class in allowed_directives:
+    for directive_class in self.ALLOWED_DIRECTIVES:
       directive = self.get_directive_from_slug(directive_class, slug)
       if directive is not None:
         return [directive]
@@ -653,8 +701,9 @@ class AuditColumnHandler(MappingColumnHandler):
 
 class RequestAuditColumnHandler(ParentColumnHandler):
 
+  parent = Audit
+
   def __init__(self, row_converter, key, **options):
-    self.parent = Audit
     super(RequestAuditColumnHandler, self) \
         .__init__(row_converter, "audit", **options)
 
@@ -793,9 +842,7 @@ class ControlAssertionColumnHandler(CategoryColumnHandler):
 
 class RequestColumnHandler(ParentColumnHandler):
 
-  def __init__(self, row_converter, key, **options):
-    self.parent = Request
-    super(RequestColumnHandler, self).__init__(row_converter, key, **options)
+  parent = Request
 
 
 class DocumentsColumnHandler(ColumnHandler):
@@ -68,6 +68,23 @@ def generate_csv_string(csv_data):
   return body
 
 
+def generate_csv_chunks(csv_chunks):
+  """ Turn chunks of 2d string arrays into chunks of a csv file string
+
+  Rows are not equalized, so all chunks must already contain rows of the same
+  length.
+  """
+  output_buffer = StringIO()
+  writer = csv.writer(output_buffer)
+  for csv_data in csv_chunks:
+    for row in utf_8_encode_array(csv_data):
+      writer.writerow(row)
+    yield output_buffer.getvalue()
+    output_buffer.seek(0)
+    output_buffer.truncate()
+  output_buffer.close()
+
+
 def extract_relevant_data(csv_data):
   """ Split csv data into data and metadata """
   striped_data = [[unicode.strip(c) for c in line]
@@ -80,11 +97,16 @@ def extract_relevant_data(csv_data):
   return column_definitions, data
 
 
-def equalize_array(array):
-  """ Expand all rows of 2D array to the same length """
+def equalize_array(array, max_length=None):
+  """ Expand all rows of 2D array to the same length
+
+  If max_length is not given, rows are expanded to the length of the longest
+  row in the array.
+  """
   if len(array) == 0:
     return array
-  max_length = max([len(i) for i in array])
+  if max_length is None:
+    max_length = max([len(i) for i in array])
   for row in array:
     diff = max_length - len(row)
     row.extend([""] * diff)
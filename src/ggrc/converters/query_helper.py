@@ -6,13 +6,19 @@
 # flake8: noqa
 import collections
 import datetime
+import threading
+from multiprocessing.pool import ThreadPool
 
 import flask
+import flask_login
 import sqlalchemy as sa
 
 from ggrc import db
 from ggrc import models
+from ggrc import settings
 from ggrc.fulltext.mysql import MysqlRecordProperty as Record
+from ggrc.login import get_current_user_id
+from ggrc.login import get_login_module
 from ggrc.models import inflector
 from ggrc.rbac import context_query_filter
 from ggrc.utils import query_helpers, benchmark
@@ -20,6 +26,39 @@ from ggrc.converters import custom_operators
 from ggrc.converters.exceptions import BadQueryException
 
 
+# Request globals that object queries read in worker threads. Other globals,
+# like permission caches, are not thread safe and are built by every worker.
+WORKER_GLOBALS = ("_request_permissions", "shared_expressions")
+
+_worker_slots = None
+
+
+def _get_worker_slots():
+  """Get the semaphore limiting running query workers of all requests."""
+  global _worker_slots  # pylint: disable=global-statement
+  if _worker_slots is None:
+    _worker_slots = threading.BoundedSemaphore(settings.QUERY_WORKERS)
+  return _worker_slots
+
+
+def _run_query_in_worker(args):
+  """Run an object query in a new request context of a worker thread.
+
+  The worker gets its own database session and uses WORKER_GLOBALS and the
+  user of the request that started the query. At most QUERY_WORKERS workers
+  of all requests in the process run at once.
+  """
+  from ggrc.app import app
+  from ggrc.models.person import Person
+  run_query, object_query, user_id, request_globals = args
+  with _get_worker_slots(), app.test_request_context():
+    for name, value in request_globals.iteritems():
+      setattr(flask.g, name, value)
+    if user_id is not None and get_login_module():
+      flask_login.login_user(Person.query.get(user_id))
+    run_query(object_query)
+
+
 # pylint: disable=too-few-public-methods
 
 class QueryHelper(object):
@@ -201,11 +240,103 @@ class QueryHelper(object):
     Returns:
       list of dicts: same query as the input with all ids that match the filter
     """
-    for object_query in self.query:
-      ids = self._get_ids(object_query)
-      object_query["ids"] = ids
+    def set_ids(object_query):
+      object_query["ids"] = self._get_ids(object_query)
+    self._run_queries(set_ids)
     return self.query
 
+  @staticmethod
+  def _iter_shared_candidates(expression):
+    """Get all sub-expressions joined with AND and OR operations."""
+    if not isinstance(expression, dict):
+      return
+    if expression.get("op", {}).get("name") in ("AND", "OR"):
+      for node in (expression.get("left"), expression.get("right")):
+        for exp in QueryHelper._iter_shared_candidates(node):
+          yield exp
+    else:
+      yield expression
+
+  def _get_shared_expressions(self):
+    """Run sub-expressions used by several object queries only once.
+
+    Returns:
+      dict of SharedExpression objects by the sub-expression key.
+    """
+    usages = collections.defaultdict(list)
+    for object_query in self.query:
+      object_class = inflector.get_model(object_query["object_name"])
+      if object_class is None:
+        continue
+      tgt_class = object_class
+      if object_query["object_name"] == "Snapshot":
+        child_type = self._get_snapshot_child_type(object_query)
+        tgt_class = getattr(models.all_models, child_type, object_class)
+      expression = object_query.get("filters", {}).get("expression")
+      for exp in self._iter_shared_candidates(expression):
+        key = custom_operators.get_shared_key(exp, object_class)
+        if key is not None:
+          usages[key].append((exp, object_class, tgt_class))
+    shared_expressions = {}
+    for key, key_usages in usages.iteritems():
+      if len(key_usages) > 1:
+        exp, object_class, tgt_class = key_usages[0]
+        with benchmark("Run shared sub-expression {}".format(key[0])):
+          shared_expressions[key] = custom_operators.share_expression(
+              exp, object_class, tgt_class, self.query)
+    return shared_expressions
+
+  def _uses_previous(self, object_query):
+    """Check if the object query filters by results of other queries."""
+    expression = object_query.get("filters", {}).get("expression")
+    return any(exp.get("object_name") == "__previous__"
+               for exp in self._iter_shared_candidates(expression))
+
+  def _get_query_groups(self):
+    """Split object queries into groups that can run in parallel.
+
+    A query that uses results of previous queries starts a new group, so it
+    runs after all previous queries are done.
+    """
+    groups = [[]]
+    for object_query in self.query:
+      if groups[-1] and self._uses_previous(object_query):
+        groups.append([])
+      groups[-1].append(object_query)
+    return groups
+
+  def _run_queries(self, run_query):
+    """Run run_query for every object query in self.query.
+
+    Sub-expressions that are used by several object queries run only once.
+    Independent object queries run in parallel in separate database sessions
+    if QUERY_WORKERS setting is greater than 1.
+    """
+    flask.g.shared_expressions = self._get_shared_expressions()
+    pool = None
+    try:
+      for group in self._get_query_groups():
+        if settings.QUERY_WORKERS <= 1 or len(group) == 1:
+          for object_query in group:
+            run_query(object_query)
+          continue
+        if pool is None:
+          # Threads must not outlive the request on App Engine
+          pool = ThreadPool(min(settings.QUERY_WORKERS, len(self.query)))
+        user_id = get_current_user_id()
+        request_globals = {name: getattr(flask.g, name)
+                           for name in WORKER_GLOBALS
+                           if hasattr(flask.g, name)}
+        pool.map(_run_query_in_worker, [
+            (run_query, object_query, user_id, request_globals)
+            for object_query in group
+        ])
+    finally:
+      if pool is not None:
+        pool.close()
+        pool.join()
+      delattr(flask.g, "shared_expressions")
+
   @staticmethod
   def _get_type_query(model, permission_type):
     """Filter by contexts and resources
@@ -14,6 +14,12 @@ class Indexer(object):
   def create_record(self, record):
     raise NotImplementedError()
 
+  def create_records(self, records):
+    raise NotImplementedError()
+
+  def replace_records(self, records):
+    raise NotImplementedError()
+
   def update_record(self, record):
     raise NotImplementedError()
 
@@ -0,0 +1,286 @@
+# Copyright (C) 2017 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""Parallel and resumable rebuild of the full text index.
+
+The full index is built into a shadow table while the current index stays
+searchable. The work is split into units of (model, id range) that can be
+processed by a pool of worker processes. Every finished unit is recorded in a
+checkpoint table, so an interrupted reindex continues with the remaining
+units when it is started again.
+
+When all units are done, objects that were changed or deleted while the
+reindex was running get updated in the shadow table and the shadow table
+atomically replaces the full text table. Changes committed between that
+update and the swap were indexed into the replaced table, so they are
+updated once more in the new full text table.
+"""
+
+import logging
+import multiprocessing
+
+import sqlalchemy as sa
+from flask import g
+
+from ggrc import db
+from ggrc import settings
+from ggrc.fulltext import get_indexed_model_names
+from ggrc.fulltext import get_indexer
+from ggrc.fulltext.mysql import MysqlRecordProperty
+from ggrc.fulltext.recordbuilder import fts_record_for
+from ggrc.models import all_models
+from ggrc.models.inflector import get_model
+from ggrc.snapshotter.datastructures import Pair
+from ggrc.snapshotter.indexer import reindex_pairs
+from ggrc.utils import benchmark
+
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+RECORD_TABLE = MysqlRecordProperty.__table__
+SHADOW_TABLE_NAME = "{}_shadow".format(RECORD_TABLE.name)
+OLD_TABLE_NAME = "{}_old".format(RECORD_TABLE.name)
+
+_metadata = sa.MetaData()
+
+shadow_table = sa.Table(
+    SHADOW_TABLE_NAME, _metadata,
+    *[column.copy() for column in RECORD_TABLE.columns]
+)
+
+checkpoint_table = sa.Table(
+    "fulltext_reindex_checkpoints", _metadata,
+    sa.Column("model", sa.String(64), primary_key=True),
+    sa.Column("start_id", sa.Integer, primary_key=True, autoincrement=False),
+    sa.Column("completed_at", sa.DateTime, nullable=False),
+)
+
+# Single row with the time when the current reindex was started.
+state_table = sa.Table(
+    "fulltext_reindex_state", _metadata,
+    sa.Column("id", sa.Integer, primary_key=True, autoincrement=False),
+    sa.Column("started_at", sa.DateTime, nullable=False),
+)
+
+# People data used by the record builder in worker processes.
+_people_map = None
+
+
+def get_reindexed_model_names():
+  """Get names of all models that have full text records."""
+  return sorted(get_indexed_model_names() | {"Snapshot"})
+
+
+def _get_people_map():
+  people = db.session.query(all_models.Person.id, all_models.Person.name,
+                            all_models.Person.email)
+  return {p.id: (p.name, p.email) for p in people}
+
+
+def _prepare_tables(resume):
+  """Create shadow and checkpoint tables unless an unfinished reindex exists.
+
+  The start time of a new reindex is stored before any unit is indexed.
+
+  Returns:
+    set of (model, start_id) tuples for units that are already done.
+  """
+  engine = db.engine
+  if (resume and engine.has_table(SHADOW_TABLE_NAME) and
+          engine.has_table(checkpoint_table.name) and
+          engine.has_table(state_table.name)):
+    done = {tuple(row) for row in engine.execute(
+        sa.select([checkpoint_table.c.model, checkpoint_table.c.start_id]))}
+    logger.info("Resuming reindex with %s finished units", len(done))
+    return done
+  engine.execute("DROP TABLE IF EXISTS {}".format(SHADOW_TABLE_NAME))
+  for table in (checkpoint_table, state_table):
+    table.drop(engine, checkfirst=True)
+    table.create(engine)
+  engine.execute(state_table.insert().values(id=1, started_at=sa.func.now()))
+  engine.execute("CREATE TABLE {} LIKE {}".format(
+      SHADOW_TABLE_NAME, RECORD_TABLE.name))
+  return set()
+
+
+def get_units(model_name, chunk_size, done=()):
+  """Generate work units for all objects of the model.
+
+  Id ranges are aligned to the chunk size, so units stay the same if the
+  reindex is interrupted and started again.
+
+  Returns:
+    generator of (model_name, start_id, end_id) tuples for units that are
+    not done yet.
+  """
+  model = get_model(model_name)
+  min_id, max_id = db.session.query(
+      sa.func.min(model.id), sa.func.max(model.id)).one()
+  if min_id is None:
+    return
+  for start_id in xrange(min_id // chunk_size * chunk_size, max_id + 1,
+                         chunk_size):
+    if (model_name, start_id) not in done:
+      yield model_name, start_id, start_id + chunk_size
+
+
+def _get_model_query(model):
+  mapper_class = model._sa_class_manager.mapper.base_mapper.class_  # noqa # pylint: disable=protected-access
+  return model.query.options(
+      db.undefer_group(mapper_class.__name__ + '_complete'),
+  )
+
+
+def _reindex_snapshots(query, table=shadow_table):
+  """Reindex snapshots from the query into the given table."""
+  pairs = {Pair.from_4tuple(row) for row in query.with_entities(
+      all_models.Snapshot.parent_type,
+      all_models.Snapshot.parent_id,
+      all_models.Snapshot.child_type,
+      all_models.Snapshot.child_id,
+  )}
+  if pairs:
+    reindex_pairs(pairs, table)
+
+
+def index_unit(unit):
+  """Write full text records for all objects in the unit to the shadow table.
+
+  Args:
+    unit: (model_name, start_id, end_id) tuple.
+  """
+  model_name, start_id, end_id = unit
+  model = get_model(model_name)
+  query = _get_model_query(model).filter(
+      model.id >= start_id, model.id < end_id)
+  if model_name == "Snapshot":
+    _reindex_snapshots(query)
+  else:
+    # Rows of a unit that was interrupted halfway are replaced.
+    get_indexer().replace_records(
+        [fts_record_for(instance) for instance in query],
+        commit=False, table=shadow_table)
+  db.session.execute(checkpoint_table.insert().values(
+      model=model_name, start_id=start_id, completed_at=sa.func.now()))
+  db.session.commit()
+  return unit
+
+
+def _init_worker():
+  """Prepare a worker process for indexing units."""
+  global _people_map  # pylint: disable=global-statement
+  _people_map = _get_people_map()
+  db.session.remove()
+
+
+def _index_unit_in_worker(unit):
+  """Index a unit in a worker process."""
+  from ggrc.app import app
+  with app.app_context():
+    g.people_map = _people_map
+    try:
+      return index_unit(unit)
+    except:  # pylint: disable=bare-except
+      logger.exception("Reindex failed for %s", unit)
+      db.session.rollback()
+      return None
+
+
+def _index_units(units, workers):
+  """Index all units, in a pool of worker processes if workers > 1."""
+  if workers <= 1:
+    for unit in units:
+      index_unit(unit)
+    return
+  # Forked workers must not share connections with the current process.
+  db.session.commit()
+  db.session.remove()
+  db.engine.dispose()
+  pool = multiprocessing.Pool(workers, initializer=_init_worker)
+  try:
+    failed = [unit for unit, result in zip(
+        units, pool.imap(_index_unit_in_worker, units)) if result is None]
+  finally:
+    pool.close()
+    pool.join()
+  if failed:
+    raise RuntimeError(
+        "Reindex failed for {} units and can be resumed".format(len(failed)))
+
+
+def _update_changed_objects(model_names, changed_since, table):
+  """Update records of objects changed since the given time in the table.
+
+  Objects that changed while the reindex was running could have been indexed
+  before the change, so they are indexed again. Records of objects that were
+  deleted in the meantime are removed.
+  """
+  for model_name in model_names:
+    model = get_model(model_name)
+    query = _get_model_query(model).filter(model.updated_at >= changed_since)
+    if model_name == "Snapshot":
+      _reindex_snapshots(query, table)
+    else:
+      get_indexer().replace_records(
+          [fts_record_for(instance) for instance in query],
+          commit=False, table=table)
+    if model_name != "CustomAttributeValue":
+      model_table = model.__table__
+      db.session.execute(table.delete().where(sa.and_(
+          table.c.type == model_name,
+          ~sa.exists().where(model_table.c.id == table.c.key),
+      )))
+    db.session.commit()
+
+
+def _swap_tables():
+  """Replace the full text table with the shadow table."""
+  engine = db.engine
+  engine.execute("DROP TABLE IF EXISTS {}".format(OLD_TABLE_NAME))
+  engine.execute("RENAME TABLE {live} TO {old}, {shadow} TO {live}".format(
+      live=RECORD_TABLE.name, old=OLD_TABLE_NAME, shadow=SHADOW_TABLE_NAME))
+  engine.execute("DROP TABLE {}".format(OLD_TABLE_NAME))
+
+
+def _drop_reindex_tables():
+  engine = db.engine
+  checkpoint_table.drop(engine)
+  state_table.drop(engine)
+
+
+def reindex(resume=True, workers=None, chunk_size=None):
+  """Rebuild the full text index for all indexed models and snapshots.
+
+  Args:
+    resume: continue an unfinished reindex if one exists.
+    workers: number of worker processes. Defaults to REINDEX_WORKERS setting.
+    chunk_size: number of ids in a single unit. Defaults to
+        REINDEX_CHUNK_SIZE setting.
+  """
+  if workers is None:
+    workers = settings.REINDEX_WORKERS
+  if getattr(settings, "APP_ENGINE", False):
+    workers = 1
+  if chunk_size is None:
+    chunk_size = settings.REINDEX_CHUNK_SIZE
+  model_names = get_reindexed_model_names()
+  done = _prepare_tables(resume)
+
+  started_at = db.session.query(state_table.c.started_at).scalar()
+
+  g.people_map = _get_people_map()
+  try:
+    units = [unit for model_name in model_names
+             for unit in get_units(model_name, chunk_size, done)]
+    with benchmark("Index {} units".format(len(units))):
+      _index_units(units, workers)
+    with benchmark("Update objects changed during reindex"):
+      caught_up_at = db.session.query(sa.func.now()).scalar()
+      _update_changed_objects(model_names, started_at, shadow_table)
+    with benchmark("Swap full text tables"):
+      _swap_tables()
+    with benchmark("Update objects changed before the swap"):
+      _update_changed_objects(model_names, caught_up_at, RECORD_TABLE)
+  finally:
+    delattr(g, "people_map")
+  _drop_reindex_tables()
@@ -3,37 +3,164 @@
 
 """SQL routines for full-text indexing."""
 
+from sqlalchemy import and_
+from sqlalchemy import bindparam
+from sqlalchemy import tuple_
+
 from ggrc import db
 from ggrc.fulltext import Indexer
 
 
 class SqlIndexer(Indexer):
+
+  # Maximum number of rows written or deleted with a single statement
+  BATCH_SIZE = 1000
+
+  @staticmethod
+  def _get_record_contents(record):
+    """Get indexed content of the record by property and subproperty.
+
+    Returns:
+      dict with (property, subproperty) keys and unicode content values.
+    """
+    return {
+        (prop, unicode(subproperty)): unicode(content)
+        for prop, value in record.properties.items()
+        for subproperty, content in value.items()
+        if content is not None
+    }
+
+  @classmethod
+  def _get_record_rows(cls, records):
+    """Get full text table rows for all properties of the given records."""
+    return [
+        {"key": record.key, "type": record.type,
+         "context_id": record.context_id, "tags": record.tags,
+         "property": prop, "subproperty": subproperty, "content": content}
+        for record in records
+        for (prop, subproperty), content in
+        cls._get_record_contents(record).items()
+    ]
+
   def create_record(self, record, commit=True):
-    for prop, value in record.properties.items():
-      for subproperty, content in value.items():
-        if content is not None:
-          db.session.add(self.record_type(
-              key=record.key,
-              type=record.type,
-              context_id=record.context_id,
-              tags=record.tags,
-              property=prop,
-              subproperty=unicode(subproperty),
-              content=unicode(content),
-          ))
+    self.create_records([record], commit)
+
+  def create_records(self, records, commit=True, table=None):
+    """Insert index entries for all given records.
+
+    Entries are written with multi-row inserts of at most BATCH_SIZE rows.
+
+    Args:
+      records: list of full text records.
+      commit: commit the session after inserting.
+      table: full text table to write to. Defaults to the record_type table.
+    """
+    if table is None:
+      table = self.record_type.__table__
+    rows = self._get_record_rows(records)
+    for start in xrange(0, len(rows), self.BATCH_SIZE):
+      db.session.execute(table.insert(), rows[start:start + self.BATCH_SIZE])
     if commit:
       db.session.commit()
 
+  def replace_records(self, records, commit=True, table=None):
+    """Replace index entries for the properties of the given records.
+
+    Stored entries of the record properties are deleted and the new entries
+    are inserted with create_records. Entries of properties that are not in
+    the records are left untouched.
+    """
+    if table is None:
+      table = self.record_type.__table__
+    records = list(records)
+    keys = list({
+        (record.type, record.key, prop)
+        for record in records
+        for prop in record.properties
+    })
+    for start in xrange(0, len(keys), self.BATCH_SIZE):
+      db.session.execute(table.delete().where(
+          tuple_(table.c.type, table.c.key, table.c.property).in_(
+              keys[start:start + self.BATCH_SIZE])
+      ))
+    self.create_records(records, commit, table)
+
+  def _get_stored_contents(self, record):
+    """Get stored index rows for the properties of the given record.
+
+    Returns:
+      dict with (property, subproperty) keys and (content, context_id, tags)
+      values.
+    """
+    record_type = self.record_type
+    query = db.session.query(
+        record_type.property,
+        record_type.subproperty,
+        record_type.content,
+        record_type.context_id,
+        record_type.tags,
+    ).filter(
+        record_type.key == record.key,
+        record_type.type == record.type,
+        record_type.property.in_(list(record.properties.keys())),
+    )
+    return {(row.property, row.subproperty): row[2:] for row in query}
+
   def update_record(self, record, commit=True):
-    # remove the obsolete index entries
-    if record.properties:
-      db.session.query(self.record_type).filter(
-          self.record_type.key == record.key,
-          self.record_type.type == record.type,
-          self.record_type.property.in_(list(record.properties.keys())),
-      ).delete(synchronize_session="fetch")
-    # add new index entries
-    self.create_record(record, commit=commit)
+    """Update index entries for the properties of the given record.
+
+    Stored entries of the record properties are compared to the new ones and
+    only the changed (property, subproperty) pairs get deleted, updated or
+    inserted. Entries of properties that are not in the record are left
+    untouched.
+    """
+    if not record.properties:
+      if commit:
+        db.session.commit()
+      return
+    new_contents = self._get_record_contents(record)
+    stored_contents = self._get_stored_contents(record)
+
+    deleted = [key for key in stored_contents if key not in new_contents]
+    updated = [
+        key for key, content in new_contents.items()
+        if key in stored_contents and
+        stored_contents[key] != (content, record.context_id, record.tags)
+    ]
+    inserted = [key for key in new_contents if key not in stored_contents]
+
+    table = self.record_type.__table__
+    record_filter = and_(
+        table.c.key == record.key,
+        table.c.type == record.type,
+        table.c.property == bindparam("_property"),
+        table.c.subproperty == bindparam("_subproperty"),
+    )
+    if deleted:
+      db.session.execute(table.delete().where(record_filter), [
+          {"_property": prop, "_subproperty": subproperty}
+          for prop, subproperty in deleted
+      ])
+    if updated:
+      db.session.execute(table.update().where(record_filter).values(
+          content=bindparam("_content"),
+          context_id=record.context_id,
+          tags=record.tags,
+      ), [
+          {"_property": prop, "_subproperty": subproperty,
+           "_content": new_contents[(prop, subproperty)]}
+          for prop, subproperty in updated
+      ])
+    if inserted:
+      db.session.execute(table.insert(), [
+          {"key": record.key, "type": record.type,
+           "context_id": record.context_id, "tags": record.tags,
+           "property": prop, "subproperty": subproperty,
+           "content": new_contents[(prop, subproperty)]}
+          for prop, subproperty in inserted
+      ])
+    if commit:
+      db.session.commit()
 
   def delete_record(self, key, type, commit=True):
     db.session.query(self.record_type).filter(
@@ -1,10 +1,13 @@
 # Copyright (C) 2017 Google Inc.
 # Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
 
+import json
 from logging import getLogger
 from functools import wraps
+from multiprocessing.pool import ThreadPool
 from time import time
 
+import flask_login
 from flask import request
 from flask.wrappers import Response
 from werkzeug.datastructures import Headers
@@ -12,6 +15,7 @@ from werkzeug.datastructures import Headers
 from ggrc import db
 from ggrc import settings
 from ggrc.login import get_current_user
+from ggrc.login import get_login_module
 from ggrc.models.mixins import Base
 from ggrc.models.deferred import deferred
 from ggrc.models.mixins import Stateful
@@ -21,6 +25,8 @@ from ggrc.models.types import CompressedType
 # pylint: disable=invalid-name
 logger = getLogger(__name__)
 
+_worker_pool = None
+
 
 class BackgroundTask(Base, Stateful, db.Model):
   __tablename__ = 'background_tasks'
@@ -69,6 +75,20 @@ class BackgroundTask(Base, Stateful, db.Model):
     db.session.add(self)
     db.session.commit()
 
+  def update_progress(self, progress):
+    """Store progress of a running task as its intermediate result.
+
+    The progress is written with a separate connection so that nothing that is
+    pending in the current session gets committed with it.
+    """
+    result = {'content': json.dumps({'status': self.status,
+                                     'progress': progress}),
+              'status_code': 202,
+              'headers': [('Content-Type', 'application/json')]}
+    table = self.__table__
+    db.engine.execute(
+        table.update().where(table.c.id == self.id).values(result=result))
+
   def make_response(self, default=None):
     if self.result is None:
       return default
@@ -88,8 +108,18 @@ def create_task(name, url, queued_callback=None, parameters=None):
   task.modified_by = get_current_user()
   db.session.add(task)
   db.session.commit()
+  queue_task(task, url, queued_callback)
+  return task
 
-  # schedule a task queue
+
+def queue_task(task, url, queued_callback=None):
+  """Schedule execution of a committed task.
+
+  Args:
+    task: BackgroundTask or any object with its id, name and modified_by_id.
+    url: url of the task handler on App Engine.
+    queued_callback: function that runs the task outside of App Engine.
+  """
   if getattr(settings, 'APP_ENGINE', False):
     from google.appengine.api import taskqueue
     headers = Headers(request.headers)
@@ -103,12 +133,47 @@ def create_task(name, url, queued_callback=None, parameters=None):
         headers=headers)
   elif queued_callback:
     queued_callback(task)
-  return task
 
 
 def make_task_response(id_):
+  from ggrc.app import app
   task = BackgroundTask.query.get(id_)
-  return task.make_response()
+  return task.make_response(app.make_response((
+      json.dumps({'status': task.status}), 202,
+      [('Content-Type', 'application/json')])))
+
+
+def _get_worker_pool():
+  """Get the pool of threads for running tasks outside of App Engine."""
+  global _worker_pool  # pylint: disable=global-statement
+  if _worker_pool is None:
+    _worker_pool = ThreadPool(settings.BACKGROUND_TASK_WORKERS)
+  return _worker_pool
+
+
+def _run_task(func, task_id, user_id):
+  """Run queued task function as the user that created the task."""
+  from ggrc.app import app
+  from ggrc.models.person import Person
+  try:
+    with app.test_request_context():
+      if user_id is not None and get_login_module():
+        flask_login.login_user(Person.query.get(user_id))
+      func(BackgroundTask.query.get(task_id))
+  except:  # pylint: disable=bare-except
+    logger.exception("Running task %s failed", task_id)
+
+
+def worker_pool_callback(func):
+  """Get a create_task callback that runs a queued task in a worker thread.
+
+  Args:
+    func: function decorated with queued_task.
+  """
+  def queued_callback(task):
+    _get_worker_pool().apply_async(
+        _run_task, (func, task.id, task.modified_by_id))
+  return queued_callback
 
 
 def queued_task(func):
@@ -119,7 +184,9 @@ def queued_task(func):
     if len(args) > 0 and isinstance(args[0], BackgroundTask):
       task = args[0]
     else:
-      task = BackgroundTask.query.get(request.values.get("task_id"))
+      task_id = (request.values.get("task_id") or
+                 request.headers.get("x-task-id"))
+      task = BackgroundTask.query.get(task_id)
     task.start()
     try:
       result = func(task)
@@ -11,7 +11,9 @@
 from collections import defaultdict
 from datetime import date
 from datetime import datetime
+from functools import partial
 from logging import getLogger
+from multiprocessing.pool import ThreadPool
 
 from sqlalchemy import and_
 from sqlalchemy.orm import joinedload
@@ -23,6 +25,7 @@ from ggrc import extensions
 from ggrc import settings
 from ggrc.models import Person
 from ggrc.models import Notification
+from ggrc.models.inflector import get_model
 from ggrc.rbac import permissions
 from ggrc.utils import merge_dict
 
@@ -40,6 +43,7 @@ class Services(object):
   """
 
   services = []
+  prefetch_services = []
 
   @classmethod
   def get_service_function(cls, name):
@@ -77,58 +81,127 @@ class Services(object):
     service = cls.get_service_function(notif.object_type)
     return service(notif)
 
+  @classmethod
+  def get_prefetch_function(cls, name):
+    """Get function that loads objects of the given type for notifications.
+
+    Args:
+      name: Name of an object type, such as "CycleTaskGroupObjectTask".
 
-def get_filter_data(notification, people_cache):
-  """Get filtered notification data.
+    Returns:
+      callable: A function that takes a list of object ids and returns a list
+        of loaded objects, or None if no function has been contributed.
+    """
+    if not cls.prefetch_services:
+      cls.prefetch_services = extensions.get_module_contributions(
+          "contributed_notification_prefetch")
+    return cls.prefetch_services.get(name)
 
-  This function gets notification data for all users who should receive it. A
-  single notification can be for multiple users (such as all assignees) but
-  only some should receive it depending on if it's an instant notification or
-  a daily digest and the specific users notification settings.
+
+def prefetch_notification_objects(notifications):
+  """Load objects of all notifications with one query per object type.
+
+  Data handlers get notification objects by their primary key, so they are
+  found in the session identity map without further queries while the
+  returned objects are referenced.
 
   Args:
-    notification (Notification): Notification object for which we want to get
-      data.
+    notifications (list of Notification): Notifications for which we want to
+      load objects.
 
   Returns:
-    dict: dictionary containing notification data for all users who should
-      receive it, according to their notification settings.
+    list: All loaded objects.
   """
-  result = {}
-  data = Services.call_service(notification)
+  ids_by_type = defaultdict(set)
+  for notification in notifications:
+    ids_by_type[notification.object_type].add(notification.object_id)
+  objects = []
+  for object_type, ids in ids_by_type.iteritems():
+    prefetch = Services.get_prefetch_function(object_type)
+    if prefetch:
+      objects.extend(prefetch(list(ids)))
+      continue
+    model = get_model(object_type)
+    if model is not None:
+      objects.extend(model.query.filter(model.id.in_(ids)).all())
+  return objects
+
+
+def prefetch_people(person_ids, people_cache):
+  """Load people with their roles and notification configs in one query.
 
-  for user, user_data in data.iteritems():
-    if should_receive(notification, user_data, people_cache):
-      result[user] = user_data
-  return result
+  Args:
+    person_ids (iterable of int): Ids of people that should be loaded.
+    people_cache (dict): Dictionary of loaded people by their ids.
+  """
+  person_ids = set(person_ids) - set(people_cache) - {-1}
+  if not person_ids:
+    return
+  people = db.session.query(Person).options(
+      joinedload('user_roles').joinedload('role'),
+      joinedload('notification_configs')
+  ).filter(Person.id.in_(person_ids))
+  people_cache.update((person.id, person) for person in people)
 
 
-def get_notification_data(notifications):
-  """Get notification data for all notifications.
+def get_user_notifications(notifications):
+  """Get notification data and handled notifications for each user.
 
-  This function returns a filtered data for all notifications for the users
-  that should receive it.
+  Notified objects and all recipients are loaded with bulk queries before the
+  data is generated.
 
   Args:
     notifications (list of Notification): List of notification for which we
       want to get notification data.
 
   Returns:
-    dict: Filtered dictionary containing all the data that should be sent for
-      the given notification list.
+    dict, dict: Filtered dictionary containing all the data that should be
+      sent for the given notification list and a dictionary with sets of ids
+      of notifications contained in the data for each user.
   """
   if not notifications:
-    return {}
-  aggregate_data = {}
+    return {}, {}
   people_cache = {}
 
-  for notification in notifications:
-    filtered_data = get_filter_data(notification, people_cache)
-    aggregate_data = merge_dict(aggregate_data, filtered_data)
+  objects = prefetch_notification_objects(notifications)
+  notification_data = [(notification, Services.call_service(notification))
+                       for notification in notifications]
+  del objects
+  prefetch_people((user_data["user"]["id"]
+                   for _, data in notification_data
+                   for user_data in data.itervalues()), people_cache)
+
+  aggregate_data = {}
+  user_notifications = defaultdict(set)
+  for notification, data in notification_data:
+    for user, user_data in data.iteritems():
+      if should_receive(notification, user_data, people_cache):
+        aggregate_data[user] = merge_dict(aggregate_data.get(user, {}),
+                                          user_data)
+        user_notifications[user].add(notification.id)
 
   # Remove notifications for objects without a contact (such as task groups)
   aggregate_data.pop("", None)
+  user_notifications.pop("", None)
+
+  return aggregate_data, user_notifications
+
 
+def get_notification_data(notifications):
+  """Get notification data for all notifications.
+
+  This function returns a filtered data for all notifications for the users
+  that should receive it.
+
+  Args:
+    notifications (list of Notification): List of notification for which we
+      want to get notification data.
+
+  Returns:
+    dict: Filtered dictionary containing all the data that should be sent for
+      the given notification list.
+  """
+  aggregate_data, _ = get_user_notifications(notifications)
   return aggregate_data
 
 
@@ -142,8 +215,9 @@ def get_pending_notifications():
     list of Notifications, data: a tuple of notifications that were handled
       and corresponding data for those notifications.
   """
-  notifications = db.session.query(Notification).filter(
-      Notification.sent_at.is_(None)).all()
+  notifications = db.session.query(Notification).options(
+      joinedload('notification_type'),
+  ).filter(Notification.sent_at.is_(None)).all()
 
   notif_by_day = defaultdict(list)
   for notification in notifications:
@@ -166,11 +240,22 @@ def get_daily_notifications():
     list of Notifications, data: a tuple of notifications that were handled
       and corresponding data for those notifications.
   """
-  notifications = db.session.query(Notification).filter(
+  notifications = get_daily_notification_list()
+  return notifications, get_notification_data(notifications)
+
+
+def get_daily_notification_list():
+  """Get all notifications that should be sent today and were not sent yet.
+
+  Returns:
+    list of Notifications.
+  """
+  return db.session.query(Notification).options(
+      joinedload('notification_type'),
+  ).filter(
       and_(Notification.send_on <= datetime.today(),
            Notification.sent_at.is_(None)
-           )).all()
-  return notifications, get_notification_data(notifications)
+           )).order_by(Notification.id).all()
 
 
 def should_receive(notif, user_data, people_cache):
@@ -229,31 +314,103 @@ def should_receive(notif, user_data, people_cache):
 def send_daily_digest_notifications():
   """Send emails for today's or overdue notifications.
 
+  Emails are sent to NOTIFICATION_CHUNK_SIZE users at a time. After each
+  chunk, notifications that all their recipients have received are marked as
+  sent, so a failed run can be repeated without sending them again.
+
   Returns:
     str: String containing a simple list of who received the notification.
   """
   # pylint: disable=invalid-name
-  notif_list, notif_data = get_daily_notifications()
-  sent_emails = []
+  notif_list = get_daily_notification_list()
+  notif_data, user_notifications = get_user_notifications(notif_list)
   subject = "GGRC daily digest for {}".format(date.today().strftime("%b %d"))
-  for user_email, data in notif_data.iteritems():
-    data = modify_data(data)
-    email_body = settings.EMAIL_DIGEST.render(digest=data)
-    send_email(user_email, subject, email_body)
-    sent_emails.append(user_email)
-  set_notification_sent_time(notif_list)
+
+  # number of users that still have to receive each notification
+  pending_users = defaultdict(int)
+  for notif_ids in user_notifications.itervalues():
+    for notif_id in notif_ids:
+      pending_users[notif_id] += 1
+  sent_notif_ids = [notif.id for notif in notif_list
+                    if not pending_users[notif.id]]
+
+  users = sorted(notif_data)
+  chunk_size = settings.NOTIFICATION_CHUNK_SIZE
+  sent_emails = []
+  for start in xrange(0, len(users), chunk_size):
+    chunk = users[start:start + chunk_size]
+    sent_emails.extend(send_digest_emails(
+        [(user, notif_data.pop(user)) for user in chunk], subject))
+    for user in chunk:
+      for notif_id in user_notifications.pop(user):
+        pending_users[notif_id] -= 1
+        if not pending_users[notif_id]:
+          sent_notif_ids.append(notif_id)
+    set_notifications_sent(sent_notif_ids)
+    sent_notif_ids = []
+    logger.info("Daily digest sent to %s of %s users",
+                len(sent_emails), len(users))
+  set_notifications_sent(sent_notif_ids)
   return "emails sent to: <br> {}".format("<br>".join(sent_emails))
 
 
-def set_notification_sent_time(notif_list):
-  """Set sent time to now for all notifications in the list.
+def send_digest_email(subject, digest):
+  """Render and send a digest email to a single user.
+
+  Args:
+    subject (string): Email subject.
+    digest (tuple): User email and notification data for the user.
+
+  Returns:
+    str: Email of the user.
+  """
+  user_email, data = digest
+  data = modify_data(data)
+  email_body = settings.EMAIL_DIGEST.render(digest=data)
+  send_email(user_email, subject, email_body)
+  return user_email
+
+
+def send_digest_emails(digests, subject):
+  """Render and send digest emails in parallel batches.
+
+  Emails are handled by a pool of NOTIFICATION_WORKERS threads, which take
+  NOTIFICATION_BATCH_SIZE emails at a time.
 
   Args:
-    notif_list (list of Notification): List of notification for which we want
-      to modify sent_at field.
+    digests (list of tuples): User emails and notification data for them.
+    subject (string): Email subject.
+
+  Returns:
+    list: Emails of all users.
+  """
+  send = partial(send_digest_email, subject)
+  workers = min(settings.NOTIFICATION_WORKERS, len(digests))
+  if workers <= 1:
+    return [send(digest) for digest in digests]
+  pool = ThreadPool(workers)
+  try:
+    return pool.map(send, digests, settings.NOTIFICATION_BATCH_SIZE)
+  finally:
+    pool.close()
+    pool.join()
+
+
+def set_notifications_sent(notif_ids):
+  """Set sent time to now for notifications that were not sent yet.
+
+  Changes are committed right away, so that notifications that have been sent
+  are not sent again if sending of the remaining notifications fails.
+
+  Args:
+    notif_ids (list of int): Ids of notifications that have been sent.
   """
-  for notif in notif_list:
-    notif.sent_at = datetime.now()
+  if not notif_ids:
+    return
+  db.session.query(Notification).filter(
+      Notification.id.in_(notif_ids),
+      Notification.sent_at.is_(None),
+  ).update({Notification.sent_at: datetime.now()}, synchronize_session=False)
   db.session.commit()
 
 
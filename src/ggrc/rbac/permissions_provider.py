@@ -1,8 +1,10 @@
 # Copyright (C) 2017 Google Inc.
 # Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
 
+import operator
 from collections import namedtuple
 from flask import g
+from flask import has_app_context
 from flask.ext.login import current_user
 from .user_permissions import UserPermissions
 from ggrc.rbac.permissions import permissions_for as find_permissions
@@ -142,6 +144,141 @@ _CONDITIONS_MAP = {
 }
 
 
+def _compile_value(value):
+  """Get a function returning the resolved condition term value."""
+  if isinstance(value, basestring) and value.startswith('$'):
+    return lambda: resolve_permission_variable(value)
+  return lambda: value
+
+
+def _compile_contains(value, list_property, **_):
+  get_value = _compile_value(value)
+  get_list = operator.attrgetter(list_property)
+  return lambda instance, action: get_value() in get_list(instance)
+
+
+def _compile_is(value, property_name, **_):
+  get_value = _compile_value(value)
+  get_property = operator.attrgetter(property_name)
+  return lambda instance, action: get_value() == get_property(instance)
+
+
+def _compile_in(value, property_name, **_):
+  get_value = _compile_value(value)
+  get_property = operator.attrgetter(property_name)
+  return lambda instance, action: get_property(instance) in get_value()
+
+
+def _compile_forbid(blacklist, **_):
+  blacklist = {action: frozenset(types) for action, types in blacklist.items()}
+  return lambda instance, action: (
+      instance.type not in blacklist.get(action, ()))
+
+
+"""
+Functions that return a compiled version of a condition from _CONDITIONS_MAP
+with a signature
+
+..
+
+  func(instance, action)
+"""
+_CONDITION_COMPILERS = {
+    'contains': _compile_contains,
+    'is': _compile_is,
+    'in': _compile_in,
+    'forbid': _compile_forbid,
+}
+
+
+def compile_condition(condition):
+  """Compile a single permission condition into a function.
+
+  Conditions without a compiler call the function from _CONDITIONS_MAP.
+  """
+  name = str(condition['condition'])
+  terms = condition.setdefault('terms', {})
+  if name in _CONDITION_COMPILERS:
+    return _CONDITION_COMPILERS[name](**terms)
+  func = _CONDITIONS_MAP[name]
+  return lambda instance, action: func(
+      instance, _current_action=action, **terms)
+
+
+def compile_conditions(conditions):
+  """Compile conditions into a function checking if any of them is valid.
+
+  Returns:
+    function with a (instance, action) signature or None if there are no
+    conditions.
+  """
+  if not conditions:
+    return None
+  compiled = [compile_condition(condition) for condition in conditions]
+  return lambda instance, action: any(
+      check(instance, action) for check in compiled)
+
+
+class PermissionsCache(object):
+  """Decisions and allowed sets computed from a single permissions dict.
+
+  Permission checks only depend on the permissions dict, so their results can
+  be reused for the whole request.
+  """
+
+  def __init__(self, permissions):
+    self.permissions = permissions
+    self.decisions = {}
+    self.conditions = {}
+    self._allowed = {}
+    self.contexts_for = {}
+    self.resources_for = {}
+
+  def allowed(self, action, resource_type):
+    """Get sets of allowed contexts and resources for the action and type.
+
+    Returns:
+      tuple of (contexts, resources) frozensets.
+    """
+    key = (action, resource_type)
+    if key not in self._allowed:
+      type_permissions = self.permissions.get(action, {}).get(
+          resource_type, {})
+      self._allowed[key] = (
+          frozenset(type_permissions.get('contexts', ())),
+          frozenset(type_permissions.get('resources', ())),
+      )
+    return self._allowed[key]
+
+  def conditions_check(self, action, resource_type, context_id):
+    """Get compiled conditions for the action, type and context.
+
+    Conditions without a context apply to all contexts.
+    """
+    key = (action, resource_type, context_id)
+    if key not in self.conditions:
+      conditions = self.permissions.get(action, {}).get(
+          resource_type, {}).get('conditions', {})
+      applied = list(conditions.get(None, []))
+      if context_id is not None:
+        applied.extend(conditions.get(context_id, []))
+      self.conditions[key] = compile_conditions(applied)
+    return self.conditions[key]
+
+
+def get_permissions_cache(permissions):
+  """Get the request cache for the given permissions dict."""
+  if not permissions or not has_app_context():
+    return PermissionsCache(permissions)
+  caches = getattr(g, '_permissions_caches', None)
+  if caches is None:
+    caches = g._permissions_caches = {}
+  cache = caches.get(id(permissions))
+  if cache is None or cache.permissions is not permissions:
+    cache = caches[id(permissions)] = PermissionsCache(permissions)
+  return cache
+
+
 class DefaultUserPermissions(UserPermissions):
   # super user, context_id 0 indicates all contexts
   ADMIN_PERMISSION = Permission(
@@ -161,28 +298,17 @@ class DefaultUserPermissions(UserPermissions):
 
   def _permission_match(self, permission, permissions):
     """Check if the user has the given permission"""
-
-    if None in \
-        permissions\
-            .get(permission.action, {})\
-            .get(permission.resource_type, {})\
-            .get('contexts', []):
+    cache = get_permissions_cache(permissions)
+    contexts, resources = cache.allowed(
+        permission.action, permission.resource_type)
+    if None in contexts:
       return True
-    return \
-        permission.resource_id in permissions\
-        .get(permission.action, {})\
-        .get(permission.resource_type, {})\
-        .get('resources', [])\
-        or permission.context_id in \
-        permissions\
-        .get(permission.action, {})\
-        .get(permission.resource_type, {})\
-        .get('contexts', [])\
-        or permission.context_id in \
-        permissions\
-        .get(permission.action, {})\
-        .get(self.ADMIN_PERMISSION.resource_type, {})\
-        .get('contexts', [])
+    return (
+        permission.resource_id in resources or
+        permission.context_id in contexts or
+        permission.context_id in cache.allowed(
+            permission.action, self.ADMIN_PERMISSION.resource_type)[0]
+    )
 
   @staticmethod
   def _permissions():
@@ -191,6 +317,13 @@ class DefaultUserPermissions(UserPermissions):
 
   def _is_allowed(self, permission):
     permissions = self._permissions()
+    decisions = get_permissions_cache(permissions).decisions
+    if permission not in decisions:
+      decisions[permission] = self._check_permission(permission, permissions)
+    return decisions[permission]
+
+  def _check_permission(self, permission, permissions):
+    """Check the permission without the request decision cache."""
     if permission.resource_type != '/admin' \
        and permission.context_id \
        and self._is_allowed(permission._replace(context_id=None)):
@@ -203,38 +336,22 @@ class DefaultUserPermissions(UserPermissions):
         self._admin_permission_for_context(permission.context_id),
         permissions)
 
-  @staticmethod
-  def _check_conditions(instance, action, conditions):
-    """Check if any condition is valid for the instance."""
-    for condition in conditions:
-      func = _CONDITIONS_MAP[str(condition['condition'])]
-      terms = condition.setdefault('terms', {})
-      if func(instance, _current_action=action, **terms):
-        return True
-    return False
-
   def _is_allowed_for(self, instance, action):
     permissions = self._permissions()
+    cache = get_permissions_cache(permissions)
     # Check for admin permission
     if self._permission_match(self.ADMIN_PERMISSION, permissions):
-      conditions = permissions[self.ADMIN_PERMISSION.action]\
-          .get(self.ADMIN_PERMISSION.resource_type)\
-          .get("conditions", {})\
-          .get(None, [])
-      if not conditions:
+      check = cache.conditions_check(self.ADMIN_PERMISSION.action,
+                                     self.ADMIN_PERMISSION.resource_type,
+                                     None)
+      if check is None:
         return True
-      return self._check_conditions(instance, action, conditions)
+      return check(instance, action)
+    resource_type = instance._inflector.model_singular
     if (not permissions.get(action) or
-       not permissions[action].get(instance._inflector.model_singular)):
+       not permissions[action].get(resource_type)):
       return False
-    resources = self._permissions()\
-        .setdefault(action, {})\
-        .setdefault(instance._inflector.model_singular, {})\
-        .setdefault('resources', [])
-    contexts = self._permissions()\
-        .setdefault(action, {})\
-        .setdefault(instance._inflector.model_singular, {})\
-        .setdefault('contexts', [])
+    contexts, resources = cache.allowed(action, resource_type)
     # We can't use instance.context_id, because it requires the
     # object <-> context mapping to be created,
     # which isn't the case when creating objects
@@ -243,22 +360,11 @@ class DefaultUserPermissions(UserPermissions):
       context_id = instance.context.id
     if instance.id in resources:
       return True
-    no_context_conditions = self._permissions()\
-        .setdefault(action, {})\
-        .setdefault(instance._inflector.model_singular, {})\
-        .setdefault('conditions', {})\
-        .setdefault(None, [])
-
-    context_conditions = self._permissions()\
-        .setdefault(action, {})\
-        .setdefault(instance._inflector.model_singular, {})\
-        .setdefault('conditions', {})\
-        .setdefault(context_id, [])
-    conditions = no_context_conditions + context_conditions
+    check = cache.conditions_check(action, resource_type, context_id)
     # Check any conditions applied per resource
-    if (None in contexts or context_id in contexts) and not conditions:
+    if (None in contexts or context_id in contexts) and check is None:
       return True
-    return self._check_conditions(instance, action, conditions)
+    return check is not None and check(instance, action)
 
   def is_allowed_create(self, resource_type, resource_id, context_id):
     """Whether or not the user is allowed to create a resource of the specified
@@ -308,18 +414,22 @@ class DefaultUserPermissions(UserPermissions):
     if self._permission_match(self.ADMIN_PERMISSION, permissions):
       return None
 
-    # Get the list of resources for a given resource type and any
-    #   superclasses
-    resource_types = get_contributing_resource_types(resource_type)
-
-    ret = []
-    for resource_type in resource_types:
-      ret.extend(
-          permissions
-          .get(action, {})
-          .get(resource_type, {})
-          .get('resources', []))
-    return ret
+    cache = get_permissions_cache(permissions).resources_for
+    key = (action, resource_type)
+    if key not in cache:
+      # Get the list of resources for a given resource type and any
+      #   superclasses
+      resource_types = get_contributing_resource_types(resource_type)
+
+      ret = []
+      for resource_type in resource_types:
+        ret.extend(
+            permissions
+            .get(action, {})
+            .get(resource_type, {})
+            .get('resources', []))
+      cache[key] = ret
+    return list(cache[key])
 
   def _get_contexts_for(self, action, resource_type):
     # FIXME: (Security) When applicable, we should explicitly assert that no
@@ -329,25 +439,29 @@ class DefaultUserPermissions(UserPermissions):
     if self._permission_match(self.ADMIN_PERMISSION, permissions):
       return None
 
-    # Get the list of contexts for a given resource type and any
-    #   superclasses
-    resource_types = get_contributing_resource_types(resource_type)
-
-    ret = []
-    for resource_type in resource_types:
-      ret.extend(permissions.get(action, {})
-                            .get(resource_type, {})
-                            .get('contexts', []))
-
-    # Extend with the list of all contexts for which the user is an ADMIN
-    admin_list = list(
-        permissions.get(self.ADMIN_PERMISSION.action, {})
-        .get(self.ADMIN_PERMISSION.resource_type, {})
-        .get('contexts', ()))
-    ret.extend(admin_list)
-    if None in ret:
+    cache = get_permissions_cache(permissions).contexts_for
+    key = (action, resource_type)
+    if key not in cache:
+      # Get the list of contexts for a given resource type and any
+      #   superclasses
+      resource_types = get_contributing_resource_types(resource_type)
+
+      ret = []
+      for resource_type in resource_types:
+        ret.extend(permissions.get(action, {})
+                              .get(resource_type, {})
+                              .get('contexts', []))
+
+      # Extend with the list of all contexts for which the user is an ADMIN
+      admin_list = list(
+          permissions.get(self.ADMIN_PERMISSION.action, {})
+          .get(self.ADMIN_PERMISSION.resource_type, {})
+          .get('contexts', ()))
+      ret.extend(admin_list)
+      cache[key] = None if None in ret else ret
+    if cache[key] is None:
       return None
-    return ret
+    return list(cache[key])
 
   def create_contexts_for(self, resource_type):
     """All contexts in which the user has create permission."""
@@ -6,6 +6,7 @@
 resources.
 """
 
+import base64
 import datetime
 import hashlib
 import itertools
@@ -22,7 +23,7 @@ from flask import url_for, request, current_app, g, has_request_context
 from flask.views import View
 from flask.ext.sqlalchemy import Pagination
 import sqlalchemy.orm.exc
-from sqlalchemy import and_, or_
+from sqlalchemy import and_, func, or_
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.sql.expression import tuple_
 from werkzeug.exceptions import BadRequest, Forbidden
@@ -36,6 +37,7 @@ from ggrc.fulltext.recordbuilder import fts_record_for
 from ggrc.login import get_current_user_id, get_current_user
 from ggrc.models.cache import Cache
 from ggrc.models.event import Event
+from ggrc.models.mixins.assignable import Assignable
 from ggrc.models.revision import Revision
 from ggrc.models.exceptions import ValidationError, translate_message
 from ggrc.rbac import permissions, context_query_filter
@@ -50,6 +52,26 @@ logger = getLogger(__name__)
 
 CACHE_EXPIRY_COLLECTION = 60
 
+# Cached user permissions are stored under keys containing the global and the
+# user permission generation. Incrementing a generation invalidates the cached
+# permissions of all users or a single user.
+PERMISSIONS_GENERATION_KEY = 'permissions:generation'
+
+# Models used for loading user permissions. Changes of models in
+# USER_PERMISSION_MODELS only affect the permissions of the referenced person.
+PERMISSION_MODELS = {
+    "Context",
+    "ContextImplication",
+    "Relationship",
+    "RelationshipAttr",
+    "Role",
+    "Workflow",
+}
+USER_PERMISSION_MODELS = {
+    "ObjectOwner",
+    "UserRole",
+}
+
 
 def get_oauth_credentials():
   from flask import session
@@ -57,9 +79,12 @@ def get_oauth_credentials():
 
 
 def _get_cache_manager():
-  from ggrc.cache import CacheManager, MemCache
+  from ggrc.cache import CacheManager, MemCache, TieredMemCache
   cache_manager = CacheManager()
-  cache_manager.initialize(MemCache())
+  if getattr(settings, 'MEMCACHE_LOCAL_TIER', False):
+    cache_manager.initialize(TieredMemCache())
+  else:
+    cache_manager.initialize(MemCache())
   return cache_manager
 
 
@@ -190,6 +215,7 @@ def update_memcache_before_commit(context, modified_objects, expiry_time):
 
   context.cache_manager = _get_cache_manager()
 
+  context.permission_changes = get_permission_changes(modified_objects)
   if modified_objects is not None:
     if len(modified_objects.new) > 0:
       memcache_mark_for_deletion(context, modified_objects.new.items())
@@ -261,7 +287,7 @@ def update_memcache_after_commit(context):
     if delete_result is not True:
       logger.error("CACHE: Failed to remove status entries from cache")
 
-  clear_permission_cache()
+  clear_permission_cache(getattr(context, "permission_changes", None))
   cache_manager.clear_cache()
 
 
@@ -316,14 +342,13 @@ def update_index(session, cache):
   reindex_snapshots_list = []
   if cache:
     indexer = get_indexer()
+    new_records = []
     for obj in cache.new:
-      exists_query = session.query(indexer.record_type.query.filter(
-          indexer.record_type.type == obj.__class__.__name__,
-          indexer.record_type.key == obj.id).exists())
       if obj.type == "Snapshot":
         reindex_snapshots_list.append(obj.id)
-      elif not exists_query.all()[0][0]:
-        indexer.create_record(fts_record_for(obj), commit=False)
+      else:
+        new_records.append(fts_record_for(obj))
+    indexer.replace_records(new_records, commit=False)
     for obj in cache.dirty:
       if obj.type == "Snapshot":
         reindex_snapshots_list.append(obj.id)
@@ -415,15 +440,105 @@ def log_event(session, obj=None, current_user_id=None, flush=True,
   return event
 
 
-def clear_permission_cache():
+def _affects_all_permissions(obj):
+  """Check if a change of the object can affect permissions of anyone."""
+  # Assignees are stored in relationship attrs that are not tracked as
+  # modified objects, so any change of an assignable object is included.
+  return (obj.__class__.__name__ in PERMISSION_MODELS or
+          isinstance(obj, Assignable))
+
+
+def get_permission_changes(modified_objects):
+  """Get people whose permissions are affected by modified objects.
+
+  Returns:
+    Set of person ids or None if permissions of all users are affected.
+  """
+  if modified_objects is None:
+    return None
+  if any(_affects_all_permissions(obj) for obj in itertools.chain(
+          modified_objects.new, modified_objects.dirty,
+          modified_objects.deleted)):
+    return None
+  person_ids = set()
+  for obj in modified_objects.dirty:
+    if obj.__class__.__name__ in USER_PERMISSION_MODELS:
+      # The previous person is not known anymore after the flush
+      return None
+  for obj in itertools.chain(modified_objects.new, modified_objects.deleted):
+    if obj.__class__.__name__ in USER_PERMISSION_MODELS:
+      person_ids.add(obj.person_id)
+  return person_ids
+
+
+def _get_user_generation_key(user_id):
+  return '{}:{}'.format(PERMISSIONS_GENERATION_KEY, user_id)
+
+
+def _initial_generation():
+  """Initial value for a missing generation.
+
+  Generation keys can get evicted, so a missing generation must not start
+  from a value that could have been used before.
+  """
+  return int(time.time() * 1000)
+
+
+def get_permissions_cache_key(cache, user_id):
+  """Get the memcache key for the current permissions of a user.
+
+  Returns:
+    key string or None if the permission generations are not available.
+  """
+  keys = [PERMISSIONS_GENERATION_KEY, _get_user_generation_key(user_id)]
+  generations = cache.get_multi(keys)
+  missing = [key for key in keys if key not in generations]
+  if missing:
+    cache.add_multi({key: _initial_generation() for key in missing})
+    generations.update(cache.get_multi(missing))
+  if any(key not in generations for key in keys):
+    return None
+  return 'permissions:{}:{}:{}'.format(
+      generations[keys[0]], generations[keys[1]], user_id)
+
+
+def clear_permission_cache(user_ids=None):
+  """Invalidate cached permissions.
+
+  Args:
+    user_ids: ids of people whose permissions changed. Permissions of all
+        users are invalidated if None.
+  """
   if not getattr(settings, 'MEMCACHE_MECHANISM', False):
     return
+  if user_ids is not None:
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if not user_ids:
+      return
+    keys = [_get_user_generation_key(user_id) for user_id in user_ids]
+  else:
+    keys = [PERMISSIONS_GENERATION_KEY]
   cache = _get_cache_manager().cache_object.memcache_client
-  cached_keys_set = cache.get('permissions:list') or set()
-  cached_keys_set.add('permissions:list')
-  # We delete all the cached user permissions as well as
-  # the permissions:list value itself
-  cache.delete_multi(cached_keys_set)
+  cache.offset_multi({key: 1 for key in keys},
+                     initial_value=_initial_generation())
+
+
+def get_permissions_version():
+  """Get a value that changes whenever permissions of the current user change.
+
+  Permission generations are used if memcache is available. Otherwise the
+  value is made from the loaded permissions.
+  """
+  user_id = get_current_user_id()
+  if getattr(settings, 'MEMCACHE_MECHANISM', False):
+    cache = _get_cache_manager().cache_object.memcache_client
+    key = get_permissions_cache_key(cache, user_id)
+    if key is not None:
+      return key
+  user_permissions = permissions.permissions_for(permissions.get_user())
+  # pylint: disable=protected-access
+  return user_id, json.dumps(user_permissions._permissions(),
+                             sort_keys=True, default=sorted)
 
 
 class ModelView(View):
@@ -1061,6 +1176,8 @@ class Resource(ModelView):
     page_size = min(
         int(request.args.get('__page_size', self.DEFAULT_PAGE_SIZE)),
         self.MAX_PAGE_SIZE)
+    if '__after' in request.args:
+      return self.apply_keyset_paging(matches_query, page_size)
     if '__page_only' in request.args:
       page_number = int(request.args.get('__page', 0))
       matches = []
@@ -1082,6 +1199,86 @@ class Resource(ModelView):
     }
     return matches, collection_extras
 
+  CURSOR_DATE_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+  @classmethod
+  def encode_cursor(cls, order, modified, id_):
+    """Make an opaque cursor pointing after the given collection row."""
+    if modified is not None:
+      modified = modified.strftime(cls.CURSOR_DATE_FORMAT)
+    return base64.urlsafe_b64encode(json.dumps([order, modified, id_]))
+
+  @classmethod
+  def decode_cursor(cls, cursor):
+    """Get (order, modified, id) from a cursor made by encode_cursor."""
+    try:
+      order, modified, id_ = json.loads(base64.urlsafe_b64decode(
+          cursor.encode("ascii")))
+      if (order not in ("id", "updated_at") or
+              not isinstance(id_, (int, long))):
+        raise ValueError(order)
+      if modified is not None:
+        modified = datetime.datetime.strptime(
+            modified, cls.CURSOR_DATE_FORMAT)
+    except (TypeError, ValueError):
+      raise BadRequest("Invalid __after cursor")
+    return order, modified, id_
+
+  def estimate_count(self, query):
+    """Get the number of rows MySQL expects the query to return.
+
+    The estimate comes from the query plan, so it does not scan the rows.
+    """
+    compiled = query.statement.compile(dialect=db.engine.dialect)
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    plan = db.session.connection().execute(
+        "EXPLAIN " + unicode(compiled), params).fetchall()
+    return plan[0]["rows"] if plan else 0
+
+  def apply_keyset_paging(self, matches_query, page_size):
+    """Get a page of the collection that starts after the __after cursor.
+
+    Rows are ordered by (updated_at, id), or by id if the first page is
+    requested with __after_by=id. An empty cursor requests the first page.
+    Unlike offset paging, the cost of a page does not depend on its position
+    in the collection, but __sort is ignored.
+    """
+    cursor = request.args['__after']
+    if cursor:
+      order, modified, last_id = self.decode_cursor(cursor)
+    else:
+      order, modified, last_id = request.args.get('__after_by'), None, None
+      if order != "id":
+        order = "updated_at"
+    id_attr = self.model.id
+    if order == "id":
+      order_by = [id_attr]
+    else:
+      order_by = [self.modified_attr, id_attr]
+    query = matches_query.order_by(None).order_by(*order_by)
+    if last_id is not None and order == "id":
+      query = query.filter(id_attr > last_id)
+    elif last_id is not None:
+      query = query.filter(or_(
+          self.modified_attr > modified,
+          and_(self.modified_attr == modified, id_attr > last_id),
+      ))
+    matches = query.limit(page_size + 1).all()
+    paging = {}
+    if len(matches) > page_size:
+      matches = matches[:page_size]
+      last = matches[-1]
+      args = dict([(k, unicode(v)) for k, v in request.args.items()])
+      args['__after'] = self.encode_cursor(
+          order, self.modified_at(last), last.id)
+      args.pop('__after_by', None)
+      paging['next'] = self.url_for() + '?' + urlencode(
+          utils.encoded_dict(args))
+    if '__estimate_total' in request.args:
+      with benchmark("Estimate collection size"):
+        paging['total_estimate'] = self.estimate_count(matches_query)
+    return matches, {'paging': paging}
+
   def get_matched_resources(self, matches):
     cache_objs = {}
     if self.has_cache():
@@ -1121,8 +1318,14 @@ class Resource(ModelView):
       )
       matches_query = self.get_collection_matches(
           self.model, filter_by_contexts)
+    with benchmark("dispatch_request > collection_get > Check ETag"):
+      collection_etag = self.get_collection_etag(matches_query)
+      if self.request.headers.get('If-None-Match') == collection_etag:
+        return current_app.make_response((
+            '', 304, [('Etag', collection_etag)]))
     with benchmark("dispatch_request > collection_get > Query Data"):
-      if '__page' in request.args or '__page_only' in request.args:
+      if ('__page' in request.args or '__page_only' in request.args or
+              '__after' in request.args):
         with benchmark("Query matches with paging"):
           matches, extras = self.apply_paging(matches_query)
       else:
@@ -1161,14 +1364,24 @@ class Resource(ModelView):
         collection = self.build_collection_representation(
             objs, extras=extras)
 
-      if 'If-None-Match' in self.request.headers and \
-         self.request.headers['If-None-Match'] == etag(collection):
-        return current_app.make_response((
-            '', 304, [('Etag', etag(collection))]))
-
       with benchmark("Make response"):
         return self.json_success_response(
-            collection, self.collection_last_modified(), cache_op=cache_op)
+            collection, self.collection_last_modified(), cache_op=cache_op,
+            obj_etag=collection_etag)
+
+  def get_collection_etag(self, matches_query):
+    """Get an ETag of the collection without loading its objects.
+
+    The ETag changes if objects are added to or removed from the collection,
+    if any of them is updated or if the permissions of the user change.
+    """
+    matches = matches_query.order_by(None).subquery()
+    columns = [func.count(), func.max(matches.c.id)]
+    if self.modified_attr_name in matches.c:
+      columns.append(func.max(matches.c[self.modified_attr_name]))
+    validator = db.session.query(*columns).one()
+    return etag((request.full_path, tuple(validator),
+                 get_permissions_version()))
 
   def get_resources_from_cache(self, matches):
     """Get resources from cache for specified matches"""
@@ -1179,46 +1392,28 @@ class Resource(ModelView):
     if self.model.__name__ == 'BackgroundTask':
       return resources
     # Skip right to memcache
-    memcache_client = self.request.cache_manager.cache_object.memcache_client
+    cache_object = self.request.cache_manager.cache_object
     key_matches = {}
-    keys = []
     for match in matches:
       key = get_cache_key(None, id=match[0], type=match[1])
       key_matches[key] = match
-      keys.append(key)
-    while len(keys) > 0:
-      slice_keys = keys[:32]
-      keys = keys[32:]
-      result = memcache_client.get_multi(slice_keys)
-      for key in result:
-        if 'selfLink' in result[key]:
-          resources[key_matches[key]] = result[key]
+    result = cache_object.pipelined_get_multi(key_matches.keys())
+    for key in result:
+      if 'selfLink' in result[key]:
+        resources[key_matches[key]] = result[key]
     return resources
 
   def add_resources_to_cache(self, match_obj_pairs):
     """Add resources to cache if they are not blocked by DeleteOp entries"""
     # Skip right to memcache
-    memcache_client = self.request.cache_manager.cache_object.memcache_client
+    cache_object = self.request.cache_manager.cache_object
     key_objs = {}
     key_blockers = {}
-    keys = []
     for match, obj in match_obj_pairs.items():
       key = get_cache_key(None, id=match[0], type=match[1])
-      delete_op_key = "DeleteOp:{}".format(key)
-      keys.append(key)
       key_objs[key] = obj
-      key_blockers[key] = delete_op_key
-    while len(keys) > 0:
-      slice_keys = keys[:32]
-      keys = keys[32:]
-      blocker_keys = [key_blockers[slice_key] for slice_key in slice_keys]
-      result = memcache_client.get_multi(blocker_keys)
-      # Reduce `slice_keys` to only unblocked keys
-      slice_keys = [
-          slice_key for slice_key in slice_keys
-          if key_blockers[slice_key] not in result]
-      memcache_client.add_multi(
-          {key: key_objs[key] for key in slice_keys})
+      key_blockers[key] = "DeleteOp:{}".format(key)
+    cache_object.pipelined_add_unblocked(key_objs, key_blockers)
 
   def json_create(self, obj, src):
     ggrc.builder.json.create(obj, src)
@@ -1632,10 +1827,13 @@ class Resource(ModelView):
     return format_date_time(time.mktime(timestamp.utctimetuple()))
 
   def json_success_response(self, response_object, last_modified,
-                            status=200, id=None, cache_op=None):
+                            status=200, id=None, cache_op=None,
+                            obj_etag=None):
+    if obj_etag is None:
+      obj_etag = etag(response_object)
     headers = [
         ('Last-Modified', self.http_timestamp(last_modified)),
-        ('Etag', etag(response_object)),
+        ('Etag', obj_etag),
         ('Content-Type', 'application/json'),
     ]
     if id is not None:
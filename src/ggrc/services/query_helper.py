@@ -3,6 +3,7 @@
 
 """This module contains special query helper class for query API."""
 
+from ggrc import db
 from ggrc.builder import json
 from ggrc.converters.query_helper import QueryHelper
 from ggrc.models import inflector
@@ -43,33 +44,74 @@ class QueryAPIQueryHelper(QueryHelper):
       list of dicts: same query as the input with requested results that match
                      the filter.
     """
-    for object_query in self.query:
-      query_type = object_query.get("type", "values")
-      if query_type not in {"values", "ids", "count"}:
-        raise NotImplementedError("Only 'values', 'ids' and 'count' queries "
-                                  "are supported now")
-      model = inflector.get_model(object_query["object_name"])
-      if query_type == "values":
-        with benchmark("Get result set: get_results > _get_objects"):
-          objects = self._get_objects(object_query)
-        object_query["count"] = len(objects)
-        with benchmark("get_results > _get_last_modified"):
-          object_query["last_modified"] = self._get_last_modified(model,
-                                                                  objects)
-        with benchmark("serialization: get_results > _transform_to_json"):
-          object_query["values"] = self._transform_to_json(
-              objects,
-              object_query.get("fields"),
-          )
-      else:
-        with benchmark("Get result set: get_results -> _get_ids"):
-          ids = self._get_ids(object_query)
-        object_query["count"] = len(ids)
-        object_query["last_modified"] = None  # synonymous to now()
-        if query_type == "ids":
-          object_query["ids"] = ids
+    self._run_queries(self._set_results)
     return self.query
 
+  def _set_results(self, object_query):
+    """Set results requested by the "type" parameter of the object query."""
+    query_type = object_query.get("type", "values")
+    if query_type not in {"values", "ids", "count"}:
+      raise NotImplementedError("Only 'values', 'ids' and 'count' queries "
+                                "are supported now")
+    model = inflector.get_model(object_query["object_name"])
+    if query_type == "values" and object_query.get("fields"):
+      self._set_values_from_columns(model, object_query)
+    elif query_type == "values":
+      with benchmark("Get result set: get_results > _get_objects"):
+        objects = self._get_objects(object_query)
+      object_query["count"] = len(objects)
+      with benchmark("get_results > _get_last_modified"):
+        object_query["last_modified"] = self._get_last_modified(model,
+                                                                objects)
+      with benchmark("serialization: get_results > _transform_to_json"):
+        object_query["values"] = self._transform_to_json(
+            objects,
+            object_query.get("fields"),
+        )
+    else:
+      with benchmark("Get result set: get_results -> _get_ids"):
+        ids = self._get_ids(object_query)
+      object_query["count"] = len(ids)
+      object_query["last_modified"] = None  # synonymous to now()
+      if query_type == "ids":
+        object_query["ids"] = ids
+
+  def _set_values_from_columns(self, model, object_query):
+    """Set values of the requested fields without loading objects.
+
+    Only the columns needed for the requested fields are selected. Queries
+    with fields that can not be published from columns are handled by loading
+    full objects.
+    """
+    fields = object_query["fields"]
+    publisher = json.get_values_publisher(model, fields)
+    if publisher is None:
+      objects = self._get_objects(object_query)
+      object_query["count"] = len(objects)
+      object_query["last_modified"] = self._get_last_modified(model, objects)
+      object_query["values"] = self._transform_to_json(objects, fields)
+      return
+    columns, publish_row = publisher
+    with benchmark("Get ids: _set_values_from_columns > _get_ids"):
+      ids = self._get_ids(object_query)
+    rows = []
+    last_modified = None
+    if ids:
+      has_updated_at = hasattr(model, "updated_at")
+      if has_updated_at:
+        columns = columns + [model.updated_at]
+      with benchmark("Get columns: _set_values_from_columns"):
+        query = db.session.query(*columns).filter(model.id.in_(ids))
+        id_row_map = {row[0]: row for row in query}
+      rows = [id_row_map[id_] for id_ in ids if id_ in id_row_map]
+      if has_updated_at and rows:
+        last_modified = max(row[-1] for row in rows)
+    object_query["count"] = len(rows)
+    object_query["last_modified"] = last_modified
+    with benchmark("serialization: _set_values_from_columns"):
+      object_query["values"] = json.publish_representation(
+          [publish_row(row) for row in rows])
+
   @staticmethod
   def _transform_to_json(objects, fields=None):
     """Make a JSON representation of objects from the list."""
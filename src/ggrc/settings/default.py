@@ -70,6 +70,30 @@ SECRET_KEY = os.environ.get('GGRC_SECRET_KEY', 'Replace-with-something-secret')
 
 MEMCACHE_MECHANISM = True
 
+# Number of keys in a single memcache bulk call and number of bulk calls that
+# can run concurrently
+MEMCACHE_BATCH_SIZE = 32
+MEMCACHE_MAX_IN_FLIGHT = 8
+
+# Keep recently used memcache entries in an in-process cache limited by the
+# number of entries and their total pickled size
+MEMCACHE_LOCAL_TIER = True
+LOCAL_CACHE_MAX_ENTRIES = 5000
+LOCAL_CACHE_MAX_BYTES = 16 * 1024 * 1024
+
+# Serializer of values stored in memcache. CompactSerializer compresses
+# values larger than MEMCACHE_COMPRESS_THRESHOLD bytes.
+MEMCACHE_SERIALIZER = 'ggrc.cache.serializer.CompactSerializer'
+MEMCACHE_COMPRESS_THRESHOLD = 1024
+# Bytes saved by the serializer are measured for one of every
+# MEMCACHE_STATS_SAMPLE_RATE stored values. Set to 0 to disable measuring.
+MEMCACHE_STATS_SAMPLE_RATE = 100
+
+# Rendered object stubs are reused across requests for STUB_CACHE_TIMEOUT
+# seconds unless the object changes. Set the timeout to 0 to disable caching.
+STUB_CACHE_MAX_ENTRIES = 20000
+STUB_CACHE_TIMEOUT = 30
+
 # AppEngine Email
 APPENGINE_EMAIL = os.environ.get('APPENGINE_EMAIL', '')
 
@@ -93,6 +117,53 @@ USE_APP_ENGINE_ASSETS_SUBDOMAIN = False
 
 BACKGROUND_COLLECTION_POST_SLEEP = 0
 
+# Number of worker threads for running background tasks outside of App Engine
+BACKGROUND_TASK_WORKERS = 2
+
+# Number of threads that render and send digest emails and number of emails
+# given to a thread at once
+NOTIFICATION_WORKERS = 4
+NOTIFICATION_BATCH_SIZE = 20
+# Number of users whose digest emails are sent before their notifications are
+# marked as sent
+NOTIFICATION_CHUNK_SIZE = 200
+
+# Number of workflows whose new cycles are started and committed together by
+# the nightly cron job
+CYCLE_START_BATCH_SIZE = 20
+
+# Generate automappings for posted relationships in a background task instead
+# of the request that created the relationships
+AUTOMAPPING_IN_BACKGROUND = False
+
+# Number of worker processes used for a full reindex outside of App Engine and
+# number of object ids handled by a single reindex work unit
+REINDEX_WORKERS = 1
+REINDEX_CHUNK_SIZE = 1000
+
+# Number of snapshots whose revisions are loaded and indexed at once
+SNAPSHOT_INDEX_BATCH_SIZE = 200
+
+# Number of threads for running independent object queries of query API and
+# export requests in parallel. Every thread uses its own database connection
+# and transaction, and all requests of a process share QUERY_WORKERS threads,
+# so the database connection pool must have room for them. 1 runs all object
+# queries in the request thread.
+QUERY_WORKERS = 1
+
+# Ids matching a sub-expression shared by several object queries are passed
+# to the queries as a list if there are at most SHARED_EXPRESSION_MAX_IDS of
+# them, and as a subquery otherwise
+SHARED_EXPRESSION_MAX_IDS = 1000
+
+# Stream csv exports in chunks of EXPORT_CHUNK_SIZE objects instead of building
+# the whole file in memory. A streamed export that fails after the response
+# has started can not return an error status, so its last line is
+# EXPORT_FAILED_LINE from ggrc.views.converters instead, and clients must check
+# for it.
+EXPORT_STREAMING = False
+EXPORT_CHUNK_SIZE = 1000
+
 
 LOGGING_HANDLER = {
     "class": "logging.StreamHandler",
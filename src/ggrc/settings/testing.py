@@ -14,3 +14,5 @@ FULLTEXT_INDEXER = 'ggrc.fulltext.mysql.MysqlIndexer'
 LOGIN_MANAGER = 'ggrc.login.noop'
 # SQLALCHEMY_ECHO = True
 MEMCACHE_MECHANISM = False
+# Object ids are reused between tests, so stubs must not be cached
+STUB_CACHE_TIMEOUT = 0
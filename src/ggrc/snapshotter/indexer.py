@@ -3,12 +3,14 @@
 
 """Manage indexing for snapshotter service"""
 
+import itertools
 import logging
 
 from sqlalchemy.sql.expression import tuple_
 
 from ggrc import db
 from ggrc import models
+from ggrc import settings
 from ggrc.models import all_models
 from ggrc.fulltext.mysql import MysqlRecordProperty as Record
 from ggrc.fulltext.recordbuilder import RecordBuilder
@@ -130,18 +132,27 @@ def get_searchable_attributes(attributes, cad_list, content):
   return searchable_values
 
 
-def reindex():
-  """Reindex all snapshots."""
+def _iter_pairs(query):
+  """Generate snapshot pairs from query rows, loading rows in chunks."""
+  for query_chunk in generate_query_chunks(query):
+    for row in query_chunk:
+      yield Pair.from_4tuple(row)
+
+
+def reindex(batch_size=None):
+  """Reindex all snapshots.
+
+  Args:
+    batch_size: Number of snapshots indexed at once. Defaults to
+        SNAPSHOT_INDEX_BATCH_SIZE setting.
+  """
   columns = db.session.query(
       models.Snapshot.parent_type,
       models.Snapshot.parent_id,
       models.Snapshot.child_type,
       models.Snapshot.child_id,
   )
-  for query_chunk in generate_query_chunks(columns):
-    pairs = {Pair.from_4tuple(p) for p in query_chunk}
-    reindex_pairs(pairs)
-    db.session.commit()
+  reindex_pairs(_iter_pairs(columns), batch_size=batch_size)
 
 
 def reindex_snapshots(snapshot_ids):
@@ -154,33 +165,38 @@ def reindex_snapshots(snapshot_ids):
       models.Snapshot.child_type,
       models.Snapshot.child_id,
   ).filter(models.Snapshot.id.in_(snapshot_ids))
-  for query_chunk in generate_query_chunks(columns):
-    pairs = {Pair.from_4tuple(p) for p in query_chunk}
-    reindex_pairs(pairs)
-    db.session.commit()
+  reindex_pairs(_iter_pairs(columns))
 
 
-def delete_records(snapshot_ids):
+def delete_records(snapshot_ids, table=None):
   """Delete all records for some snapshots.
   Args:
     snapshot_ids: An iterable with snapshot IDs whose full text records should
         be deleted.
+    table: Full text table to delete records from. Defaults to the table of
+        the full text Record model.
   """
+  if table is None:
+    table = Record.__table__
   to_delete = {("Snapshot", _id) for _id in snapshot_ids}
-  db.session.query(Record).filter(
-      tuple_(Record.type, Record.key).in_(to_delete)
-  ).delete(synchronize_session=False)
+  db.session.execute(table.delete().where(
+      tuple_(table.c.type, table.c.key).in_(to_delete)
+  ))
   db.session.commit()
 
 
-def insert_records(payload):
+def insert_records(payload, table=None):
   """Insert records to full text table.
 
   Args:
     payload: List of dictionaries that represent records entries.
+    table: Full text table to insert records into. Defaults to the table of
+        the full text Record model.
   """
+  if table is None:
+    table = Record.__table__
   engine = db.engine
-  engine.execute(Record.__table__.insert(), payload)
+  engine.execute(table.insert(), payload)
   db.session.commit()
 
 
@@ -208,106 +224,137 @@ def get_person_sort_subprop(rec, people):
   return data
 
 
-def reindex_pairs(pairs):  # noqa  # pylint:disable=too-many-branches
+def _iter_batches(iterable, batch_size):
+  """Split an iterable into lists of at most batch_size items."""
+  iterator = iter(iterable)
+  batch = list(itertools.islice(iterator, batch_size))
+  while batch:
+    yield batch
+    batch = list(itertools.islice(iterator, batch_size))
+
+
+def reindex_pairs(pairs, table=None, batch_size=None):
   """Reindex selected snapshots.
 
+  Pairs are processed in batches, so memory usage depends on the batch size
+  and not on the number of reindexed snapshots.
+
   Args:
-    pairs: A list of parent-child pairs that uniquely represent snapshot
+    pairs: An iterable of parent-child pairs that uniquely represent snapshot
     object whose properties should be reindexed.
+    table: Full text table for the snapshot records. Defaults to the table of
+        the full text Record model.
+    batch_size: Number of snapshots indexed at once. Defaults to
+        SNAPSHOT_INDEX_BATCH_SIZE setting.
+  """
+  if batch_size is None:
+    batch_size = settings.SNAPSHOT_INDEX_BATCH_SIZE
+  model_properties = _get_model_properties()
+  for batch in _iter_batches(pairs, batch_size):
+    _reindex_pairs_batch(batch, model_properties, table)
+
+
+def _reindex_pairs_batch(pairs, model_properties, table):  # noqa
+  """Reindex snapshots for a single batch of pairs.
+
+  Args:
+    pairs: A list of parent-child pairs.
+    model_properties: Searchable properties as returned by
+        _get_model_properties.
+    table: Full text table for the snapshot records.
   """
 
-  # pylint: disable=too-many-locals
+  # pylint: disable=too-many-locals,too-many-branches
   snapshots = dict()
   revisions = dict()
-  snap_to_sid_cache = dict()
   search_payload = list()
 
-  object_properties, cad_list = _get_model_properties()
+  object_properties, cad_list = model_properties
 
   snapshot_columns, revision_columns = _get_columns()
 
-  snapshot_query = snapshot_columns
-  if pairs:  # pylint:disable=too-many-nested-blocks
-    pairs_filter = tuple_(
-        models.Snapshot.parent_type,
-        models.Snapshot.parent_id,
-        models.Snapshot.child_type,
-        models.Snapshot.child_id,
-    ).in_({pair.to_4tuple() for pair in pairs})
-    snapshot_query = snapshot_columns.filter(pairs_filter)
-
-    for _id, ctx_id, ptype, pid, ctype, cid, revid in snapshot_query:
-      pair = Pair.from_4tuple((ptype, pid, ctype, cid))
-      snapshots[pair] = [_id, ctx_id, revid]
-      snap_to_sid_cache[pair] = _id
-
-    revision_ids = {revid for _, _, revid in snapshots.values()}
-    revision_query = revision_columns.filter(
-        models.Revision.id.in_(revision_ids)
-    )
-    for _id, _type, content in revision_query:
-      revisions[_id] = get_searchable_attributes(
-          object_properties[_type], cad_list, content)
-
-    snapshot_ids = set()
-    for pair in snapshots:
-      snapshot_id, ctx_id, revision_id = snapshots[pair]
-      snapshot_ids.add(snapshot_id)
-
-      properties = revisions[revision_id]
-      properties.update({
-          "parent": _get_parent_property(pair),
-          "child": _get_child_property(pair),
-          "child_type": pair.child.type,
-          "child_id": pair.child.id
-      })
-
-      assignees = properties.pop("assignees", None)
-      if assignees:
-        for person, roles in assignees:
-          if person:
-            for role in roles:
-              properties[role] = [person]
-
-      single_person_properties = {"modified_by", "principal_assessor",
-                                  "secondary_assessor", "contact",
-                                  "secondary_contact"}
-
-      multiple_person_properties = {"owners"}
-
-      for prop, val in properties.items():
-        if prop and val is not None:
-          # record stub
-          rec = {
-              "key": snapshot_id,
-              "type": "Snapshot",
-              "context_id": ctx_id,
-              "tags": _get_tag(pair),
-              "property": prop,
-              "subproperty": "",
-              "content": val,
-          }
-          if prop in single_person_properties:
-            if val:
-              search_payload += get_person_data(rec, val)
-              search_payload += get_person_sort_subprop(rec, [val])
-          elif prop in multiple_person_properties:
-            for person in val:
-              search_payload += get_person_data(rec, person)
-            search_payload += get_person_sort_subprop(rec, val)
-          elif isinstance(val, dict) and "title" in val:
-            rec["content"] = val["title"]
-            search_payload += [rec]
-          elif isinstance(val, (bool, int, long)):
-            rec["content"] = unicode(val)
+  pairs_filter = tuple_(
+      models.Snapshot.parent_type,
+      models.Snapshot.parent_id,
+      models.Snapshot.child_type,
+      models.Snapshot.child_id,
+  ).in_({pair.to_4tuple() for pair in pairs})
+  snapshot_query = snapshot_columns.filter(pairs_filter)
+
+  for _id, ctx_id, ptype, pid, ctype, cid, revid in snapshot_query:
+    pair = Pair.from_4tuple((ptype, pid, ctype, cid))
+    snapshots[pair] = [_id, ctx_id, revid]
+
+  revision_ids = {revid for _, _, revid in snapshots.values()}
+  if not revision_ids:
+    return
+  revision_query = revision_columns.filter(
+      models.Revision.id.in_(revision_ids)
+  )
+  for _id, _type, content in revision_query:
+    revisions[_id] = get_searchable_attributes(
+        object_properties[_type], cad_list, content)
+
+  single_person_properties = {"modified_by", "principal_assessor",
+                              "secondary_assessor", "contact",
+                              "secondary_contact"}
+
+  multiple_person_properties = {"owners"}
+
+  snapshot_ids = set()
+  for pair in snapshots:
+    snapshot_id, ctx_id, revision_id = snapshots[pair]
+    snapshot_ids.add(snapshot_id)
+
+    properties = dict(revisions[revision_id])
+    properties.update({
+        "parent": _get_parent_property(pair),
+        "child": _get_child_property(pair),
+        "child_type": pair.child.type,
+        "child_id": pair.child.id
+    })
+
+    assignees = properties.pop("assignees", None)
+    if assignees:
+      for person, roles in assignees:
+        if person:
+          for role in roles:
+            properties[role] = [person]
+
+    for prop, val in properties.items():
+      if prop and val is not None:
+        # record stub
+        rec = {
+            "key": snapshot_id,
+            "type": "Snapshot",
+            "context_id": ctx_id,
+            "tags": _get_tag(pair),
+            "property": prop,
+            "subproperty": "",
+            "content": val,
+        }
+        if prop in single_person_properties:
+          if val:
+            search_payload += get_person_data(rec, val)
+            search_payload += get_person_sort_subprop(rec, [val])
+        elif prop in multiple_person_properties:
+          for person in val:
+            search_payload += get_person_data(rec, person)
+          search_payload += get_person_sort_subprop(rec, val)
+        elif isinstance(val, dict) and "title" in val:
+          rec["content"] = val["title"]
+          search_payload += [rec]
+        elif isinstance(val, (bool, int, long)):
+          rec["content"] = unicode(val)
+          search_payload += [rec]
+        else:
+          if isinstance(rec["content"], basestring):
             search_payload += [rec]
           else:
-            if isinstance(rec["content"], basestring):
-              search_payload += [rec]
-            else:
-              logger.warning(u"Unsupported value for %s #%s in %s %s: %r",
-                             rec["type"], rec["key"], rec["property"],
-                             rec["subproperty"], rec["content"])
-
-    delete_records(snapshot_ids)
-    insert_records(search_payload)
+            logger.warning(u"Unsupported value for %s #%s in %s %s: %r",
+                           rec["type"], rec["key"], rec["property"],
+                           rec["subproperty"], rec["content"])
+
+  delete_records(snapshot_ids, table)
+  if search_payload:
+    insert_records(search_payload, table)
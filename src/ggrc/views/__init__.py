@@ -18,27 +18,24 @@ from werkzeug.exceptions import Forbidden
 from ggrc import models
 from ggrc import settings
 from ggrc.app import app
-from ggrc.app import db
+from ggrc.automapper import generate_queued_automappings
 from ggrc.builder.json import publish
 from ggrc.builder.json import publish_representation
 from ggrc.converters import get_importables, get_exportables
 from ggrc.extensions import get_extension_modules
-from ggrc.fulltext import get_indexer, get_indexed_model_names
-from ggrc.fulltext.recordbuilder import fts_record_for
+from ggrc.fulltext import reindex as fulltext_reindex
 from ggrc.login import get_current_user
 from ggrc.login import login_required
 from ggrc.models import all_models
 from ggrc.models.background_task import create_task
 from ggrc.models.background_task import make_task_response
 from ggrc.models.background_task import queued_task
-from ggrc.models.inflector import get_model
 from ggrc.models.reflection import AttributeInfo
 from ggrc.rbac import permissions
 from ggrc.services.common import as_json
 from ggrc.services.common import inclusion_filter
 from ggrc.services import query as services_query
 from ggrc.snapshotter import rules
-from ggrc.snapshotter.indexer import reindex as reindex_snapshots
 from ggrc.views import converters
 from ggrc.views import cron
 from ggrc.views import filters
@@ -47,7 +44,6 @@ from ggrc.views import notifications
 from ggrc.views.common import RedirectedPolymorphView
 from ggrc.views.registry import object_view
 from ggrc.utils import benchmark
-from ggrc.utils import generate_query_chunks
 from ggrc.utils import revisions
 
 logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
@@ -70,36 +66,19 @@ def reindex(_):
   return app.make_response(("success", 200, [("Content-Type", "text/html")]))
 
 
+@app.route("/_background_tasks/automapping", methods=["POST"])
+@queued_task
+def automapping(task):
+  """Web hook to generate automappings for posted relationships."""
+  result = generate_queued_automappings(task.parameters["relationship_ids"])
+  return app.make_response((json.dumps(result), 200,
+                            [("Content-Type", "application/json")]))
+
+
 def do_reindex():
   """Update the full text search index."""
-
-  indexer = get_indexer()
-  with benchmark('Delete all records'):
-    indexer.delete_all_records(False)
-
-  indexed_models = get_indexed_model_names()
-
-  people = db.session.query(all_models.Person.id, all_models.Person.name,
-                            all_models.Person.email)
-  g.people_map = {p.id: (p.name, p.email) for p in people}
-
-  for model in sorted(indexed_models):
-    # pylint: disable=protected-access
-    logger.info("Updating index for: %s", model)
-    with benchmark("Create records for %s" % model):
-      model = get_model(model)
-      mapper_class = model._sa_class_manager.mapper.base_mapper.class_
-      query = model.query.options(
-          db.undefer_group(mapper_class.__name__ + '_complete'),
-      )
-      for query_chunk in generate_query_chunks(query):
-        for instance in query_chunk:
-          indexer.create_record(fts_record_for(instance), False)
-        db.session.commit()
-
-  reindex_snapshots()
-
-  delattr(g, "people_map")
+  with benchmark("Full reindex"):
+    fulltext_reindex.reindex()
 
 
 def get_permissions_json():
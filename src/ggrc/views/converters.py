@@ -13,21 +13,31 @@ from flask import current_app
 from flask import request
 from flask import json
 from flask import render_template
+from flask import stream_with_context
 from werkzeug.exceptions import BadRequest
 
+from ggrc import settings
 from ggrc.app import app
 from ggrc.converters.base import Converter
+from ggrc.converters.import_helper import generate_csv_chunks
 from ggrc.converters.import_helper import generate_csv_string
 from ggrc.converters.import_helper import read_csv_file
 from ggrc.converters.query_helper import BadQueryException
 from ggrc.converters.query_helper import QueryHelper
 from ggrc.login import login_required
+from ggrc.models.background_task import create_task
+from ggrc.models.background_task import queued_task
+from ggrc.models.background_task import worker_pool_callback
 from ggrc.utils import benchmark
+from ggrc.utils import create_stub
 
 
 # pylint: disable=invalid-name
 logger = getLogger(__name__)
 
+# Last line of a streamed csv file when the export failed after it started
+EXPORT_FAILED_LINE = "Export failed due to server error.\r\n"
+
 
 def check_required_headers(required_headers):
   errors = []
@@ -52,25 +62,94 @@ def parse_export_request():
   return request.json
 
 
+def get_export_headers(converter):
+  """Get response headers for the exported csv file."""
+  object_names = "_".join(converter.get_object_names())
+  filename = "{}.csv".format(object_names)
+  return [
+      ("Content-Type", "text/csv"),
+      ("Content-Disposition",
+       "attachment; filename='{}'".format(filename)),
+  ]
+
+
+def generate_export_chunks(converter):
+  """Generate csv file chunks and log errors that happen while streaming.
+
+  The response status is already sent when an error happens, so the failure
+  is marked with EXPORT_FAILED_LINE at the end of the file instead.
+  """
+  try:
+    csv_chunks = converter.to_array_chunks(settings.EXPORT_CHUNK_SIZE)
+    for csv_string in generate_csv_chunks(csv_chunks):
+      yield csv_string
+  except:  # pylint: disable=bare-except
+    logger.exception("Export failed")
+    yield EXPORT_FAILED_LINE
+
+
+def make_streaming_export_response(converter):
+  """Make a chunked response that writes csv rows as they are generated."""
+  with benchmark("Create block converters"):
+    converter.block_converters_from_ids()
+  return current_app.response_class(
+      stream_with_context(generate_export_chunks(converter)),
+      200,
+      get_export_headers(converter),
+  )
+
+
+def is_background_request():
+  """Check if the import or export should run in a background task."""
+  return "X-GGRC-BackgroundTask" in request.headers
+
+
+def make_task_json_response(task):
+  """Make a response with the background task that runs the conversion.
+
+  Progress of the task can be polled on /background_task/<id> and the final
+  csv file or import report is stored in the task result.
+  """
+  task_json = create_stub(task)
+  task_json["status"] = task.status
+  response_json = json.dumps({"background_task": task_json})
+  headers = [("Content-Type", "application/json")]
+  return current_app.make_response((response_json, 202, headers))
+
+
+@queued_task
+def run_export_task(task):
+  """Export objects in a background task and store the csv in the result."""
+  with benchmark("Run export task"):
+    ids_by_type = QueryHelper(task.parameters).get_ids()
+    converter = Converter(ids_by_type=ids_by_type,
+                          progress_callback=task.update_progress)
+    converter.block_converters_from_ids()
+    csv_chunks = converter.to_array_chunks(settings.EXPORT_CHUNK_SIZE)
+    csv_string = "".join(generate_csv_chunks(csv_chunks))
+    headers = get_export_headers(converter)
+    return current_app.make_response((csv_string, 200, headers))
+
+
 def handle_export_request():
   try:
     with benchmark("handle export request"):
       data = parse_export_request()
+      if is_background_request():
+        task = create_task("export_csv", "/_background_tasks/export_csv",
+                           worker_pool_callback(run_export_task), data)
+        return make_task_json_response(task)
       query_helper = QueryHelper(data)
       ids_by_type = query_helper.get_ids()
+    converter = Converter(ids_by_type=ids_by_type)
+    if settings.EXPORT_STREAMING:
+      return make_streaming_export_response(converter)
     with benchmark("Generate CSV array"):
-      converter = Converter(ids_by_type=ids_by_type)
       csv_data = converter.to_array()
     with benchmark("Generate CSV string"):
       csv_string = generate_csv_string(csv_data)
     with benchmark("Make response."):
-      object_names = "_".join(converter.get_object_names())
-      filename = "{}.csv".format(object_names)
-      headers = [
-          ("Content-Type", "text/csv"),
-          ("Content-Disposition",
-           "attachment; filename='{}'".format(filename)),
-      ]
+      headers = get_export_headers(converter)
       return current_app.make_response((csv_string, 200, headers))
   except BadQueryException as exception:
     raise BadRequest(exception.message)
@@ -101,15 +180,36 @@ def parse_import_request():
   return dry_run, csv_data
 
 
+def make_import_response(converter):
+  """Make a response with the import report."""
+  response_data = converter.get_info()
+  response_json = json.dumps(response_data)
+  headers = [("Content-Type", "application/json")]
+  return current_app.make_response((response_json, 200, headers))
+
+
+@queued_task
+def run_import_task(task):
+  """Import csv data in a background task and store the import report."""
+  with benchmark("Run import task"):
+    converter = Converter(dry_run=task.parameters["dry_run"],
+                          csv_data=task.parameters["csv_data"],
+                          progress_callback=task.update_progress)
+    converter.import_csv()
+    return make_import_response(converter)
+
+
 def handle_import_request():
   try:
     dry_run, csv_data = parse_import_request()
+    if is_background_request():
+      parameters = {"dry_run": dry_run, "csv_data": csv_data}
+      task = create_task("import_csv", "/_background_tasks/import_csv",
+                         worker_pool_callback(run_import_task), parameters)
+      return make_task_json_response(task)
     converter = Converter(dry_run=dry_run, csv_data=csv_data)
     converter.import_csv()
-    response_data = converter.get_info()
-    response_json = json.dumps(response_data)
-    headers = [("Content-Type", "application/json")]
-    return current_app.make_response((response_json, 200, headers))
+    return make_import_response(converter)
   except:  # pylint: disable=bare-except
     logger.exception("Import failed")
   raise BadRequest("Import failed due to server error.")
@@ -132,6 +232,14 @@ def init_converter_views():
     with benchmark("handle import request"):
       return handle_import_request()
 
+  @app.route("/_background_tasks/export_csv", methods=["POST"])
+  def export_csv_task():
+    return run_export_task()
+
+  @app.route("/_background_tasks/import_csv", methods=["POST"])
+  def import_csv_task():
+    return run_import_task()
+
   @app.route("/import")
   @login_required
   def import_view():
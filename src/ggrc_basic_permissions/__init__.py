@@ -26,6 +26,7 @@ from ggrc.models.object_owner import ObjectOwner
 from ggrc.rbac import permissions as rbac_permissions
 from ggrc.rbac.permissions_provider import DefaultUserPermissions
 from ggrc.services.common import _get_cache_manager
+from ggrc.services.common import get_permissions_cache_key
 from ggrc.services.common import Resource
 from ggrc.services.registry import service
 from ggrc.utils import benchmark
@@ -344,35 +345,28 @@ def collect_permissions(src_permissions, context_id, permissions):
             })
 
 
-def query_memcache(key):
+def query_memcache(user_id):
   """Check if cached permissions are available
 
   Args:
-      key (string): key of the stored permissions
+      user_id (int): id of the user whose permissions are queried
   Returns:
       cache (memcache_client): memcache client or None if caching
                                is not available
+      key (string): key of the current user permissions or None if caching
+                    is not available
       permissions_cache (dict): dict with all permissions or None if there
                                 was a cache miss
   """
   if not getattr(settings, 'MEMCACHE_MECHANISM', False):
-    return None, None
+    return None, None, None
 
+  from ggrc.cache.serializer import get_serializer
   cache = _get_cache_manager().cache_object.memcache_client
-  cached_keys_set = cache.get('permissions:list') or set()
-  if key not in cached_keys_set:
-    # We set the permissions:list variable so that we are able to batch
-    # remove all permissions related keys from memcache
-    cached_keys_set.add(key)
-    cache.set('permissions:list', cached_keys_set, PERMISSION_CACHE_TIMEOUT)
-    return cache, None
-
-  permissions_cache = cache.get(key)
-  if permissions_cache:
-    # If the key is both in permissions:list and in memcache itself
-    # it is safe to return the cached permissions
-    return cache, permissions_cache
-  return cache, None
+  key = get_permissions_cache_key(cache, user_id)
+  if key is None:
+    return None, None, None
+  return cache, key, get_serializer().loads(cache.get(key))
 
 
 def load_default_permissions(permissions):
@@ -711,26 +705,27 @@ def load_backlog_workflows(permissions):
             .append(wf_context_id)
 
 
-def store_results_into_memcache(permissions, cache, key):
-  """Load personal context for user
+def store_results_into_memcache(permissions, cache, key, user_id):
+  """Store loaded permissions into memcache
 
   Args:
       permissions (dict): dict where the permissions will be stored
       cache (cache_manager): Cache manager that should be used for storing
                              permissions
       key (string): key of under which permissions should be stored
+      user_id (int): id of the user whose permissions are stored
   Returns:
       None
   """
   if cache is None:
     return
 
-  cached_keys_set = cache.get('permissions:list') or set()
-  if key in cached_keys_set:
-    # We only add the permissions to the cache if the
-    # key still exists in the permissions:list after
-    # the query has executed.
-    cache.set(key, permissions, PERMISSION_CACHE_TIMEOUT)
+  from ggrc.cache.serializer import get_serializer
+  if key == get_permissions_cache_key(cache, user_id):
+    # We only add the permissions to the cache if the permissions were not
+    # invalidated while the queries were executed.
+    cache.set(key, get_serializer().dumps(permissions),
+              PERMISSION_CACHE_TIMEOUT)
 
 
 def load_permissions_for(user):
@@ -752,10 +747,9 @@ def load_permissions_for(user):
   'terms' are the arguments to the 'condition'.
   """
   permissions = {}
-  key = 'permissions:{}'.format(user.id)
 
   with benchmark("load_permissions > query memcache"):
-    cache, result = query_memcache(key)
+    cache, key, result = query_memcache(user.id)
     if result:
       return result
 
@@ -792,7 +786,7 @@ def load_permissions_for(user):
     load_backlog_workflows(permissions)
 
   with benchmark("load_permissions > store results into memcache"):
-    store_results_into_memcache(permissions, cache, key)
+    store_results_into_memcache(permissions, cache, key, user.id)
 
   return permissions
 
@@ -153,6 +153,10 @@ class UserRoleColumnHandler(UserColumnHandler):
       ""
   ]
 
+  @classmethod
+  def get_import_references(cls, raw_value, **options):
+    return []
+
   def parse_item(self):
     value = self.raw_value.lower()
     if value.title() not in self._allowed_roles:
@@ -1,16 +1,19 @@
 # Copyright (C) 2017 Google Inc.
 # Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
 
+import itertools
+import logging
 from datetime import datetime, date
 from flask import Blueprint
-from sqlalchemy import inspect, and_, orm
+from sqlalchemy import inspect, and_, case, func, orm
 
 from ggrc import db
+from ggrc import settings
 from ggrc.login import get_current_user
 from ggrc.models import all_models
 from ggrc.models.relationship import Relationship
 from ggrc.rbac.permissions import is_allowed_update
-from ggrc.services.common import Resource, log_event
+from ggrc.services.common import Resource, get_cache, log_event
 from ggrc.services.registry import service
 from ggrc_workflows import models, notification
 from ggrc_workflows.models import relationship_helper
@@ -28,6 +31,8 @@ from ggrc_basic_permissions.contributed_roles import (
 )
 
 
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
 # Initialize Flask Blueprint for extension
 blueprint = Blueprint(
     'ggrc_workflows',
@@ -162,15 +167,233 @@ def update_cycle_dates(cycle):
     return
 
   for ctg in cycle.cycle_task_groups:
-    ctg.start_date, ctg.end_date = _get_date_range(
-        ctg.cycle_task_group_tasks)
-    ctg.next_due_date = _get_min_end_date(
-        ctg.cycle_task_group_tasks)
+    _set_cycle_task_group_dates(ctg)
 
   cycle.start_date, cycle.end_date = _get_date_range(cycle.cycle_task_groups)
   cycle.next_due_date = _get_min_next_due_date(cycle.cycle_task_groups)
 
 
+def _set_cycle_task_group_dates(ctg):
+  """Aggregate dates of all loaded tasks of the cycle task group."""
+  ctg.start_date, ctg.end_date = _get_date_range(ctg.cycle_task_group_tasks)
+  ctg.next_due_date = _get_min_end_date(ctg.cycle_task_group_tasks)
+
+
+def repair_cycle_dates():
+  """Recompute dates of all current cycles from all of their tasks.
+
+  Dates of cycles and cycle task groups are otherwise updated from the change
+  of a single task, so this is only needed to fix aggregates that got out of
+  sync.
+  """
+  for cycle in models.Cycle.query.filter_by(is_current=True):
+    update_cycle_dates(cycle)
+  db.session.commit()
+
+
+# Date aggregates of cycles and cycle task groups and functions that combine
+# dates of all children into the aggregate.
+_DATE_AGGREGATES = (
+    ("start_date", min),
+    ("end_date", max),
+    ("next_due_date", min),
+)
+
+# Children of cycle objects as (model, parent id attribute) pairs
+_cycle_task_children = {
+    models.CycleTaskGroup: (models.CycleTaskGroupObjectTask,
+                            "cycle_task_group_id"),
+    models.Cycle: (models.CycleTaskGroup, "cycle_id"),
+}
+
+
+def _to_date(value):
+  if isinstance(value, datetime):
+    return value.date()
+  return value
+
+
+def _get_cycle_object_parent(obj):
+  if isinstance(obj, models.CycleTaskGroupObjectTask):
+    return obj.cycle_task_group
+  return obj.cycle
+
+
+def _get_date_contribution(obj, values=None):
+  """Get dates that a cycle task or a cycle task group adds to its parent.
+
+  Args:
+    obj: CycleTaskGroupObjectTask or CycleTaskGroup.
+    values: optional dict of attribute values used instead of the values of
+        obj.
+
+  Returns:
+    (start_date, end_date, next_due_date) tuple. Done objects do not count for
+    the next due date of their parent.
+  """
+  values = values or {}
+
+  def get(attr):
+    if attr in values:
+      return values[attr]
+    return getattr(obj, attr)
+
+  if get("status") in DONE_STATUSES:
+    due_date = None
+  elif isinstance(obj, models.CycleTaskGroupObjectTask):
+    due_date = get("end_date")
+  else:
+    due_date = get("next_due_date")
+  return _to_date(get("start_date")), _to_date(get("end_date")), \
+      _to_date(due_date)
+
+
+def _get_old_date_contribution(obj):
+  """Get dates that obj added to its parent before its unflushed changes.
+
+  Returns:
+    (start_date, end_date, next_due_date) tuple or None if the old values are
+    not known.
+  """
+  old_values = {}
+  attrs = inspect(obj).attrs
+  for attr in ("start_date", "end_date", "next_due_date", "status"):
+    if attr not in attrs:
+      continue
+    history = attrs[attr].history
+    if history.deleted:
+      old_values[attr] = history.deleted[0]
+    elif history.added:
+      return None
+  if not old_values:
+    # Changes could have been flushed already, for example by an autoflush
+    # while handling other rows of an import.
+    return None
+  return _get_date_contribution(obj, old_values)
+
+
+def _get_pending_children(parent, child):
+  """Get changed objects of the child model that are not flushed yet.
+
+  Imports change many cycle objects before anything is flushed, so the
+  database does not have current values of these objects.
+
+  Returns:
+    (pending, siblings) tuple with all pending objects of the child model and
+    the ones among them that are other children of the parent.
+  """
+  model, _ = _cycle_task_children[type(parent)]
+  pending = [obj for obj in itertools.chain(db.session.new, db.session.dirty)
+             if isinstance(obj, model) and obj is not child]
+  siblings = [obj for obj in pending
+              if _get_cycle_object_parent(obj) is parent]
+  return pending, siblings
+
+
+def _get_children_query(parent, child, pending, *entities):
+  """Query other children of the parent than the given and pending ones."""
+  model, parent_id_attr = _cycle_task_children[type(parent)]
+  query = db.session.query(*entities).filter(
+      getattr(model, parent_id_attr) == parent.id)
+  excluded_ids = [obj.id for obj in pending + [child] if obj.id is not None]
+  if excluded_ids:
+    query = query.filter(model.id.notin_(excluded_ids))
+  return query
+
+
+def _get_children_status_counts(parent, child):
+  """Count children of the parent by their status.
+
+  Stored children are counted with a single query, so that they don't have
+  to be loaded. The given child and other pending children are counted with
+  their current status.
+  """
+  model, _ = _cycle_task_children[type(parent)]
+  with db.session.no_autoflush:
+    pending, siblings = _get_pending_children(parent, child)
+    counts = dict(_get_children_query(
+        parent, child, pending, model.status, func.count(model.id)
+    ).group_by(model.status))
+  for obj in siblings + [child]:
+    counts[obj.status] = counts.get(obj.status, 0) + 1
+  return counts
+
+
+def _get_children_dates(parent, child):
+  """Aggregate dates of other children of the parent.
+
+  Stored children are aggregated with a single query and pending children
+  are added with their current dates.
+  """
+  model, _ = _cycle_task_children[type(parent)]
+  if model is models.CycleTaskGroupObjectTask:
+    due_date = model.end_date
+  else:
+    due_date = model.next_due_date
+  with db.session.no_autoflush:
+    pending, siblings = _get_pending_children(parent, child)
+    stored_dates = _get_children_query(
+        parent, child, pending,
+        func.min(model.start_date),
+        func.max(model.end_date),
+        func.min(case([(model.status.notin_(DONE_STATUSES), due_date)])),
+    ).one()
+    all_dates = [[_to_date(value) for value in stored_dates]]
+    all_dates.extend(_get_date_contribution(obj) for obj in siblings)
+  dates = []
+  for values, (_, aggregate) in zip(zip(*all_dates), _DATE_AGGREGATES):
+    values = [value for value in values if value is not None]
+    dates.append(aggregate(values) if values else None)
+  return dates
+
+
+def update_cycle_object_parent_dates(obj, old_dates):
+  """Update dates of the parent of a cycle task or a cycle task group.
+
+  The dates of the parent are updated from the difference between the old and
+  the new dates of obj. Only when obj was the bound of an aggregate and moved
+  away from it, the dates of other children are aggregated with a query. The
+  change of a cycle task group is propagated further to its cycle.
+
+  Args:
+    obj: changed CycleTaskGroupObjectTask or CycleTaskGroup.
+    old_dates: (start_date, end_date, next_due_date) that obj added to its
+        parent before the change, Nones for a new object or None if they are
+        not known.
+  """
+  parent = _get_cycle_object_parent(obj)
+  if parent is None or obj.cycle.workflow.kind == "Backlog":
+    return
+  new_dates = _get_date_contribution(obj)
+  if old_dates == new_dates:
+    return
+  if isinstance(parent, models.CycleTaskGroup):
+    parent_old_dates = _get_date_contribution(parent)
+  else:
+    parent_old_dates = None
+
+  other_dates = None
+  for index, (attr, aggregate) in enumerate(_DATE_AGGREGATES):
+    new_value = new_dates[index]
+    current = _to_date(getattr(parent, attr))
+    if old_dates is None:
+      old_value = current
+    else:
+      old_value = old_dates[index]
+    moved_away = new_value is None or \
+        aggregate(old_value, new_value) != new_value
+    if old_value is not None and old_value == current and moved_away:
+      if other_dates is None:
+        other_dates = _get_children_dates(parent, obj)
+      current = other_dates[index]
+    values = [value for value in (current, new_value) if value is not None]
+    setattr(parent, attr, aggregate(values) if values else None)
+  db.session.add(parent)
+
+  if parent_old_dates is not None:
+    update_cycle_object_parent_dates(parent, parent_old_dates)
+
+
 @Resource.model_posted.connect_via(models.Cycle)
 def handle_cycle_post(sender, obj=None, src=None, service=None):  # noqa pylint: disable=unused-argument
   if src.get('autogenerate', False):
@@ -227,7 +450,7 @@ def _create_cycle_task(task_group_task, cycle, cycle_task_group,
 
 
 def create_old_style_cycle(cycle, task_group, cycle_task_group, current_user,
-                           base_date):
+                           base_date, task_objects=None):
   """ This function preserves the old style of creating cycles, so each object
   gets its own task assigned to it.
   """
@@ -238,17 +461,76 @@ def create_old_style_cycle(cycle, task_group, cycle_task_group, current_user,
           current_user, base_date)
 
   for task_group_object in task_group.task_group_objects:
-    object_ = task_group_object.object
     for task_group_task in task_group.task_group_tasks:
       cycle_task_group_object_task = _create_cycle_task(
           task_group_task, cycle, cycle_task_group,
           current_user, base_date)
-      db.session.add(Relationship(source=cycle_task_group_object_task,
-                                  destination=object_))
+      _relate_cycle_task(cycle_task_group_object_task, task_group_object,
+                         task_objects)
+
 
+def _relate_cycle_task(cycle_task, task_group_object, task_objects=None):
+  """Map the cycle task to the object of the task group object.
 
-def build_cycle(cycle, current_user=None, base_date=None):
-  """Build a cycle with it's child objects"""
+  If the task_objects list is given, the pair is only appended to it and the
+  relationship is created by _insert_cycle_task_relationships.
+  """
+  if task_objects is None:
+    db.session.add(Relationship(source=cycle_task,
+                                destination=task_group_object.object))
+  else:
+    task_objects.append((cycle_task, task_group_object))
+
+
+def _insert_cycle_task_relationships(task_objects):
+  """Create relationships for (cycle task, task group object) pairs at once.
+
+  All relationships are inserted with a single INSERT statement instead of
+  flushing a Relationship model for every pair.
+  """
+  if not task_objects:
+    return
+  # Cycle tasks need ids before they can be mapped.
+  db.session.flush()
+  now = datetime.now()
+  source_type = models.CycleTaskGroupObjectTask.__name__
+  db.session.execute(Relationship.__table__.insert().values([{
+      "id": None,
+      "modified_by_id": cycle_task.modified_by_id,
+      "created_at": now,
+      "updated_at": now,
+      "source_id": cycle_task.id,
+      "source_type": source_type,
+      "destination_id": task_group_object.object_id,
+      "destination_type": task_group_object.object_type,
+      "context_id": None,
+      "status": None,
+  } for cycle_task, task_group_object in task_objects]))
+  cache = get_cache(create=True)
+  if cache:
+    # Add inserted relationships into new objects collection of the cache,
+    # so that they will be logged within event and appropriate revisions
+    # will be created.
+    source_ids = {cycle_task.id for cycle_task, _ in task_objects}
+    cache.new.update(
+        (relationship, relationship.log_json())
+        for relationship in Relationship.query.filter(
+            Relationship.source_type == source_type,
+            Relationship.source_id.in_(source_ids),
+        )
+    )
+
+
+def build_cycle(cycle, current_user=None, base_date=None, task_objects=None):
+  """Build a cycle with it's child objects
+
+  Args:
+    cycle: Cycle that gets populated.
+    current_user: Person set as the modifier of the created objects.
+    base_date: Date from which the task dates are calculated.
+    task_objects: Optional list that collects (cycle task, task group object)
+        pairs instead of adding a Relationship for every pair.
+  """
 
   if not base_date:
     base_date = date.today()
@@ -288,16 +570,15 @@ def build_cycle(cycle, current_user=None, base_date=None):
     # gets its own cycle task
     if workflow.is_old_workflow:
       create_old_style_cycle(cycle, task_group, cycle_task_group, current_user,
-                             base_date)
+                             base_date, task_objects)
     else:
       for task_group_task in task_group.task_group_tasks:
         cycle_task_group_object_task = _create_cycle_task(
             task_group_task, cycle, cycle_task_group, current_user, base_date)
 
         for task_group_object in task_group.task_group_objects:
-          object_ = task_group_object.object
-          db.session.add(Relationship(source=cycle_task_group_object_task,
-                                      destination=object_))
+          _relate_cycle_task(cycle_task_group_object_task, task_group_object,
+                             task_objects)
 
   update_cycle_dates(cycle)
 
@@ -326,6 +607,7 @@ def update_cycle_task_child_state(obj):
   status_order = (None, 'Assigned', 'InProgress',
                   'Declined', 'Finished', 'Verified')
   status = obj.status
+  changed = False
   children_attrs = _cycle_task_children_attr.get(type(obj), [])
   for children_attr in children_attrs:
     if children_attr:
@@ -338,6 +620,7 @@ def update_cycle_task_child_state(obj):
             old_status = child.status
             child.status = status
             db.session.add(child)
+            changed = True
             Signals.status_change.send(
                 child.__class__,
                 obj=child,
@@ -346,6 +629,11 @@ def update_cycle_task_child_state(obj):
             )
           update_cycle_task_child_state(child)
 
+  # All tasks of the group are loaded here, so they are aggregated directly.
+  if changed and isinstance(obj, models.CycleTaskGroup) and \
+     obj.cycle.workflow.kind != "Backlog":
+    _set_cycle_task_group_dates(obj)
+
 
 def update_cycle_task_parent_state(obj):  # noqa
   """Propagate changes to obj's parents"""
@@ -356,7 +644,13 @@ def update_cycle_task_parent_state(obj):  # noqa
 
   def update_parent(parent, old_status, new_status):
     """Update a parent element and emit a signal about the change"""
-    parent.status = new_status
+    if isinstance(parent, models.CycleTaskGroup):
+      # Verified groups don't count for the next due date of the cycle.
+      old_dates = _get_date_contribution(parent)
+      parent.status = new_status
+      update_cycle_object_parent_dates(parent, old_dates)
+    else:
+      parent.status = new_status
     db.session.add(parent)
     Signals.status_change.send(
         parent.__class__,
@@ -387,19 +681,10 @@ def update_cycle_task_parent_state(obj):  # noqa
       update_parent(parent, old_status, new_status)
     # If all children are `Finished` or `Verified`, then parent should be same
     elif obj.status in {"Finished", "Verified", "Assigned"}:
-      children_attrs = _cycle_task_children_attr.get(type(parent), [])
-      for children_attr in children_attrs:
-        children = getattr(parent, children_attr, None)
-        if not children:
-          continue
-
-        children_statues = [c.status for c in children]
-        unique_statuses = set(children_statues)
-        for status in ["Verified", "Finished", "Assigned"]:
-          # Check if all elements match a certain state
-          if children_statues[0] == status and len(unique_statuses) == 1:
-            new_status = status
-            update_parent(parent, old_status, new_status)
+      status_counts = _get_children_status_counts(parent, obj)
+      # Check if all children match the state of obj
+      if len(status_counts) == 1:
+        update_parent(parent, old_status, obj.status)
 
 
 def ensure_assignee_is_workflow_member(workflow, assignee):
@@ -514,12 +799,13 @@ def handle_cycle_task_group_object_task_delete(sender, obj=None,
 def handle_cycle_task_group_object_task_put(
         sender, obj=None, src=None, service=None):  # noqa pylint: disable=unused-argument
 
+  # Queries below can flush obj, so old values are read before them.
+  old_dates = _get_old_date_contribution(obj)
+
   if inspect(obj).attrs.contact.history.has_changes():
     ensure_assignee_is_workflow_member(obj.cycle.workflow, obj.contact)
 
-  if inspect(obj).attrs.start_date.history.has_changes() \
-          or inspect(obj).attrs.end_date.history.has_changes():
-    update_cycle_dates(obj.cycle)
+  update_cycle_object_parent_dates(obj, old_dates)
 
   if inspect(obj).attrs.status.history.has_changes():
     # TODO: check why update_cycle_object_parent_state destroys object history
@@ -550,7 +836,7 @@ def handle_cycle_task_group_object_task_post(
 
   if obj.cycle.workflow.kind != "Backlog":
     ensure_assignee_is_workflow_member(obj.cycle.workflow, obj.contact)
-  update_cycle_dates(obj.cycle)
+  update_cycle_object_parent_dates(obj, (None, None, None))
 
   Signals.status_change.send(
       obj.__class__,
@@ -566,8 +852,10 @@ def handle_cycle_task_group_object_task_post(
 def handle_cycle_task_group_put(
         sender, obj=None, src=None, service=None):  # noqa pylint: disable=unused-argument
   if inspect(obj).attrs.status.history.has_changes():
+    old_dates = _get_old_date_contribution(obj)
     update_cycle_task_parent_state(obj)
     update_cycle_task_child_state(obj)
+    update_cycle_object_parent_dates(obj, old_dates)
 
 
 def update_workflow_state(workflow):
@@ -820,16 +1108,16 @@ def init_extra_views(app):
   views.init_extra_views(app)
 
 
-def start_recurring_cycles():
-  # Get all workflows that should start a new cycle today
-  # The next_cycle_start_date is precomputed and stored when a cycle is created
-  today = date.today()
-  workflows = db.session.query(models.Workflow)\
-      .filter(
-      models.Workflow.next_cycle_start_date == today,
-      models.Workflow.recurrences == True  # noqa
-  ).all()
+def _start_cycles(workflow_ids):
+  """Start new cycles of the given workflows and commit them."""
+  workflows = models.Workflow.query.filter(
+      models.Workflow.id.in_(workflow_ids)
+  ).options(
+      orm.subqueryload("task_groups").subqueryload("task_group_tasks"),
+      orm.subqueryload("task_groups").subqueryload("task_group_objects"),
+  ).order_by(models.Workflow.id)
 
+  task_objects = []
   # For each workflow, start and save a new cycle.
   for workflow in workflows:
     cycle = models.Cycle()
@@ -849,7 +1137,7 @@ def start_recurring_cycles():
       base_date = date.today()
 
     # Create the cycle (including all child objects)
-    build_cycle(cycle, base_date=base_date)
+    build_cycle(cycle, base_date=base_date, task_objects=task_objects)
 
     # Update the workflow next_cycle_start_date to push it ahead based on the
     # frequency.
@@ -860,10 +1148,63 @@ def start_recurring_cycles():
     notification.handle_workflow_modify(None, workflow)
     notification.handle_cycle_created(None, obj=cycle)
 
+  _insert_cycle_task_relationships(task_objects)
   log_event(db.session)
   db.session.commit()
 
 
+def _try_start_cycles(workflow_ids):
+  """Start cycles of the given workflows and roll back on failure.
+
+  Returns:
+    True if the cycles have been started.
+  """
+  try:
+    _start_cycles(workflow_ids)
+    return True
+  except Exception:  # pylint: disable=broad-except
+    logger.exception("Failed to start cycles of workflows %s", workflow_ids)
+    db.session.rollback()
+    return False
+
+
+def start_recurring_cycles():
+  """Start new cycles of all recurring workflows that should start today.
+
+  Workflows are handled in batches of CYCLE_START_BATCH_SIZE and every batch
+  is committed separately. Workflows of a failed batch are retried one at a
+  time, so that a broken workflow does not prevent other cycles from starting.
+
+  Raises:
+    RuntimeError: if cycles of some workflows could not be started.
+  """
+  # Get all workflows that should start a new cycle today
+  # The next_cycle_start_date is precomputed and stored when a cycle is created
+  today = date.today()
+  workflow_ids = [workflow_id for workflow_id, in db.session.query(
+      models.Workflow.id
+  ).filter(
+      models.Workflow.next_cycle_start_date == today,
+      models.Workflow.recurrences == True  # noqa
+  ).order_by(models.Workflow.id)]
+
+  failed_ids = []
+  batch_size = settings.CYCLE_START_BATCH_SIZE
+  for start in xrange(0, len(workflow_ids), batch_size):
+    batch = workflow_ids[start:start + batch_size]
+    if _try_start_cycles(batch):
+      continue
+    if len(batch) == 1:
+      failed_ids.extend(batch)
+      continue
+    failed_ids.extend(workflow_id for workflow_id in batch
+                      if not _try_start_cycles([workflow_id]))
+
+  if failed_ids:
+    raise RuntimeError(
+        "Failed to start cycles of workflows {}".format(failed_ids))
+
+
 def get_cycles(workflow):
   def is_valid_cycle(cycle):
     return ([ct for ct in cycle.cycle_task_group_object_tasks] and
@@ -1011,6 +1352,8 @@ ROLE_DECLARATIONS = WorkflowRoleDeclarations()
 ROLE_IMPLICATIONS = WorkflowRoleImplications()
 
 contributed_notifications = notification.contributed_notifications
+contributed_notification_prefetch = (
+    notification.contributed_notification_prefetch)
 contributed_importables = IMPORTABLE
 contributed_exportables = EXPORTABLE
 contributed_column_handlers = COLUMN_HANDLERS
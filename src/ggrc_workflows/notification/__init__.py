@@ -12,6 +12,7 @@ from ggrc_workflows.notification.data_handler import (
     get_cycle_data,
     get_workflow_data,
     get_cycle_task_data,
+    prefetch_cycle_tasks,
 )
 from ggrc_workflows.notification.notification_handler import (
     handle_workflow_modify,
@@ -38,6 +39,14 @@ def contributed_notifications():
   }
 
 
+def contributed_notification_prefetch():
+  """ return functions that load objects of a type for notifications
+  """
+  return {
+      'CycleTaskGroupObjectTask': prefetch_cycle_tasks,
+  }
+
+
 def register_listeners():
 
   @Resource.model_put.connect_via(Workflow)
@@ -3,12 +3,17 @@
 
 import urllib
 
+from collections import defaultdict
 from copy import deepcopy
 from datetime import date
 from logging import getLogger
 from urlparse import urljoin
 
 from sqlalchemy import and_
+from sqlalchemy import func
+from sqlalchemy import or_
+from sqlalchemy import tuple_
+from sqlalchemy.orm import joinedload
 
 from ggrc import db
 from ggrc import utils
@@ -315,10 +320,68 @@ def get_workflow_data(notification):
 
 
 def get_object(obj_class, obj_id):
-  result = db.session.query(obj_class).filter(obj_class.id == obj_id)
-  if result.count() == 1:
-    return result.one()
-  return None
+  # Objects prefetched for notifications are found in the identity map
+  return db.session.query(obj_class).get(obj_id)
+
+
+def prefetch_cycle_tasks(ids):
+  """Load cycle tasks with data needed for their notifications.
+
+  Cycle task groups, cycles, workflows and contacts are loaded with the cycle
+  tasks and titles of objects removed from the tasks are loaded from
+  revisions with bulk queries.
+
+  Returns:
+    list of loaded cycle tasks.
+  """
+  cycle_tasks = CycleTaskGroupObjectTask.query.options(
+      joinedload('contact'),
+      joinedload('cycle_task_group').joinedload('contact'),
+      joinedload('cycle_task_group').joinedload('cycle')
+      .joinedload('workflow'),
+  ).filter(CycleTaskGroupObjectTask.id.in_(ids)).all()
+  if not cycle_tasks:
+    return cycle_tasks
+
+  task_type = "CycleTaskGroupObjectTask"
+  task_ids = [cycle_task.id for cycle_task in cycle_tasks]
+  deleted_relationships = db.session.query(Revision).filter(
+      Revision.resource_type == "Relationship",
+      Revision.action == "deleted",
+      or_(and_(Revision.source_type == task_type,
+               Revision.source_id.in_(task_ids)),
+          and_(Revision.destination_type == task_type,
+               Revision.destination_id.in_(task_ids))),
+  ).all()
+  removed_objects = defaultdict(list)
+  for revision in deleted_relationships:
+    if revision.source_type == task_type:
+      task_id = revision.source_id
+    else:
+      task_id = revision.destination_id
+    removed_objects[task_id].append(
+        _get_object_info_from_revision(revision, task_type))
+
+  keys = {key for objects in removed_objects.itervalues() for key in objects}
+  titles = {}
+  if keys:
+    last_revision_ids = [id_ for id_, in db.session.query(
+        func.max(Revision.id)
+    ).filter(
+        tuple_(Revision.resource_type, Revision.resource_id).in_(list(keys))
+    ).group_by(Revision.resource_type, Revision.resource_id)]
+    titles = {
+        (revision.resource_type, revision.resource_id):
+            revision.content["display_name"]
+        for revision in db.session.query(Revision).filter(
+            Revision.id.in_(last_revision_ids))
+    }
+  for cycle_task in cycle_tasks:
+    # pylint: disable=protected-access
+    cycle_task._removed_object_titles = [
+        titles[key] for key in removed_objects[cycle_task.id]
+        if key in titles]
+  return cycle_tasks
 
 
 def get_workflow_owners_dict(context_id):
@@ -352,6 +415,29 @@ def get_cycle_task_dict(cycle_task):
                          u"Untitled object")
   # related objects might have been deleted or unmapped,
   # check the revision history
+  removed_titles = getattr(cycle_task, "_removed_object_titles", None)
+  if removed_titles is None:
+    removed_titles = _get_removed_object_titles(cycle_task)
+  object_titles.extend(u"{} [removed from task]".format(title)
+                       for title in removed_titles)
+
+  # the filter expression to be included in the cycle task's URL and
+  # automatically applied when user visits it
+  filter_exp = u"id=" + unicode(cycle_task.cycle_id)
+
+  return {
+      "title": cycle_task.title,
+      "related_objects": object_titles,
+      "end_date": cycle_task.end_date.strftime("%m/%d/%Y"),
+      "due_date_statement": utils.get_digest_date_statement(
+          cycle_task.end_date, "due"),
+      "cycle_task_url": get_cycle_task_url(cycle_task, filter_exp=filter_exp),
+  }
+
+
+def _get_removed_object_titles(cycle_task):
+  """Get titles of objects removed from the cycle task from revisions."""
+  titles = []
   deleted_relationships_sources = db.session.query(Revision).filter(
       Revision.resource_type == "Relationship",
       Revision.action == "deleted",
@@ -373,23 +459,8 @@ def get_cycle_task_dict(cycle_task):
         Revision.resource_type == removed_object_type,
         Revision.resource_id == removed_object_id,
     ).order_by(Revision.id.desc()).first()
-
-    object_titles.append(
-        u"{} [removed from task]".format(object_data.content["display_name"])
-    )
-
-  # the filter expression to be included in the cycle task's URL and
-  # automatically applied when user visits it
-  filter_exp = u"id=" + unicode(cycle_task.cycle_id)
-
-  return {
-      "title": cycle_task.title,
-      "related_objects": object_titles,
-      "end_date": cycle_task.end_date.strftime("%m/%d/%Y"),
-      "due_date_statement": utils.get_digest_date_statement(
-          cycle_task.end_date, "due"),
-      "cycle_task_url": get_cycle_task_url(cycle_task, filter_exp=filter_exp),
-  }
+    titles.append(object_data.content["display_name"])
+  return titles
 
 
 def get_cycle_dict(cycle, manual=False):
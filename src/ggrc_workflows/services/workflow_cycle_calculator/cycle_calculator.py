@@ -8,6 +8,7 @@ import abc
 import datetime
 
 from ggrc_workflows.services.workflow_cycle_calculator import google_holidays
+from ggrc_workflows.services.workflow_cycle_calculator import workday_calendar
 
 # pylint: disable=invalid-name
 
@@ -38,6 +39,7 @@ class CycleCalculator(object):
                 addition/subtraction will take place during calculations.
     HOLIDAYS: Official holidays with the addition of several days that Google
               observes. See file google_holidays.py for details.
+    CALENDAR: Workday calendar for HOLIDAYS shared by all calculators.
   """
   __metaclass__ = abc.ABCMeta
 
@@ -45,6 +47,7 @@ class CycleCalculator(object):
   time_delta = NotImplementedProperty
 
   HOLIDAYS = google_holidays.GoogleHolidays()
+  CALENDAR = workday_calendar.WorkdayCalendar(HOLIDAYS)
 
   @abc.abstractmethod
   def relative_day_to_date(self, relative_day, relative_month=None,
@@ -94,6 +97,17 @@ class CycleCalculator(object):
   def sort_tasks(self):
     self.tasks.sort(key=lambda t: self.get_relative_start(t))  # noqa #pylint: disable=unnecessary-lambda
 
+  @property
+  def calendar(self):
+    """Workday calendar for holidays of the calculator."""
+    if self.holidays is self.HOLIDAYS:
+      return self.CALENDAR
+    calendar = getattr(self, "_calendar", None)
+    if calendar is None or calendar.holidays is not self.holidays:
+      calendar = workday_calendar.WorkdayCalendar(self.holidays)
+      self._calendar = calendar
+    return calendar
+
   def is_work_day(self, ddate):
     """Check whether specific ddate is workday or if it's a holiday/weekend.
 
@@ -102,38 +116,19 @@ class CycleCalculator(object):
     Returns:
       Boolean: True if it's workday otherwise false.
     """
-    return ddate.isoweekday() < 6 and ddate not in self.holidays
+    return self.calendar.is_work_day(ddate)
 
   def adjust_date(self, ddate):
     """Adjust date if it's not a work day.
 
-    Calculates the first workday by going backwards by either subtracting
-    appropriate number of days (if ddate is during weekend) or subtracting
-    by one day if it's a holiday. In case we still aren't on a workday we
-    repeat the process recursively until we find the first workday.
+    Finds the first workday on or before ddate in the workday calendar.
 
     Args:
       date: datetime object
     Returns:
       datetime.date: First available workday.
     """
-    # Short path
-    if self.is_work_day(ddate):
-      return ddate
-
-    # Adjusting for weekends
-    weekday = ddate.isoweekday()
-    if weekday > 5:
-      ddate = ddate - datetime.timedelta(days=(weekday - 5))
-
-    # Adjusting for holidays
-    if ddate in self.holidays:
-      ddate = ddate - datetime.timedelta(days=1)
-
-    # In case we still don't have a workday, repeat
-    if not self.is_work_day(ddate):
-      return self.adjust_date(ddate)
-    return ddate
+    return self.calendar.previous_work_day(ddate)
 
   def get_base_date(self, base_date=None):
     """Base date from which we will calculate must be less than or equal to the
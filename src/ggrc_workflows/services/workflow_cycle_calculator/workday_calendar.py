@@ -0,0 +1,126 @@
+# Copyright (C) 2017 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""Precomputed calendar of workdays."""
+
+import array
+import datetime
+import threading
+
+
+class WorkdayCalendar(object):
+  """Calendar of workdays for a range of whole years.
+
+  For every day in the range the calendar stores whether it is a workday and
+  the number of workdays before it, together with a list of all workdays.
+  This makes all lookups constant time operations. The range is extended by
+  whole years when a date outside of it is used.
+
+  Attributes:
+    holidays: List (or object supporting 'in' operation) of days that are
+              not workdays.
+  """
+
+  def __init__(self, holidays):
+    self.holidays = holidays
+    self.lock = threading.Lock()
+    # (first_day, workdays, ranks, workday_offsets) tuple replaced at once
+    # when the range is extended, so that lookups can run in parallel.
+    self._data = None
+
+  def _build(self, first_year, last_year):
+    """Compute workdays of all years from first_year to last_year."""
+    first_day = datetime.date(first_year, 1, 1)
+    days = (datetime.date(last_year + 1, 1, 1) - first_day).days
+    workdays = bytearray(days)
+    ranks = array.array("i", [0]) * days
+    workday_offsets = array.array("i")
+    for offset in xrange(days):
+      day = first_day + datetime.timedelta(days=offset)
+      ranks[offset] = len(workday_offsets)
+      if day.isoweekday() < 6 and day not in self.holidays:
+        workdays[offset] = 1
+        workday_offsets.append(offset)
+    self._data = (first_day, workdays, ranks, workday_offsets)
+
+  def _extend(self, first_year, last_year):
+    """Make sure that the calendar contains the given years."""
+    with self.lock:
+      if self._data is not None:
+        first_day, workdays = self._data[:2]
+        last_day = first_day + datetime.timedelta(days=len(workdays) - 1)
+        if first_day.year <= first_year and last_year <= last_day.year:
+          return
+        first_year = min(first_year, first_day.year)
+        last_year = max(last_year, last_day.year)
+      self._build(first_year, last_year)
+
+  def _lookup(self, ddate):
+    """Get calendar data and offset of the date in it."""
+    day = datetime.date(ddate.year, ddate.month, ddate.day)
+    data = self._data
+    if data is not None:
+      offset = (day - data[0]).days
+      if 0 <= offset < len(data[1]):
+        return data, offset
+    self._extend(day.year - 1, day.year + 1)
+    data = self._data
+    return data, (day - data[0]).days
+
+  def _extend_for(self, ddate, index, data):
+    """Extend the range if the workday index is outside of it.
+
+    Returns:
+      True if the range has been extended.
+    """
+    first_day, workdays = data[:2]
+    if index < 0:
+      self._extend(first_day.year - 1, ddate.year)
+      return True
+    if index >= len(data[3]):
+      last_day = first_day + datetime.timedelta(days=len(workdays) - 1)
+      self._extend(ddate.year, last_day.year + 1)
+      return True
+    return False
+
+  def _workday_at(self, ddate, offset, index, data):
+    """Shift the date to the workday with the given index."""
+    return ddate + datetime.timedelta(days=data[3][index] - offset)
+
+  def is_work_day(self, ddate):
+    """Check whether the date is a workday."""
+    data, offset = self._lookup(ddate)
+    return bool(data[1][offset])
+
+  def previous_work_day(self, ddate):
+    """Get the date if it is a workday or the closest workday before it."""
+    while True:
+      data, offset = self._lookup(ddate)
+      index = data[2][offset] + data[1][offset] - 1
+      if not self._extend_for(ddate, index, data):
+        return self._workday_at(ddate, offset, index, data)
+
+  def next_work_day(self, ddate):
+    """Get the date if it is a workday or the closest workday after it."""
+    while True:
+      data, offset = self._lookup(ddate)
+      index = data[2][offset]
+      if not self._extend_for(ddate, index, data):
+        return self._workday_at(ddate, offset, index, data)
+
+  def add_work_days(self, ddate, count):
+    """Get the date that is count workdays after the date.
+
+    Negative count gives a date before the date and zero count gives the date
+    itself.
+    """
+    if not count:
+      return ddate
+    while True:
+      data, offset = self._lookup(ddate)
+      if count > 0:
+        index = data[2][offset] + data[1][offset] + count - 1
+      else:
+        index = data[2][offset] + count
+      if not self._extend_for(ddate, index, data):
+        return self._workday_at(ddate, offset, index, data)
@@ -9,14 +9,17 @@ from logging import getLogger
 from flask import redirect
 from flask import render_template
 from flask import url_for
+from werkzeug.exceptions import Forbidden
 
 from ggrc import db
 from ggrc.app import app
 from ggrc.login import login_required
 from ggrc.login import get_current_user
+from ggrc.rbac import permissions
 from ggrc.utils import benchmark
 from ggrc.views.cron import run_job
 
+from ggrc_workflows import repair_cycle_dates
 from ggrc_workflows import start_recurring_cycles
 from ggrc_workflows.models import Cycle
 from ggrc_workflows.models import CycleTaskGroupObjectTask
@@ -121,6 +124,18 @@ def start_unstarted_cycles():
   return redirect(url_for('unstarted_cycles'))
 
 
+def recompute_cycle_dates():
+  """Recompute dates of all current cycles.
+
+  Cycle dates are updated with every task change, so this should only be
+  manually triggered by a system administrator if they got out of sync.
+  """
+  if not permissions.is_admin():
+    raise Forbidden()
+  repair_cycle_dates()
+  return "Ok"
+
+
 def init_extra_views(app_):
   """Init all views neede for ggrc_workflows module.
 
@@ -134,6 +149,10 @@ def init_extra_views(app_):
   app_.add_url_rule(
       "/admin/start_unstarted_cycles",
       view_func=login_required(start_unstarted_cycles))
+  app_.add_url_rule(
+      "/admin/recompute_cycle_dates",
+      view_func=login_required(recompute_cycle_dates),
+      methods=["POST"])
   app_.add_url_rule(
       "/admin/ensure_backlog_workflow_exists",
       view_func=Workflow.ensure_backlog_workflow_exists)
@@ -3,8 +3,13 @@
 
 import itertools
 
+from mock import patch
+
 import ggrc
 from ggrc import models
+from ggrc import settings
+from ggrc.models.background_task import _run_task
+from ggrc.views import automapping
 from integration.ggrc import TestCase
 from integration.ggrc import generator
 
@@ -263,6 +268,64 @@ class TestAutomappings(TestCase):
         implied=[(objective, control1), (objective, control2)]
     )
 
+  def test_mapping_program_scope(self):
+    """Whole scope of a directive is mapped when it is mapped to a program."""
+    regulation = self.create_object(models.Regulation, {
+        'title': make_name('Test Regulation')
+    })
+    sections = [self.create_object(models.Section, {
+        'title': make_name('Test section'),
+    }) for _ in range(3)]
+    objectives = [self.create_object(models.Objective, {
+        'title': make_name('Objective')
+    }) for _ in range(3)]
+    program = self.create_object(models.Program, {
+        'title': make_name('Program')
+    })
+    to_create = [(regulation, section) for section in sections]
+    to_create.extend(zip(sections, objectives))
+    to_create.append((program, regulation))
+    implied = [(regulation, objective) for objective in objectives]
+    implied.extend((program, obj) for obj in sections + objectives)
+    self.assert_mapping_implication(to_create=to_create, implied=implied)
+
+  @patch("ggrc.automapper.queue_task")
+  def test_automapping_in_background(self, queue_task):
+    """Relationships posted together are automapped by one queued task."""
+    # pylint: disable=protected-access
+    regulation = self.create_object(models.Regulation, {
+        'title': make_name('Test Regulation')
+    })
+    section = self.create_object(models.Section, {
+        'title': make_name('Test section'),
+    })
+    programs = [self.create_object(models.Program, {
+        'title': make_name('Program')
+    }) for _ in range(2)]
+    self.create_mapping(regulation, section)
+    with patch.object(settings, "AUTOMAPPING_IN_BACKGROUND", True):
+      response = self.api.post(models.Relationship, [{"relationship": {
+          "source": {"id": program.id, "type": program.type},
+          "destination": {"id": regulation.id, "type": regulation.type},
+          "context": None,
+      }} for program in programs])
+    self.assert200(response)
+    task_ids = {body["relationship"]["extras"]["automapping_task"]["id"]
+                for _, body in response.json}
+    self.assertEqual(len(task_ids), 1)
+    self.assertEqual(queue_task.call_count, 1)
+    task = models.BackgroundTask.query.get(task_ids.pop())
+    self.assertEqual(task.status, "Pending")
+    self.assertEqual(len(task.parameters["relationship_ids"]), 2)
+    for program in programs:
+      self.assert_mapping(program, section, missing=True)
+
+    _run_task(automapping, task.id, task.modified_by_id)
+    task = models.BackgroundTask.query.get(task.id)
+    self.assertEqual(task.status, "Success")
+    for program in programs:
+      self.assert_mapping(program, section)
+
   def test_automapping_permissions_check(self):
     _, creator = self.gen.generate_person(user_role="Creator")
     _, admin = self.gen.generate_person(user_role="Administrator")
@@ -0,0 +1,81 @@
+# Copyright (C) 2017 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""Integration tests for stubs reused across requests."""
+
+from mock import patch
+
+from ggrc import db
+from ggrc.builder import json
+from ggrc.models import all_models
+from integration.ggrc import TestCase
+from integration.ggrc.models import factories
+
+
+class TestStubCache(TestCase):
+  """Tests for publishing stubs with the stub cache enabled."""
+
+  def setUp(self):
+    super(TestStubCache, self).setUp()
+    cache_patch = patch.object(json, "_stub_cache",
+                               json.StubCache(max_entries=100, timeout=30))
+    cache_patch.start()
+    self.addCleanup(cache_patch.stop)
+    self.market_id = factories.MarketFactory().id
+    db.session.commit()
+
+  def publish_stub(self):
+    resource = {"market": json.LazyStubRepresentation("Market",
+                                                      self.market_id)}
+    return json.publish_representation(resource)["market"]
+
+  def test_cached_stub(self):
+    """Published stubs are reused without a query."""
+    stub = self.publish_stub()
+    self.assertEqual(stub["id"], self.market_id)
+
+    with patch.object(json, "build_stub_union_query") as query:
+      self.assertEqual(self.publish_stub(), stub)
+    query.assert_not_called()
+
+  def test_updated_object(self):
+    """Stubs are published with the committed state of changed objects."""
+    self.assertIsNone(self.publish_stub()["context_id"])
+    context_id = factories.ContextFactory().id
+    market = all_models.Market.query.get(self.market_id)
+    market.context_id = context_id
+    db.session.flush()
+    # Stub cached by another request before the change is committed
+    json.get_stub_cache().set(("Market", self.market_id),
+                              dict(self.publish_stub(), context_id=None),
+                              market.updated_at)
+    db.session.commit()
+
+    self.assertEqual(self.publish_stub()["context_id"], context_id)
+
+  def test_rolled_back_change(self):
+    """Stubs of rolled back changes are not cached."""
+    context_id = factories.ContextFactory().id
+    db.session.commit()
+    self.publish_stub()
+    market = all_models.Market.query.get(self.market_id)
+    market.context_id = context_id
+    db.session.flush()
+
+    stub = self.publish_stub()
+    self.assertEqual(stub["context_id"], context_id)
+    cache_key = ("Market", self.market_id)
+    self.assertIsNone(json.get_stub_cache().get(cache_key))
+    json.get_stub_cache().set(cache_key, stub, market.updated_at)
+    db.session.rollback()
+
+    self.assertIsNone(json.get_stub_cache().get(cache_key))
+    self.assertIsNone(self.publish_stub()["context_id"])
+
+  def test_deleted_object(self):
+    """Stubs of deleted objects are not published."""
+    self.publish_stub()
+    db.session.delete(all_models.Market.query.get(self.market_id))
+    db.session.commit()
+
+    self.assertIsNone(self.publish_stub())
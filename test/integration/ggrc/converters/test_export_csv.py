@@ -3,9 +3,13 @@
 
 from os.path import abspath, dirname, join
 from flask.json import dumps
+from mock import patch
 
+from ggrc import db
 from ggrc.converters import get_importables
+from ggrc.converters.base_row import RowConverter
 from ggrc.models.reflection import AttributeInfo
+from ggrc.views.converters import EXPORT_FAILED_LINE
 from integration.ggrc import TestCase
 from integration.ggrc.models import factories
 
@@ -506,3 +510,48 @@ class TestExportMultipleObjects(TestCase):
         self.assertIn(",Cheese ipsum ch {},".format(i), response.data)
       else:
         self.assertNotIn(",Cheese ipsum ch {},".format(i), response.data)
+
+
+class TestExportFailure(TestCase):
+  """Test exports that fail while rows are converted."""
+
+  def setUp(self):
+    super(TestExportFailure, self).setUp()
+    self.client.get("/login")
+    self.titles = ["market 1", "market 2"]
+    for title in self.titles:
+      factories.MarketFactory(title=title)
+    db.session.commit()
+
+  def export_failing_second_row(self):
+    """Export markets with a row converter that fails on the second row."""
+    handle_row_data = RowConverter.handle_row_data
+    handled = []
+
+    def fail_second_row(row_converter, *args, **kwargs):
+      handled.append(row_converter)
+      if len(handled) > 1:
+        raise ValueError("Row conversion failed")
+      return handle_row_data(row_converter, *args, **kwargs)
+
+    with patch.object(RowConverter, "handle_row_data", fail_second_row):
+      return self.export_csv([{
+          "object_name": "Market",
+          "fields": ["slug", "title"],
+          "filters": {"expression": {}},
+      }])
+
+  def test_failed_export(self):
+    """Exports that fail return an error by default."""
+    response = self.export_failing_second_row()
+    self.assert400(response)
+
+  @patch("ggrc.settings.EXPORT_CHUNK_SIZE", 1)
+  @patch("ggrc.settings.EXPORT_STREAMING", True)
+  def test_failed_streaming_export(self):
+    """Streamed exports that fail end with the failure line."""
+    response = self.export_failing_second_row()
+    self.assert200(response)
+    self.assertIn(self.titles[0], response.data)
+    self.assertNotIn(self.titles[1], response.data)
+    self.assertTrue(response.data.endswith(EXPORT_FAILED_LINE))
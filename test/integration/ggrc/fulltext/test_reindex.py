@@ -0,0 +1,121 @@
+# Copyright (C) 2017 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""Integration tests for the resumable full text reindex."""
+
+import datetime
+
+from mock import patch
+import sqlalchemy as sa
+
+from ggrc import db
+from ggrc.fulltext import mysql
+from ggrc.fulltext import reindex
+from ggrc.models import all_models
+from integration.ggrc import TestCase
+from integration.ggrc.models import factories
+
+
+class TestReindex(TestCase):
+  """Tests for rebuilding the index in a shadow table."""
+
+  def setUp(self):
+    super(TestReindex, self).setUp()
+    self.market_ids = [factories.MarketFactory(title="market {}".format(i)).id
+                       for i in range(2)]
+    db.session.commit()
+    db.session.query(mysql.MysqlRecordProperty).delete()
+    db.session.commit()
+
+  @staticmethod
+  def get_titles():
+    """Get indexed titles of markets."""
+    return {
+        row.key: row.content
+        for row in mysql.MysqlRecordProperty.query.filter_by(
+            type="Market", property="title")
+    }
+
+  def reindex_without_swap(self, resume=True):
+    """Run reindex that is interrupted before the shadow table is swapped."""
+    with patch.object(reindex, "_swap_tables", side_effect=RuntimeError):
+      with self.assertRaises(RuntimeError):
+        reindex.reindex(resume=resume, workers=1, chunk_size=1)
+
+  def test_reindex_swaps_tables(self):
+    """The shadow table replaces the index and reindex tables are dropped."""
+    reindex.reindex(resume=False, workers=1, chunk_size=1)
+
+    self.assertEqual(self.get_titles(), {
+        self.market_ids[0]: "market 0",
+        self.market_ids[1]: "market 1",
+    })
+    engine = db.engine
+    self.assertFalse(engine.has_table(reindex.SHADOW_TABLE_NAME))
+    self.assertFalse(engine.has_table(reindex.OLD_TABLE_NAME))
+    self.assertFalse(engine.has_table(reindex.checkpoint_table.name))
+    self.assertFalse(engine.has_table(reindex.state_table.name))
+
+  def test_resume_skips_finished_units(self):
+    """Only units without a checkpoint are indexed when resuming."""
+    self.reindex_without_swap(resume=False)
+    self.assertEqual(self.get_titles(), {})
+    db.engine.execute(reindex.checkpoint_table.delete().where(
+        (reindex.checkpoint_table.c.model == "Market") &
+        (reindex.checkpoint_table.c.start_id == self.market_ids[1])
+    ))
+
+    with patch.object(reindex, "index_unit",
+                      wraps=reindex.index_unit) as index_unit:
+      reindex.reindex(resume=True, workers=1, chunk_size=1)
+
+    index_unit.assert_called_once_with(
+        ("Market", self.market_ids[1], self.market_ids[1] + 1))
+    self.assertEqual(len(self.get_titles()), 2)
+
+  def test_update_objects_changed_during_reindex(self):
+    """Objects changed or deleted after the start are fixed in the index."""
+    reindex._prepare_tables(resume=False)  # pylint: disable=protected-access
+    started_at = datetime.datetime.now() - datetime.timedelta(hours=2)
+    db.engine.execute(reindex.state_table.update().values(
+        started_at=started_at))
+    self.reindex_without_swap()
+
+    # Change done after the start, but before the units were completed.
+    market_table = all_models.Market.__table__
+    db.engine.execute(market_table.update().where(
+        market_table.c.id == self.market_ids[0]
+    ).values(
+        title="changed market",
+        updated_at=started_at + datetime.timedelta(hours=1),
+    ))
+    db.engine.execute(market_table.delete().where(
+        market_table.c.id == self.market_ids[1]))
+
+    reindex.reindex(resume=True, workers=1, chunk_size=1)
+
+    self.assertEqual(self.get_titles(), {
+        self.market_ids[0]: "changed market",
+    })
+
+  def test_update_objects_changed_before_swap(self):
+    """Changes committed after the catch-up pass are kept after the swap."""
+    market_table = all_models.Market.__table__
+    swap_tables = reindex._swap_tables  # pylint: disable=protected-access
+
+    def change_and_swap():
+      """Change markets after the catch-up pass, then swap the tables."""
+      db.engine.execute(market_table.update().where(
+          market_table.c.id == self.market_ids[0]
+      ).values(title="changed market", updated_at=sa.func.now()))
+      db.engine.execute(market_table.delete().where(
+          market_table.c.id == self.market_ids[1]))
+      swap_tables()
+
+    with patch.object(reindex, "_swap_tables", side_effect=change_and_swap):
+      reindex.reindex(resume=False, workers=1, chunk_size=1)
+
+    self.assertEqual(self.get_titles(), {
+        self.market_ids[0]: "changed market",
+    })
+    self.assertFalse(db.engine.has_table(reindex.state_table.name))
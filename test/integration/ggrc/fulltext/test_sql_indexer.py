@@ -0,0 +1,110 @@
+# Copyright (C) 2017 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""Integration tests for updating full text index records."""
+
+from ggrc.fulltext import Record
+from ggrc.fulltext import mysql
+from integration.ggrc import TestCase
+
+
+class TestUpdateRecord(TestCase):
+  """Tests for incremental index record updates."""
+
+  def setUp(self):
+    super(TestUpdateRecord, self).setUp()
+    self.indexer = mysql.MysqlIndexer(None)
+    self.indexer.create_record(Record(1, "Market", None, {
+        "title": {"": "old title"},
+        "description": {"": "description"},
+        "owners": {"1-email": "a@example.com", "2-email": "b@example.com"},
+    }))
+
+  def get_contents(self):
+    """Get stored index content by property and subproperty."""
+    rows = mysql.MysqlRecordProperty.query.filter(
+        mysql.MysqlRecordProperty.key == 1,
+        mysql.MysqlRecordProperty.type == "Market",
+    )
+    return {(row.property, row.subproperty): row.content for row in rows}
+
+  def test_update_changed_property(self):
+    """Only the given properties are changed."""
+    self.indexer.update_record(Record(1, "Market", None, {
+        "title": {"": "new title"},
+    }))
+    self.assertEqual(self.get_contents(), {
+        ("title", ""): "new title",
+        ("description", ""): "description",
+        ("owners", "1-email"): "a@example.com",
+        ("owners", "2-email"): "b@example.com",
+    })
+
+  def test_update_subproperties(self):
+    """Subproperties are inserted and deleted to match the new record."""
+    self.indexer.update_record(Record(1, "Market", None, {
+        "owners": {"2-email": "b@example.com", "3-email": "c@example.com"},
+        "description": {"": None},
+    }))
+    self.assertEqual(self.get_contents(), {
+        ("title", ""): "old title",
+        ("owners", "2-email"): "b@example.com",
+        ("owners", "3-email"): "c@example.com",
+    })
+
+  def test_update_context(self):
+    """Changed context is stored for all updated properties."""
+    self.indexer.update_record(Record(1, "Market", 5, {
+        "title": {"": "old title"},
+    }))
+    title = mysql.MysqlRecordProperty.query.filter_by(
+        key=1, type="Market", property="title").one()
+    self.assertEqual(title.context_id, 5)
+
+
+class TestBulkRecords(TestCase):
+  """Tests for bulk index record writes."""
+
+  def setUp(self):
+    super(TestBulkRecords, self).setUp()
+    self.indexer = mysql.MysqlIndexer(None)
+
+  @staticmethod
+  def get_contents():
+    """Get all stored index content."""
+    return {
+        (row.type, row.key, row.property, row.subproperty): row.content
+        for row in mysql.MysqlRecordProperty.query
+    }
+
+  def test_create_records(self):
+    """All properties of all records are inserted."""
+    self.indexer.BATCH_SIZE = 2
+    self.indexer.create_records([
+        Record(1, "Market", None, {"title": {"": "m1"}, "slug": {"": None}}),
+        Record(2, "Market", None, {"title": {"": "m2"}}),
+        Record(1, "Facility", None, {"owners": {"1-email": "a@example.com",
+                                                "2-email": "b@example.com"}}),
+    ])
+    self.assertEqual(self.get_contents(), {
+        ("Market", 1, "title", ""): "m1",
+        ("Market", 2, "title", ""): "m2",
+        ("Facility", 1, "owners", "1-email"): "a@example.com",
+        ("Facility", 1, "owners", "2-email"): "b@example.com",
+    })
+
+  def test_replace_records(self):
+    """Only properties of the given records are replaced."""
+    self.indexer.create_records([
+        Record(1, "Market", None, {"title": {"": "m1"},
+                                   "description": {"": "d1"}}),
+        Record(2, "Market", None, {"title": {"": "m2"}}),
+    ])
+    self.indexer.replace_records([
+        Record(1, "Market", None, {"title": {"": "new m1"}}),
+    ])
+    self.assertEqual(self.get_contents(), {
+        ("Market", 1, "title", ""): "new m1",
+        ("Market", 1, "description", ""): "d1",
+        ("Market", 2, "title", ""): "m2",
+    })
@@ -1,12 +1,14 @@
 # Copyright (C) 2017 Google Inc.
 # Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
 
+import datetime
 import json
 import time
 from urlparse import urlparse
 from wsgiref.handlers import format_date_time
 from sqlalchemy import and_
 
+from integration.ggrc.services import ServicesTestMockModel
 from integration.ggrc.services import TestCase
 from integration.ggrc.api_helper import Api
 from integration.ggrc.generator import ObjectGenerator
@@ -281,6 +283,51 @@ class TestServices(TestCase):
     self.assertStatus(response, 304)
     self.assertIn("Etag", response.headers)
 
+  def test_collection_get_if_none_match(self):
+    """Collection ETag changes when an object of the collection changes."""
+    self.mock_model(foo="baz")
+    response = self.client.get(self.mock_url(), headers=self.headers())
+    self.assert200(response)
+    collection_etag = response.headers["Etag"]
+    response = self.client.get(
+        self.mock_url(),
+        headers=self.headers(("If-None-Match", collection_etag)),
+    )
+    self.assertStatus(response, 304)
+    self.assertEqual(collection_etag, response.headers["Etag"])
+
+    self.mock_model(foo="bar")
+    response = self.client.get(
+        self.mock_url(),
+        headers=self.headers(("If-None-Match", collection_etag)),
+    )
+    self.assert200(response)
+    self.assertNotEqual(collection_etag, response.headers["Etag"])
+
+  def test_collection_get_after(self):
+    """Keyset pages contain every object once in (updated_at, id) order."""
+    updated_at = datetime.datetime(2017, 1, 1)
+    models = [
+        self.mock_model(updated_at=updated_at + datetime.timedelta(days=day))
+        for day in (1, 0, 0, 2, 0)
+    ]
+    expected = [model.id for model in sorted(
+        models, key=lambda model: (model.updated_at, model.id))]
+    # pylint: disable=protected-access
+    table_plural = ServicesTestMockModel._inflector.table_plural
+
+    ids = []
+    url = self.mock_url() + "?__after=&__page_size=2"
+    while url:
+      response = self.client.get(url, headers=self.headers())
+      self.assert200(response)
+      collection = response.json["{}_collection".format(table_plural)]
+      page_ids = [obj["id"] for obj in collection[table_plural]]
+      self.assertLessEqual(len(page_ids), 2)
+      ids.extend(page_ids)
+      url = collection["paging"].get("next")
+    self.assertEqual(ids, expected)
+
 
 class TestFilteringByRequest(TestCase):
   """Test filter query by request"""
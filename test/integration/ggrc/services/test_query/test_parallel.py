@@ -0,0 +1,71 @@
+# Copyright (C) 2017 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""Tests for /query object queries that run in parallel."""
+
+from flask import json
+from mock import patch
+
+from ggrc import db
+from ggrc.converters import query_helper
+from integration.ggrc import TestCase
+from integration.ggrc.models import factories
+from integration.ggrc.services.test_query.test_basic import (
+    BaseQueryAPITestCase
+)
+
+
+class TestParallelQueries(BaseQueryAPITestCase):
+  """Tests for independent object queries run by worker threads."""
+
+  def setUp(self):
+    TestCase.clear_data()
+    super(TestParallelQueries, self).setUp()
+    # Workers use their own sessions, so the fixtures must be committed
+    program = factories.ProgramFactory()
+    self.market_ids = []
+    self.control_ids = []
+    for i in range(2):
+      market = factories.MarketFactory()
+      control = factories.ControlFactory()
+      factories.RelationshipFactory(source=program, destination=market)
+      factories.RelationshipFactory(source=control, destination=program)
+      self.market_ids.append(market.id)
+      self.control_ids.append(control.id)
+    factories.MarketFactory()
+    self.program_id = program.id
+    db.session.commit()
+
+  def query_relevant_ids(self):
+    """Query ids of markets and controls relevant to the program."""
+    relevant = {
+        "object_name": "Program",
+        "op": {"name": "relevant"},
+        "ids": [self.program_id],
+    }
+    response = self._post([
+        self._make_query_dict_base(object_name, type_="ids",
+                                   filters={"expression": relevant})
+        for object_name in ("Market", "Control")
+    ])
+    self.assert200(response)
+    return [sorted(result[object_name]["ids"])
+            for result, object_name in zip(json.loads(response.data),
+                                           ("Market", "Control"))]
+
+  @patch("ggrc.settings.QUERY_WORKERS", 2)
+  def test_parallel_queries(self):
+    """Queries run in worker threads return the same results."""
+    with patch.object(query_helper, "_run_query_in_worker",
+                      wraps=query_helper._run_query_in_worker) as worker:
+      ids = self.query_relevant_ids()
+
+    self.assertEqual(worker.call_count, 2)
+    self.assertEqual(ids, [sorted(self.market_ids), sorted(self.control_ids)])
+
+  @patch("ggrc.settings.QUERY_WORKERS", 2)
+  @patch("ggrc.settings.SHARED_EXPRESSION_MAX_IDS", 1)
+  def test_shared_subquery(self):
+    """Shared sub-expressions with many matching ids run as subqueries."""
+    self.assertEqual(self.query_relevant_ids(),
+                     [sorted(self.market_ids), sorted(self.control_ids)])
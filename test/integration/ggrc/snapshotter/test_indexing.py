@@ -10,6 +10,7 @@ from ggrc import models
 from ggrc.views import do_reindex
 from ggrc.fulltext.mysql import MysqlRecordProperty as Record
 from ggrc.snapshotter.indexer import delete_records
+from ggrc.snapshotter.indexer import reindex
 
 from integration.ggrc.snapshotter import SnapshotterBaseTestCase
 from integration.ggrc.models import factories
@@ -339,3 +340,26 @@ class TestSnapshotIndexing(SnapshotterBaseTestCase):
     records = get_records(audit, snapshots)
 
     self.assertEqual(records.count(), 57)
+
+  def test_batched_reindex(self):
+    """Test reindex of all snapshots in small batches"""
+    self._import_file("snapshotter_create.csv")
+
+    program = db.session.query(models.Program).filter(
+        models.Program.slug == "Prog-13211"
+    ).one()
+
+    self.create_audit(program)
+
+    audit = db.session.query(models.Audit).filter(
+        models.Audit.title.like("%Snapshotable audit%")).first()
+
+    snapshots = db.session.query(models.Snapshot).all()
+
+    delete_records({s.id for s in snapshots})
+
+    reindex(batch_size=2)
+
+    records = get_records(audit, snapshots)
+
+    self.assertEqual(records.count(), 57)
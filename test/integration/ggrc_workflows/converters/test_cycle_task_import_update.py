@@ -73,6 +73,30 @@ class TestCycleTaskImportUpdate(BaseTestCycleTaskImportUpdate):
       self._check_csv_response(response, {})
       self._cmp_tasks(self.expected_cycle_task_correct)
 
+  def test_cycle_task_dates_aggregated(self):
+    """Test cycle and cycle task group dates after cycle task import"""
+    self._generate_cycle_tasks()
+    with freeze_time(self.ftime_active):
+      response = self.import_file("cycle_task_correct.csv")
+      self._check_csv_response(response, {})
+
+    def get_dates(objects, due_date_attr):
+      """Aggregate dates the same way as a full recompute."""
+      due_dates = [getattr(obj, due_date_attr) for obj in objects
+                   if obj.status != "Verified"]
+      return (min(obj.start_date for obj in objects),
+              max(obj.end_date for obj in objects),
+              min(due_dates) if due_dates else None)
+
+    for cycle in Cycle.query:
+      for ctg in cycle.cycle_task_groups:
+        self.assertEqual(
+            (ctg.start_date, ctg.end_date, ctg.next_due_date),
+            get_dates(ctg.cycle_task_group_tasks, "end_date"))
+      self.assertEqual(
+          (cycle.start_date, cycle.end_date, cycle.next_due_date),
+          get_dates(cycle.cycle_task_groups, "next_due_date"))
+
   def test_cycle_task_warnings(self):
     """Test cycle task update via import with data which is the reason of
     warnings about non-importable columns."""
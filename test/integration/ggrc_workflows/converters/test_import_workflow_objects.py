@@ -50,6 +50,17 @@ class TestWorkflowObjectsImport(TestCase):
     self.assertIn("ch2", task3.response_options)
     self.assertIn("option 1", task4.response_options)
 
+  def test_objects_created_in_same_import(self):
+    """Test mapping objects that are created by an earlier block."""
+    response = self.import_file("workflow_objects_created_first.csv")
+
+    self._check_csv_response(response, {})
+    task_group = TaskGroup.query.filter_by(slug="tg-1").one()
+    self.assertEqual(
+        {"obj-1", "obj-2"},
+        {tgo.object.slug for tgo in task_group.task_group_objects},
+    )
+
   def test_bad_imports(self):
     """Test workflow import with errors and warnings"""
     filename = "workflow_with_warnings_and_errors.csv"
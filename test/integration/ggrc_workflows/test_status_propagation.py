@@ -5,6 +5,8 @@
 
 # pylint: disable=invalid-name
 
+from datetime import date
+
 from freezegun import freeze_time
 
 from ggrc import db
@@ -246,3 +248,64 @@ class TestWorkflowCycleStatePropagantion(TestCase):
       self.assertEqual(first_ct.status, "Declined")
       self.assertEqual(second_ct.status, "Finished")
       self.assertEqual(ctg.status, "InProgress")
+
+  def test_weekly_task_changes_update_dates(self):
+    """Test that task changes update cycle and cycle task group dates"""
+    _, wf = self.generator.generate_workflow(self.weekly_wf)
+
+    with freeze_time("2016-6-10 13:00:00"):  # Friday, 6/10/2016
+      self.generator.activate_workflow(wf)
+
+      cycle_tasks = db.session.query(CycleTaskGroupObjectTask).join(
+          Cycle).join(Workflow).filter(Workflow.id == wf.id).all()
+      first_ct, second_ct = cycle_tasks
+      ctg_id = first_ct.cycle_task_group_id
+      cycle_id = first_ct.cycle_id
+      second_end_date = second_ct.end_date
+
+      # Move end of the first CT after the end of the second CT
+      self.generator.modify_object(
+          first_ct, {"end_date": date(2016, 6, 30)})
+
+      ctg = db.session.query(CycleTaskGroup).get(ctg_id)
+      cycle = db.session.query(Cycle).get(cycle_id)
+      self.assertEqual(ctg.end_date, date(2016, 6, 30))
+      self.assertEqual(cycle.end_date, date(2016, 6, 30))
+      self.assertEqual(ctg.next_due_date, second_end_date)
+      self.assertEqual(cycle.next_due_date, second_end_date)
+
+      # Verified second CT no longer counts for the next due date
+      second_ct = db.session.query(CycleTaskGroupObjectTask).get(
+          second_ct.id)
+      for status in ("InProgress", "Finished", "Verified"):
+        _, second_ct = self.generator.modify_object(
+            second_ct, {"status": status})
+
+      ctg = db.session.query(CycleTaskGroup).get(ctg_id)
+      cycle = db.session.query(Cycle).get(cycle_id)
+      self.assertEqual(ctg.next_due_date, date(2016, 6, 30))
+      self.assertEqual(cycle.next_due_date, date(2016, 6, 30))
+
+      # Moving the end back makes the other task the end of the group
+      first_ct = db.session.query(CycleTaskGroupObjectTask).get(first_ct.id)
+      self.generator.modify_object(
+          first_ct, {"end_date": second_end_date})
+
+      ctg = db.session.query(CycleTaskGroup).get(ctg_id)
+      cycle = db.session.query(Cycle).get(cycle_id)
+      self.assertEqual(ctg.end_date, second_end_date)
+      self.assertEqual(cycle.end_date, second_end_date)
+
+  def test_recompute_cycle_dates_permissions(self):
+    """Test that only admins can recompute cycle dates"""
+    url = "/admin/recompute_cycle_dates"
+    _, creator = self.object_generator.generate_person(user_role="Creator")
+    _, admin = self.object_generator.generate_person(
+        user_role="Administrator")
+
+    self.api.set_user(creator)
+    self.assertEqual(self.api.client.post(url).status_code, 403)
+
+    self.api.set_user(admin)
+    self.assertEqual(self.api.client.get(url).status_code, 405)
+    self.assertEqual(self.api.client.post(url).status_code, 200)
@@ -6,8 +6,8 @@
 from freezegun import freeze_time
 from mock import patch
 
-from ggrc.models import Revision, Event
-from ggrc_workflows import start_recurring_cycles
+from ggrc.models import Relationship, Revision, Event
+from ggrc_workflows import build_cycle, models, start_recurring_cycles
 from integration.ggrc_workflows.generator import WorkflowsGenerator
 from integration.ggrc.generator import ObjectGenerator
 from integration.ggrc import TestCase
@@ -46,6 +46,53 @@ class TestRecurringWorkflowRevisions(TestCase):
     self.assertEqual(event_count + 1, Event.query.count())
     self.assertNotEqual(revision_count, revision_query.count())
 
+  @patch("ggrc.notifications.common.send_email")
+  def test_relationship_revisions(self, _):
+    with freeze_time("2015-04-01"):
+      _, workflow = self.wf_generator.generate_workflow(self.monthly_workflow)
+      self.wf_generator.activate_workflow(workflow)
+
+    relationship_query = Relationship.query.filter_by(
+        source_type="CycleTaskGroupObjectTask")
+    revision_query = Revision.query.filter_by(resource_type="Relationship")
+    relationship_count = relationship_query.count()
+    revision_count = revision_query.count()
+    with freeze_time("2015-04-03"):
+      start_recurring_cycles()
+
+    # two tasks in the first task group are mapped to two objects
+    self.assertEqual(relationship_count + 4, relationship_query.count())
+    self.assertEqual(revision_count + 4, revision_query.count())
+
+  @patch("ggrc.notifications.common.send_email")
+  def test_failed_workflow(self, _):
+    with freeze_time("2015-04-01"):
+      workflows = []
+      for _ in range(2):
+        _, workflow = self.wf_generator.generate_workflow(
+            self.monthly_workflow)
+        self.wf_generator.activate_workflow(workflow)
+        workflows.append(workflow)
+    failed_id, started_id = workflows[0].id, workflows[1].id
+
+    def failing_build_cycle(cycle, **kwargs):
+      if cycle.workflow.id == failed_id:
+        raise ValueError("Broken workflow")
+      build_cycle(cycle, **kwargs)
+
+    with freeze_time("2015-04-03"):
+      with patch("ggrc_workflows.build_cycle", failing_build_cycle):
+        with self.assertRaises(RuntimeError):
+          start_recurring_cycles()
+
+    cycle_counts = {
+        workflow_id: models.Cycle.query.filter_by(
+            workflow_id=workflow_id).count()
+        for workflow_id in (failed_id, started_id)
+    }
+    self.assertEqual(cycle_counts[started_id],
+                     cycle_counts[failed_id] + 1)
+
   def _create_test_cases(self):
     def person_dict(person_id):
       return {
@@ -0,0 +1,66 @@
+# Copyright (C) 2017 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""Test pipelined bulk operations of MemCache"""
+
+from unittest import TestCase
+
+from appengine import base
+from ggrc.cache.localcache import LRUCache
+from ggrc.cache.memcache import MemCache
+from ggrc.cache.memcache import TieredMemCache
+
+
+@base.with_memcache
+class TestMemcachePipeline(TestCase):
+  """Test pipelined get and add of many memcache entries"""
+
+  def setUp(self):
+    self.cache = MemCache()
+    self.cache.memcache_client = self.memcache_client
+
+  def test_get_multi(self):
+    """All found entries are returned from all batches"""
+    self.memcache_client.add_multi({str(i): i for i in range(10)})
+    result = self.cache.pipelined_get_multi(
+        [str(i) for i in range(15)], batch_size=3, max_in_flight=2)
+    self.assertEqual(result, {str(i): i for i in range(10)})
+
+  def test_add_unblocked(self):
+    """Entries with existing blocker keys are not added"""
+    self.memcache_client.add_multi({"DeleteOp:1": 1, "DeleteOp:4": 1})
+    data = {str(i): i for i in range(6)}
+    blockers = {key: "DeleteOp:" + key for key in data}
+    added = self.cache.pipelined_add_unblocked(
+        data, blockers, batch_size=2, max_in_flight=2)
+    self.assertEqual(sorted(added), ["0", "2", "3", "5"])
+    self.assertEqual(
+        self.memcache_client.get_multi(data.keys()),
+        {"0": 0, "2": 2, "3": 3, "5": 5})
+
+
+@base.with_memcache
+class TestTieredMemCache(TestCase):
+  """Test invalidation of local entries by category versions"""
+
+  def setUp(self):
+    self.cache = TieredMemCache()
+    self.cache.memcache_client = self.memcache_client
+    self.cache.local_cache = LRUCache(max_entries=10, max_bytes=10000)
+    self.keys = ["collection:controls:1", "collection:markets:1"]
+
+  def test_remove_invalidates_category(self):
+    """Removing an entry drops local entries of its category only"""
+    self.memcache_client.add_multi({key: {"v": 1} for key in self.keys})
+    self.cache.pipelined_get_multi(self.keys)
+    # Changes made by other processes
+    self.memcache_client.set_multi({key: {"v": 2} for key in self.keys})
+    other = TieredMemCache()
+    other.memcache_client = self.memcache_client
+    other.local_cache = LRUCache(max_entries=10, max_bytes=10000)
+    other.remove_multi(["collection:controls:2"], 0)
+
+    self.assertEqual(self.cache.pipelined_get_multi(self.keys), {
+        "collection:controls:1": {"v": 2},
+        "collection:markets:1": {"v": 1},
+    })
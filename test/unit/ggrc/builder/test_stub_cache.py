@@ -0,0 +1,58 @@
+# Copyright (C) 2017 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""Tests for the cache of rendered object stubs."""
+
+import datetime
+import unittest
+
+import mock
+
+from ggrc.builder import json
+
+
+class TestStubCache(unittest.TestCase):
+  """Tests for StubCache expiration and invalidation."""
+
+  UPDATED_AT = datetime.datetime(2017, 1, 1)
+
+  def setUp(self):
+    self.cache = json.StubCache(max_entries=2, timeout=30)
+    self.stub = {"type": "Market", "id": 1, "context_id": None}
+
+  def test_get(self):
+    """Cached stubs are returned as copies."""
+    self.cache.set(("Market", 1), self.stub, self.UPDATED_AT)
+    stub = self.cache.get(("Market", 1))
+    self.assertEqual(stub, self.stub)
+    stub["context_id"] = 5
+    self.assertEqual(self.cache.get(("Market", 1)), self.stub)
+
+  def test_newer_object(self):
+    """Stubs are not used for objects with a different updated_at."""
+    self.cache.set(("Market", 1), self.stub, self.UPDATED_AT)
+    self.assertIsNone(self.cache.get(
+        ("Market", 1), self.UPDATED_AT + datetime.timedelta(seconds=1)))
+
+  def test_expired(self):
+    """Stubs expire after the timeout."""
+    with mock.patch("time.time", return_value=1000):
+      self.cache.set(("Market", 1), self.stub, self.UPDATED_AT)
+    with mock.patch("time.time", return_value=1031):
+      self.assertIsNone(self.cache.get(("Market", 1)))
+
+  def test_evict(self):
+    """Evicted and least recently used stubs are dropped."""
+    for id_ in (1, 2, 3):
+      self.cache.set(("Market", id_), dict(self.stub, id=id_),
+                     self.UPDATED_AT)
+    self.cache.evict([("Market", 3)])
+    self.assertIsNone(self.cache.get(("Market", 1)))
+    self.assertIsNone(self.cache.get(("Market", 3)))
+    self.assertEqual(self.cache.get(("Market", 2))["id"], 2)
+
+  def test_generation(self):
+    """Stubs are not used after the generation of their type changes."""
+    self.cache.set(("Market", 1), self.stub, self.UPDATED_AT, generation=1)
+    self.assertEqual(self.cache.get(("Market", 1), generation=1), self.stub)
+    self.assertIsNone(self.cache.get(("Market", 1), generation=2))
@@ -0,0 +1,35 @@
+# Copyright (C) 2017 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""Tests for publishing query API values from columns."""
+
+import unittest
+
+from ggrc.builder import json
+from ggrc.models import all_models
+
+
+class TestValuesPublisher(unittest.TestCase):
+  """Tests for get_values_publisher."""
+
+  def test_column_fields(self):
+    """Column and stub fields are published from a row."""
+    columns, publish_row = json.get_values_publisher(
+        all_models.Audit, ["title", "type", "audit_firm", "unknown"])
+    self.assertEqual(columns[0], all_models.Audit.id)
+    self.assertEqual(len(columns), 3)
+    values = publish_row((1, "Audit title", None))
+    self.assertEqual(values, {
+        "title": "Audit title",
+        "type": "Audit",
+        "audit_firm": None,
+        "unknown": None,
+    })
+    stub = publish_row((1, "Audit title", 5))["audit_firm"]
+    self.assertIsInstance(stub, json.LazyStubRepresentation)
+    self.assertEqual((stub.type, stub.conditions), ("OrgGroup", {"id": 5}))
+
+  def test_collection_fields(self):
+    """Collections can only be published from objects."""
+    self.assertIsNone(json.get_values_publisher(
+        all_models.Audit, ["title", "requests"]))
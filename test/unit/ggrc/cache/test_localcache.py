@@ -0,0 +1,47 @@
+# Copyright (C) 2017 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""Tests for the bounded in-process cache."""
+
+import unittest
+
+from ggrc.cache.localcache import LRUCache
+
+
+class TestLRUCache(unittest.TestCase):
+  """Tests for LRUCache eviction and versions."""
+
+  def setUp(self):
+    self.cache = LRUCache(max_entries=3, max_bytes=1024)
+
+  def get(self, *keys):
+    return self.cache.get_multi({key: 1 for key in keys})
+
+  def test_evict_least_recently_used(self):
+    """Entries over the count limit are evicted by last use."""
+    for key, value in (("a", 1), ("b", 2), ("c", 3)):
+      self.cache.set_multi({key: value}, {key: 1})
+    self.get("a")
+    self.cache.set_multi({"d": 4}, {"d": 1})
+    self.assertEqual(self.get("a", "b", "c", "d"), {"a": 1, "c": 3, "d": 4})
+
+  def test_evict_by_size(self):
+    """Entries over the size limit are evicted."""
+    self.cache.set_multi({"a": "x" * 600}, {"a": 1})
+    self.cache.set_multi({"b": "y" * 600}, {"b": 1})
+    self.assertEqual(self.get("a", "b"), {"b": "y" * 600})
+    self.cache.set_multi({"c": "z" * 2000}, {"c": 1})
+    self.assertEqual(self.get("c"), {})
+
+  def test_version(self):
+    """Entries are only returned for their version."""
+    self.cache.set_multi({"a": 1, "b": 2, "c": 3}, {"a": 1, "b": 2})
+    self.assertEqual(self.cache.get_multi({"a": 1, "b": 1, "c": 1}),
+                     {"a": 1})
+    self.assertEqual(self.cache.get_multi({"b": 2}), {})
+
+  def test_values_are_copies(self):
+    """Changing a returned value does not change the stored value."""
+    self.cache.set_multi({"a": {"items": [1]}}, {"a": 1})
+    self.get("a")["a"]["items"].append(2)
+    self.assertEqual(self.get("a"), {"a": {"items": [1]}})
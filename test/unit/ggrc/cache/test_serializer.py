@@ -0,0 +1,58 @@
+# Copyright (C) 2017 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""Tests for serializers of memcache values."""
+
+import collections
+import unittest
+
+from ggrc.cache.serializer import CompactSerializer
+
+
+Settings = collections.namedtuple("Settings", [
+    "MEMCACHE_COMPRESS_THRESHOLD",
+    "MEMCACHE_STATS_SAMPLE_RATE",
+])
+
+
+class TestCompactSerializer(unittest.TestCase):
+  """Tests for CompactSerializer."""
+
+  def setUp(self):
+    self.serializer = CompactSerializer(Settings(100, 2))
+    self.value = {
+        "id": 1,
+        "selfLink": "/api/markets/1",
+        "owners": [{"id": 2, "type": "Person", "href": "/api/people/2"}],
+        5: {"contexts": [1, 2]},
+        u"custom": None,
+    }
+
+  def test_round_trip(self):
+    """Small and compressed values are restored."""
+    for value in (self.value, dict(self.value, description="x" * 1000)):
+      data = self.serializer.dumps(value)
+      self.assertEqual(self.serializer.loads(data), value)
+
+  def test_other_formats(self):
+    """Data from other serializers or versions is not returned."""
+    data = self.serializer.dumps(self.value)
+    self.serializer.VERSION = 2
+    self.assertIsNone(self.serializer.loads(data))
+    self.assertIsNone(self.serializer.loads(self.value))
+    self.assertIsNone(self.serializer.loads(None))
+
+  def test_stats(self):
+    """Bytes saved by interned keys are counted for sampled values."""
+    for _ in range(3):
+      self.serializer.dumps(self.value)
+    stats = self.serializer.get_stats()
+    self.assertEqual(stats["values"], 3)
+    self.assertEqual(stats["sampled_values"], 1)
+    self.assertGreater(stats["saved_bytes"], 0)
+
+  def test_unknown_token(self):
+    """Keys that look like tokens out of range are not replaced."""
+    key = CompactSerializer.TOKEN_PREFIX + chr(len(CompactSerializer.KEYS))
+    data = self.serializer.dumps({key: 1, "id": 2})
+    self.assertEqual(self.serializer.loads(data), {key: 1, "id": 2})
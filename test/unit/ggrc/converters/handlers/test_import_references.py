@@ -0,0 +1,55 @@
+# Copyright (C) 2017 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""Tests for collecting objects referenced by csv cells."""
+
+import unittest
+
+from ggrc.converters.handlers import handlers
+from ggrc.models import Person
+from ggrc.models import Program
+
+
+class GetImportReferencesTestCase(unittest.TestCase):
+  """Tests for the get_import_references() class method"""
+  # pylint: disable=invalid-name
+
+  def test_default_handler_has_no_references(self):
+    """Plain text columns do not reference any objects."""
+    references = handlers.ColumnHandler.get_import_references(u"some text")
+    self.assertEqual(references, [])
+
+  def test_user_handler_references_emails(self):
+    """Every non empty line of a user column is a lowercase email."""
+    references = handlers.UserColumnHandler.get_import_references(
+        u" User@Example.com \n\n  \nother@example.com")
+    self.assertEqual(references, [
+        (Person, u"user@example.com"),
+        (Person, u"other@example.com"),
+    ])
+
+  def test_parent_handler_references_parent_slug(self):
+    """Parent columns reference the parent object by slug."""
+    references = handlers.ProgramColumnHandler.get_import_references(
+        u" PROGRAM-1 ")
+    self.assertEqual(references, [(Program, u"PROGRAM-1")])
+
+  def test_parent_handler_ignores_empty_value(self):
+    """Empty parent columns do not reference any objects."""
+    references = handlers.ProgramColumnHandler.get_import_references(u"  ")
+    self.assertEqual(references, [])
+
+  def test_mapping_handler_references_slugs(self):
+    """Mapping columns reference each unique slug of the mapped type."""
+    references = handlers.MappingColumnHandler.get_import_references(
+        u"PROGRAM-1\nprogram-1\n\nPROGRAM-2", attr_name="program")
+    self.assertEqual(sorted(references), [
+        (Program, u"program-1"),
+        (Program, u"program-2"),
+    ])
+
+  def test_mapping_handler_unknown_type(self):
+    """Mapping columns for unknown types do not reference any objects."""
+    references = handlers.MappingColumnHandler.get_import_references(
+        u"PROGRAM-1", attr_name="unknown type")
+    self.assertEqual(references, [])
@@ -113,6 +113,30 @@ class TestSplitArry(unittest.TestCase):
     self.assertEqual(offests[2], 9)
 
 
+class TestGenerateCsvChunks(unittest.TestCase):
+  """Tests for streaming csv generation."""
+
+  def test_chunks_match_csv_string(self):
+    """Test that joined csv chunks match the full csv string."""
+    test_data = [
+        [u"Object type", u"Code", u"Title"],
+        [u"Control", u"code", u"title"],
+        [u"", u"CONTROL-1", u"\u010d title"],
+        [u"", u"CONTROL-2", u"title 2"],
+        [u"", u"", u""],
+    ]
+    csv_string = import_helper.generate_csv_string(copy.deepcopy(test_data))
+    chunks = list(import_helper.generate_csv_chunks(
+        [test_data[:2], test_data[2:3], test_data[3:]]))
+    self.assertEqual(len(chunks), 3)
+    self.assertEqual("".join(chunks), csv_string)
+
+  def test_equalize_to_length(self):
+    """Test expanding rows to a given length."""
+    data = import_helper.equalize_array([[u"a"], [u"b", u"c"]], 3)
+    self.assertEqual(data, [[u"a", u"", u""], [u"b", u"c", u""]])
+
+
 class TestColumnOrder(unittest.TestCase):
 
   """Tests for colum order function.
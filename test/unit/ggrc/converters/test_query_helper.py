@@ -60,3 +60,45 @@ class TestQueryHelper(unittest.TestCase):
 
     for expected_result, expression in expressions:
       self.assertEqual(expected_result, helper._expression_keys(expression))
+
+  def test_query_groups(self):
+    """Queries that use previous results start a new group."""
+    # pylint: disable=protected-access
+    def relevant(object_name, ids):
+      return {"filters": {"expression": {
+          "left": {"left": "title", "op": {"name": "="}, "right": "x"},
+          "op": {"name": "AND"},
+          "right": {"object_name": object_name, "op": {"name": "relevant"},
+                    "ids": ids},
+      }}}
+    helper = query_helper.QueryHelper([])
+    helper.query = [
+        relevant("Program", [1]),
+        relevant("Program", [2]),
+        relevant("__previous__", [0]),
+        relevant("Audit", [1]),
+    ]
+    groups = helper._get_query_groups()
+    self.assertEqual(groups, [helper.query[:2], helper.query[2:]])
+
+  def test_shared_key(self):
+    """Equal shareable sub-expressions have equal keys."""
+    model = type("Control", (object,), {})
+    get_key = query_helper.custom_operators.get_shared_key
+    relevant = {"object_name": "Program", "op": {"name": "relevant"},
+                "ids": [1, 2]}
+    self.assertEqual(get_key(relevant, model), get_key(dict(relevant), model))
+    self.assertNotEqual(get_key(relevant, model),
+                        get_key(dict(relevant, ids=[1]), model))
+    self.assertIsNone(get_key({"left": "title", "op": {"name": "="},
+                               "right": "x"}, model))
+    self.assertIsNone(get_key(dict(relevant, object_name="__previous__"),
+                              model))
+
+  def test_shared_subquery(self):
+    """Shared expressions with too many ids are built as subqueries."""
+    model = query_helper.models.all_models.Market
+    ids_subquery = query_helper.db.session.query(model.id).subquery()
+    shared = query_helper.custom_operators.SharedExpression(None,
+                                                            ids_subquery)
+    self.assertIn("IN (SELECT", str(shared.build(model)))
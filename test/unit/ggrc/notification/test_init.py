@@ -2,6 +2,7 @@
 # Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
 
 import unittest
+from mock import Mock
 from mock import patch
 
 from ggrc import app  # noqa
@@ -10,14 +11,69 @@ from ggrc.notifications import common
 
 class TestNotificationsInit(unittest.TestCase):
 
-  @patch("ggrc.notifications.common.get_filter_data")
-  def test_get_notification_data(self, get_filter_data):
+  @patch("ggrc.notifications.common.should_receive", return_value=True)
+  @patch("ggrc.notifications.common.prefetch_people")
+  @patch("ggrc.notifications.common.prefetch_notification_objects")
+  @patch("ggrc.notifications.common.Services.call_service")
+  def test_get_notification_data(self, call_service, *_):
     """ Test that data does not contain empty emails """
 
-    get_filter_data.return_value = {
-        "email@example.com": {},
-        "": {},
+    call_service.return_value = {
+        "email@example.com": {"user": {"id": 1}},
+        "": {"user": {"id": -1}},
     }
-    notification_data = common.get_notification_data([1, 2])
+    notifications = [Mock(id=1), Mock(id=2)]
+    notification_data = common.get_notification_data(notifications)
     self.assertIn("email@example.com", notification_data)
     self.assertNotIn("", notification_data)
+
+  @patch("ggrc.notifications.common.should_receive")
+  @patch("ggrc.notifications.common.prefetch_people")
+  @patch("ggrc.notifications.common.prefetch_notification_objects")
+  @patch("ggrc.notifications.common.Services.call_service")
+  def test_get_notification_data_per_user(self, call_service, _,
+                                          prefetch_people, should_receive):
+    """ Test that data of all notifications is merged for each user """
+    notifications = [Mock(id=1), Mock(id=2)]
+    call_service.side_effect = [
+        {"a@example.com": {"user": {"id": 1}, "due_in": {1: "task 1"}},
+         "b@example.com": {"user": {"id": 2}, "due_in": {1: "task 1"}}},
+        {"a@example.com": {"user": {"id": 1}, "due_in": {2: "task 2"}}},
+    ]
+    should_receive.side_effect = (
+        lambda notif, user_data, _: user_data["user"]["id"] == 1)
+
+    notification_data = common.get_notification_data(notifications)
+
+    self.assertEqual(sorted(prefetch_people.call_args[0][0]), [1, 1, 2])
+    self.assertEqual(notification_data, {
+        "a@example.com": {
+            "user": {"id": 1},
+            "due_in": {1: "task 1", 2: "task 2"},
+        },
+    })
+
+  @patch("ggrc.notifications.common.set_notifications_sent")
+  @patch("ggrc.notifications.common.send_digest_emails")
+  @patch("ggrc.notifications.common.get_user_notifications")
+  @patch("ggrc.notifications.common.get_daily_notification_list")
+  def test_send_daily_digest_in_chunks(self, get_list, get_user_notifications,
+                                       send_digest_emails, set_sent):
+    """ Test that notifications are marked as sent after their last chunk """
+    get_list.return_value = [Mock(id=1), Mock(id=2), Mock(id=3)]
+    get_user_notifications.return_value = (
+        {"a@example.com": {"a": 1}, "b@example.com": {"b": 1}},
+        {"a@example.com": {1}, "b@example.com": {1, 2}},
+    )
+    send_digest_emails.side_effect = (
+        lambda digests, _: [user for user, _digest in digests])
+
+    with patch.object(common.settings, "NOTIFICATION_CHUNK_SIZE", 1):
+      common.send_daily_digest_notifications()
+
+    self.assertEqual(
+        [call[0][0] for call in send_digest_emails.call_args_list],
+        [[("a@example.com", {"a": 1})], [("b@example.com", {"b": 1})]])
+    self.assertEqual(
+        [sorted(call[0][0]) for call in set_sent.call_args_list],
+        [[3], [1, 2], []])
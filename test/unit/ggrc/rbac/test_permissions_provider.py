@@ -0,0 +1,118 @@
+# Copyright (C) 2017 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""Unit tests for the default user permissions."""
+
+import unittest
+
+import mock
+from flask import Flask
+
+from ggrc.rbac import permissions_provider
+
+
+class StaticUserPermissions(permissions_provider.DefaultUserPermissions):
+  """User permissions with a fixed permissions dict."""
+
+  def __init__(self, permissions):
+    self.permissions = permissions
+
+  def _permissions(self):
+    return self.permissions
+
+
+class TestPermissionsCache(unittest.TestCase):
+  """Tests for request caching of permission decisions."""
+
+  def setUp(self):
+    self.app_context = Flask(__name__).app_context()
+    self.app_context.push()
+    self.user_permissions = StaticUserPermissions({
+        "read": {
+            "Market": {"contexts": [1, 2], "resources": [10]},
+            "Facility": {"contexts": [None]},
+        },
+        "__GGRC_ADMIN__": {"__GGRC_ALL__": {"contexts": [3]}},
+    })
+
+  def tearDown(self):
+    self.app_context.pop()
+
+  def test_is_allowed_read(self):
+    """Contexts, resources and admin contexts allow reading."""
+    is_allowed_read = self.user_permissions.is_allowed_read
+    self.assertTrue(is_allowed_read("Market", 5, 1))
+    self.assertTrue(is_allowed_read("Market", 10, 4))
+    self.assertTrue(is_allowed_read("Market", 5, 3))
+    self.assertTrue(is_allowed_read("Facility", 5, 4))
+    self.assertFalse(is_allowed_read("Market", 5, 4))
+    self.assertFalse(is_allowed_read("Market", 5, None))
+
+  def test_decisions_are_cached(self):
+    """Repeated checks do not evaluate the permissions again."""
+    self.user_permissions.is_allowed_read("Market", 5, 1)
+    with mock.patch.object(StaticUserPermissions,
+                           "_check_permission") as check_permission:
+      self.assertTrue(self.user_permissions.is_allowed_read("Market", 5, 1))
+      self.assertFalse(check_permission.called)
+
+  def test_new_permissions_are_not_cached(self):
+    """Decisions are not reused for a different permissions dict."""
+    self.assertTrue(self.user_permissions.is_allowed_read("Market", 5, 1))
+    self.user_permissions.permissions = {}
+    self.assertFalse(self.user_permissions.is_allowed_read("Market", 5, 1))
+
+  def test_contexts_for(self):
+    """Contexts include admin contexts and all contexts give None."""
+    self.assertEqual(
+        sorted(self.user_permissions.read_contexts_for("Market")), [1, 2, 3])
+    self.assertIsNone(self.user_permissions.read_contexts_for("Facility"))
+
+
+class TestCompileConditions(unittest.TestCase):
+  """Tests for compiled permission conditions."""
+
+  @staticmethod
+  def make_instance(**attrs):
+    return mock.Mock(**attrs)
+
+  def test_no_conditions(self):
+    """Empty conditions are not compiled."""
+    self.assertIsNone(permissions_provider.compile_conditions([]))
+
+  def test_contains_condition(self):
+    """Contains checks the value in a nested list attribute."""
+    check = permissions_provider.compile_conditions([{
+        "condition": "contains",
+        "terms": {"list_property": "program.owners", "value": "a"},
+    }])
+    instance = self.make_instance()
+    instance.program.owners = ["a", "b"]
+    self.assertTrue(check(instance, "read"))
+    instance.program.owners = ["b"]
+    self.assertFalse(check(instance, "read"))
+
+  def test_any_condition(self):
+    """Any valid condition allows the action."""
+    check = permissions_provider.compile_conditions([
+        {"condition": "is", "terms": {"property_name": "status",
+                                      "value": "Draft"}},
+        {"condition": "in", "terms": {"property_name": "kind",
+                                      "value": ["a", "b"]}},
+    ])
+    self.assertTrue(check(self.make_instance(status="Draft", kind="c"),
+                          "read"))
+    self.assertTrue(check(self.make_instance(status="Final", kind="b"),
+                          "read"))
+    self.assertFalse(check(self.make_instance(status="Final", kind="c"),
+                           "read"))
+
+  def test_forbid_condition(self):
+    """Forbid blocks only the blacklisted types for the current action."""
+    check = permissions_provider.compile_conditions([{
+        "condition": "forbid",
+        "terms": {"blacklist": {"update": ["Audit"]}},
+    }])
+    audit = self.make_instance(type="Audit")
+    self.assertTrue(check(audit, "read"))
+    self.assertFalse(check(audit, "update"))
@@ -3,6 +3,7 @@
 """Unit test for ggrc.setvice.common module"""
 
 import collections
+import datetime
 import itertools
 from contextlib import contextmanager
 from unittest import TestCase
@@ -173,3 +174,55 @@ class TestGetRevisionsList(TestCase):
       self.assertEqual(
           expected_results,
           [r.action for r in self.get_log_revisions(dirty[0])])
+
+
+class TestGetPermissionChanges(TestCase):
+  """Tests for finding people with invalidated permissions."""
+
+  @staticmethod
+  def make_cache(new=(), dirty=(), deleted=()):
+    cache = models.cache.Cache()
+    cache.new = {obj: {} for obj in new}
+    cache.dirty = {obj: {} for obj in dirty}
+    cache.deleted = {obj: {} for obj in deleted}
+    return cache
+
+  def test_no_changes(self):
+    """Unrelated objects do not affect any permissions."""
+    cache = self.make_cache(dirty=[models.Control()])
+    self.assertEqual(common.get_permission_changes(cache), set())
+
+  def test_user_changes(self):
+    """New and deleted owners only affect the owner permissions."""
+    cache = self.make_cache(
+        new=[models.ObjectOwner(person_id=1), models.Control()],
+        deleted=[models.ObjectOwner(person_id=2)],
+    )
+    self.assertEqual(common.get_permission_changes(cache), {1, 2})
+
+  def test_global_changes(self):
+    """Changes of relationships and assignable objects affect everyone."""
+    for obj in (models.Relationship(), models.Assessment(),
+                models.ObjectOwner(person_id=1)):
+      cache = self.make_cache(new=[models.Control()], dirty=[obj])
+      self.assertIsNone(common.get_permission_changes(cache))
+    self.assertIsNone(common.get_permission_changes(None))
+
+
+class TestKeysetCursor(TestCase):
+  """Tests for keyset paging cursors."""
+
+  def test_cursor_round_trip(self):
+    """Decoded cursors point to the same row."""
+    modified = datetime.datetime(2017, 3, 4, 5, 6, 7, 8)
+    for order, modified in (("updated_at", modified), ("id", None)):
+      cursor = common.Resource.encode_cursor(order, modified, 42)
+      self.assertEqual(common.Resource.decode_cursor(cursor),
+                       (order, modified, 42))
+
+  def test_invalid_cursor(self):
+    """Malformed cursors are rejected."""
+    invalid_order = common.Resource.encode_cursor("title", None, 1)
+    for cursor in (u"garbage", invalid_order):
+      with self.assertRaises(common.BadRequest):
+        common.Resource.decode_cursor(cursor)
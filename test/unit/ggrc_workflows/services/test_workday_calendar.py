@@ -0,0 +1,65 @@
+# Copyright (C) 2017 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""Unit tests for the workday calendar."""
+
+import unittest
+from datetime import date
+from datetime import datetime
+
+from ggrc_workflows.services.workflow_cycle_calculator import workday_calendar
+
+
+class TestWorkdayCalendar(unittest.TestCase):
+  """Tests for workday lookups."""
+
+  def setUp(self):
+    # Wednesday to Friday
+    self.calendar = workday_calendar.WorkdayCalendar(
+        [date(2015, 6, 24), date(2015, 6, 25), date(2015, 6, 26)])
+
+  def test_is_work_day(self):
+    """Weekends and holidays are not workdays."""
+    self.assertTrue(self.calendar.is_work_day(date(2015, 6, 23)))
+    self.assertFalse(self.calendar.is_work_day(date(2015, 6, 24)))
+    self.assertFalse(self.calendar.is_work_day(date(2015, 6, 27)))
+
+  def test_previous_work_day(self):
+    """Days are moved back over weekends and holidays."""
+    self.assertEqual(self.calendar.previous_work_day(date(2015, 6, 23)),
+                     date(2015, 6, 23))
+    self.assertEqual(self.calendar.previous_work_day(date(2015, 6, 28)),
+                     date(2015, 6, 23))
+    self.assertEqual(self.calendar.previous_work_day(date(2017, 1, 1)),
+                     date(2016, 12, 30))
+
+  def test_next_work_day(self):
+    """Days are moved forward over weekends and holidays."""
+    self.assertEqual(self.calendar.next_work_day(date(2015, 6, 24)),
+                     date(2015, 6, 29))
+    self.assertEqual(self.calendar.next_work_day(date(2015, 12, 31)),
+                     date(2015, 12, 31))
+    self.assertEqual(self.calendar.next_work_day(date(2016, 12, 31)),
+                     date(2017, 1, 2))
+
+  def test_add_work_days(self):
+    """Only workdays are counted when adding days."""
+    self.assertEqual(self.calendar.add_work_days(date(2015, 6, 23), 1),
+                     date(2015, 6, 29))
+    self.assertEqual(self.calendar.add_work_days(date(2015, 6, 27), 2),
+                     date(2015, 6, 30))
+    self.assertEqual(self.calendar.add_work_days(date(2015, 6, 29), -1),
+                     date(2015, 6, 23))
+    self.assertEqual(self.calendar.add_work_days(date(2015, 6, 27), 0),
+                     date(2015, 6, 27))
+    # 261 workdays in 2016, from Friday 1st January to Friday 30th December
+    self.assertEqual(self.calendar.add_work_days(date(2016, 1, 1), 260),
+                     date(2016, 12, 30))
+    self.assertEqual(self.calendar.add_work_days(date(2016, 12, 30), -260),
+                     date(2016, 1, 1))
+
+  def test_datetime_is_kept(self):
+    """Time of day is kept when datetime objects are adjusted."""
+    self.assertEqual(
+        self.calendar.previous_work_day(datetime(2015, 6, 28, 10, 30)),
+        datetime(2015, 6, 23, 10, 30))